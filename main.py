@@ -1,9 +1,13 @@
+import argparse
 from datetime import datetime
 
 import simpy
 
+from the_enclave_brain import show_config
 from the_enclave_brain.app import App
-from the_enclave_brain.config import TIME_STEP_SECONDS
+from the_enclave_brain.config import SNAPSHOT_PATH, TIME_STEP_SECONDS
+from the_enclave_brain.scene_program import load_program
+from the_enclave_brain.shared_state.layout import SHARED_STATE_NAME
 
 
 def simulation_loop(app: App, env: simpy.Environment, tick: float):
@@ -13,7 +17,26 @@ def simulation_loop(app: App, env: simpy.Environment, tick: float):
 
 
 if __name__ == "__main__":
-    app = App()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=int, help="master random seed, pass a logged seed to replay a session")
+    parser.add_argument("--reset", action="store_true", help="ignore the last snapshot and start with the full reset")
+    parser.add_argument("--program", help="show program json, defaults to cycling through the scene sequence")
+    parser.add_argument("--show", help="show config json (scenes, palette, madmapper cues), defaults to the_enclave_brain/show.json")
+    parser.add_argument("--audio-device", help="audio output device name, 'null' to run without an audio device")
+    args = parser.parse_args()
+
+    # the show program is checked against the scenes of the show config
+    show_config.load(args.show)
+    app = App(
+        seed=args.seed,
+        snapshot_path=SNAPSHOT_PATH,
+        restore=not args.reset,
+        shared_state_name=SHARED_STATE_NAME,
+        program=args.program and load_program(args.program),
+        show_config_path=args.show,
+        watch_show_config=True,
+        audio_device=args.audio_device,
+    )
     env = simpy.rt.RealtimeEnvironment(strict=False)
     proc = env.process(simulation_loop(app, env, TIME_STEP_SECONDS))
     env.run(until=proc)
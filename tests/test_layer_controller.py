@@ -0,0 +1,24 @@
+from the_enclave_brain import show_config
+from the_enclave_brain.controllers.layer_controller import LayerController
+from the_enclave_brain.osc.events import OSCEventManager
+from the_enclave_brain.rng import RandomStreams
+from the_enclave_brain.scenes import SCENES
+from the_enclave_brain.show_config import CUE_TABLES
+
+
+def test_bg_cues_alternate_layers():
+    show_config.load()
+    for scene in SCENES:
+        if len(CUE_TABLES[(scene, "bg")].layer_counts) < 2:
+            continue
+        controller = LayerController(OSCEventManager(), scene=scene, layer_type="bg", rng_streams=RandomStreams(1))
+        controller.update_layer()
+        seen = set()
+        for _ in range(50):
+            prev_layer = controller.current_layer
+            controller.update_layer()
+            assert controller.current_layer != prev_layer
+            seen.add((controller.current_layer, controller.current_bin, controller.current_index))
+        # cues past the start of the other layer are reachable
+        table = CUE_TABLES[(scene, "bg")]
+        assert len({layer for layer, _, _ in seen}) == len(table.layer_counts)
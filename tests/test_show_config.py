@@ -0,0 +1,28 @@
+import copy
+import json
+
+from the_enclave_brain import show_config
+
+
+def load_raw():
+    with open(show_config.DEFAULT_SHOW_CONFIG_PATH) as f:
+        return json.load(f)
+
+
+def test_show_config_is_valid():
+    assert show_config.validate(load_raw()) == []
+
+
+def test_scene_numbers_must_be_numbers():
+    raw = load_raw()
+    scene = next(iter(raw["scenes"]))
+    raw["scenes"][scene]["fg_blackout"] = "0.5"
+    assert show_config.validate(raw) == [f"scene {scene} fg_blackout must be a number"]
+
+
+def test_cue_specs_are_checked_before_compiling():
+    raw = load_raw()
+    for spec in [{"row": 4}, {"column": 2}, [{"row": 4, "count": 2}, {"col": 1}]]:
+        broken = copy.deepcopy(raw)
+        broken["madmapper"]["lights"]["content"] = spec
+        assert len(show_config.validate(broken)) == 1
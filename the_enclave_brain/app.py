@@ -6,14 +6,23 @@
 # - determines scene automations via randomized background and one hit cues
 # - and then sends out OSC via the event manager
 
+from .controllers.fader_bank import FaderBank
 from .controllers.flood_lights_controller import FloodLightsController
 from .controllers.layer_controller import LayerController
 from .controllers.lights_controller import LightsController
 from .controllers.light_flicker_controller import LightFlickerController
-from .controllers.audio_controller import Audio_controller
-from .osc.init import INIT_EVENT
+import time
+
+from .config import SNAPSHOT_INTERVAL_SECONDS
+from .modulation import ModulationMatrix
+from .osc import control_cache
+from .osc.init import create_init_event, create_resync_event
 from .osc.events import OSCEventManager
+from .rng import RandomStreams
+from .shared_state.writer import StateExporter
+from . import show_config
 from .simulation import Simulation
+from .snapshot import SnapshotStore, decode_snapshot, encode_snapshot
 from . import control
 
 uc_ctrl_idx_to_simulation_key = {
@@ -33,42 +42,225 @@ class App:
         event_manager (OSCEventManager): The event manager used to manage and send events.
         bg_controller (LayerController): Instance of LayerController class representing the background layer.
         fg_controller (LayerController): Instance of LayerController class representing the foreground layer.
+        fader_bank (FaderBank): Evaluates the fx faders of every layer in one vectorized step per frame.
+        modulation (ModulationMatrix): Routes the simulation values and LFOs to controls, flood lights and audio values.
+        rng_streams (RandomStreams): Per subsystem random number streams derived from one master seed.
+        audio_engine (AudioEngine): Mixes every audio voice on one output stream, None when headless.
+        audio_prefetcher (Prefetcher): Warms the audio of the predicted next scene, None when headless.
+        audio_device (str): The audio output device, defaults to OUTPUT_DEVICE, "null" renders without a device.
+        headless (bool): When True, audio and the micro controller are skipped so the app can run without hardware (e.g. in the sweep tool).
+        snapshot_store (SnapshotStore): Where the show state is periodically saved for warm restarts, None to disable snapshots.
+        state_exporter (StateExporter): Publishes the state to shared memory every frame for external visualizers, None when disabled.
+        show_config_watcher (ShowConfigWatcher): Recompiles the show config when the file changes, None when disabled.
 
     Methods:
         update(dt: float): Updates the simulation, sets the scene and scene intensity for the background and foreground layer controller and updates all controllers with elapsed time 'dt'.
+        get_state() -> dict: Collects the show state for a snapshot.
+        save_snapshot(): Writes the current show state to the snapshot store.
+        reload_show_config(compiled: dict): Swaps in a compiled show config without resetting the show.
     """
 
-    def __init__(self):
-        self.simulation = Simulation()
+    def __init__(
+        self,
+        headless=False,
+        seed=None,
+        snapshot_path=None,
+        restore=True,
+        shared_state_name=None,
+        program=None,
+        show_config_path=None,
+        watch_show_config=False,
+        audio_device=None,
+    ):
+        self.headless = headless
+        show_config.load(show_config_path)
+        self.rng_streams = RandomStreams(seed)
+        # log the seed so a session can be replayed
+        print("random seed:", self.rng_streams.seed)
+        self.simulation = Simulation(self.rng_streams, program)
+        print("show program:", self.simulation.program.name)
+
+        self.snapshot_store = None
+        self.snapshot_time = 0.0
+        state = None
+        if snapshot_path is not None:
+            self.snapshot_store = SnapshotStore(snapshot_path)
+            if restore:
+                state = self.load_snapshot()
 
         self.event_manager = OSCEventManager()
-        self.event_manager.add_event(INIT_EVENT)
+        if state is None:
+            self.event_manager.add_event(create_init_event())
+        else:
+            self.simulation.set_state(state["simulation"])
+            for address, value in state["control_cache"]:
+                control_cache.set_value(address, value)
 
         # set initial scene and create layer randomizers
         self.scene = self.simulation.scene
+        self.fader_bank = FaderBank(self.rng_streams)
         self.bg_controller = LayerController(
-            self.event_manager, layer_type="bg", scene=self.scene
+            self.event_manager,
+            layer_type="bg",
+            scene=self.scene,
+            rng_streams=self.rng_streams,
+            state=state and state["layers"].get("bg"),
+            fader_bank=self.fader_bank,
         )
         self.fg_controller = LayerController(
-            self.event_manager, layer_type="fg", scene=self.scene
+            self.event_manager,
+            layer_type="fg",
+            scene=self.scene,
+            rng_streams=self.rng_streams,
+            state=state and state["layers"].get("fg"),
+            fader_bank=self.fader_bank,
         )
         self.lights_controller = LightsController(
-            self.event_manager, scene=self.scene
+            self.event_manager, scene=self.scene, rng_streams=self.rng_streams
         )
         self.light_flicker_controller = LightFlickerController(
-            self.event_manager, self.simulation
+            self.event_manager, self.simulation, self.rng_streams
         )
-        # self.foley_controller = Audio_controller("foley")
-        # self.music_controller = Audio_controller("music")
-        self.quotes_controller = Audio_controller("quotes")
-        # self.foley_controller.set_scene(self.scene)
-        # self.music_controller.set_scene(self.scene)
-        control.init_uc_comms()
+        self.quotes_controller = None
+        self.audio_engine = None
+        self.audio_output = None
+        self.audio_prefetcher = None
+        if not headless:
+            # imported here so headless runs don't need an audio device
+            from .audio.assets import AssetCache
+            from .audio.engine import NULL_DEVICE, AudioEngine, NullOutput, SoundDeviceOutput
+            from .audio.prefetch import Prefetcher
+            from .audio.streaming import ReadAhead
+            from .controllers.audio_controller import OUTPUT_DEVICE, Audio_controller
+
+            # one output stream mixes the voices of every audio controller, one thread streams their files
+            # and one cache keeps the decoded one shots
+            self.audio_engine = AudioEngine()
+            self.audio_reader = ReadAhead(
+                samplerate=self.audio_engine.samplerate, blocksize=self.audio_engine.blocksize
+            )
+            self.audio_assets = AssetCache(samplerate=self.audio_engine.samplerate)
+            if audio_device is None:
+                audio_device = OUTPUT_DEVICE
+            if audio_device == NULL_DEVICE:
+                self.audio_output = NullOutput(self.audio_engine, realtime=True)
+            else:
+                self.audio_output = SoundDeviceOutput(self.audio_engine, device=audio_device)
+            self.audio_output.start()
+            # self.foley_controller = Audio_controller("foley", self.rng_streams, self.audio_engine, self.audio_reader, self.audio_assets)
+            # self.music_controller = Audio_controller("music", self.rng_streams, self.audio_engine, self.audio_reader, self.audio_assets)
+            self.quotes_controller = Audio_controller(
+                "quotes", self.rng_streams, self.audio_engine, self.audio_reader, self.audio_assets
+            )
+            # self.foley_controller.set_scene(self.scene)
+            # self.music_controller.set_scene(self.scene)
+            # warms the audio of the next scene before the show program switches to it
+            self.audio_prefetcher = Prefetcher([self.quotes_controller])
+            # self.audio_prefetcher = Prefetcher([self.quotes_controller, self.foley_controller, self.music_controller])
+            control.init_uc_comms()
         # this must happen after the serial port is initialized
-        self.flood_lights_controller = FloodLightsController(self.scene)
+        self.flood_lights_controller = FloodLightsController(
+            self.scene, colors=state and state["flood_lights"]
+        )
+
+        # output bindings replaced by modulation routes, restored when the routes are removed
+        self.routed_bindings = {}
+        self.modulation = None
+        self.set_modulation(self.create_modulation(show_config.MODULATION, show_config.MADMAPPER_CONFIG))
+
+        self.state_exporter = None
+        if shared_state_name is not None:
+            self.state_exporter = StateExporter(shared_state_name, self.simulation.config.keys())
+
+        self.show_config_watcher = None
+        if watch_show_config:
+            self.show_config_watcher = show_config.ShowConfigWatcher(
+                show_config_path or show_config.DEFAULT_SHOW_CONFIG_PATH
+            )
+
+        if state is not None:
+            # one burst that resends the restored state instead of the full reset
+            self.event_manager.add_event(
+                create_resync_event(
+                    self.bg_controller.get_cue_addresses() + self.fg_controller.get_cue_addresses()
+                )
+            )
+            self.event_manager.output.request_snapshot()
+
+    def load_snapshot(self):
+        """Reads the last snapshot, returns None when there is none or it can't be decoded."""
+        started = time.perf_counter()
+        payload = self.snapshot_store.read()
+        if payload is None:
+            return None
+        try:
+            state = decode_snapshot(payload)
+        except Exception as e:
+            print("Failed to decode snapshot:", e)
+            return None
+        print(f"restored snapshot in {(time.perf_counter() - started) * 1000.0:.2f}ms, scene={state['simulation']['scene']}")
+        return state
 
+    def get_state(self) -> dict:
+        return {
+            "simulation": self.simulation.get_state(),
+            "layers": {
+                "bg": self.bg_controller.get_state(),
+                "fg": self.fg_controller.get_state(),
+            },
+            "control_cache": control_cache.items(),
+            "flood_lights": self.flood_lights_controller.get_state(),
+        }
+
+    def save_snapshot(self):
+        self.snapshot_store.write(encode_snapshot(self.get_state()))
+
+    def create_modulation(self, spec: dict, madmapper: dict) -> ModulationMatrix:
+        return ModulationMatrix(
+            spec, madmapper, self.simulation.config.keys(), show_config.FLOOD_LIGHT_COUNT
+        )
+
+    def set_modulation(self, modulation: ModulationMatrix):
+        routed = set(modulation.address_ids.tolist())
+        for address_id in list(self.routed_bindings):
+            if address_id not in routed:
+                self.event_manager.output.bind(address_id, self.routed_bindings.pop(address_id))
+        for address_id in routed:
+            if address_id in self.event_manager.output.bindings:
+                self.routed_bindings[address_id] = self.event_manager.output.bindings[address_id]
+                self.event_manager.output.unbind(address_id)
+        if len(modulation.flood_lights) == 0:
+            # update() only sets routed gains, restore the flood lights to full brightness
+            self.flood_lights_controller.set_gains(modulation.flood_light_gains)
+        self.modulation = modulation
+
+    def reload_show_config(self, compiled: dict):
+        errors = show_config.reload_errors(compiled)
+        if errors:
+            print("show config not reloaded, restart required:", ", ".join(errors))
+            return
+        try:
+            modulation = self.create_modulation(compiled["modulation"], compiled["madmapper"])
+        except ValueError as e:
+            print("show config not reloaded:", e)
+            return
+        show_config.apply_show_config(compiled)
+        self.set_modulation(modulation)
+        self.bg_controller.reload_config()
+        self.fg_controller.reload_config()
+        self.flood_lights_controller.reload_config()
+        print("show config reloaded")
 
     def update(self, dt: float):
+        # swap in a changed show config at the frame boundary
+        if self.show_config_watcher is not None:
+            compiled = self.show_config_watcher.poll()
+            if compiled is not None:
+                self.reload_show_config(compiled)
+
+        # knob values set by the input threads since the last frame
+        self.simulation.apply_config()
+
         # try:
         #     new_ctrl_data = control.rx_uc_packet()
         #     received_data = False
@@ -108,6 +300,9 @@ class App:
             # self.foley_controller.set_scene(self.scene)
             # self.music_controller.set_scene(self.scene)
 
+        if self.audio_prefetcher is not None:
+            self.audio_prefetcher.update(self.simulation)
+
         # print(f"forest_health={self.simulation.forest_health.get_mean()}, scene={self.scene}, scene_intensity={self.simulation.scene_intensity}")
         
         # update controller continuous scene data every frame
@@ -118,10 +313,30 @@ class App:
         # update controllers
         self.bg_controller.update(dt, force=scene_changed)
         self.fg_controller.update(dt, force=scene_changed)
+        self.fader_bank.update(dt)
         self.lights_controller.update(dt)
+        # after the controllers so routes win over them
+        audio_energy = 0.0
+        if self.quotes_controller is not None:
+            audio_energy = self.quotes_controller.get_energy()
+            # audio_energy = max(audio_energy, self.foley_controller.get_energy(), self.music_controller.get_energy())
+        self.modulation.update(self.simulation, audio_energy)
+        if self.audio_engine is not None and len(self.modulation.audio_params) > 0:
+            self.modulation.update_audio(self.audio_engine.buses)
+        if len(self.modulation.flood_lights) > 0:
+            self.flood_lights_controller.set_gains(self.modulation.flood_light_gains)
         self.flood_lights_controller.update(dt)
         # self.foley_controller.update(self.scene, self.simulation)
         # self.music_controller.update(self.scene, self.simulation)
 
         # update the event manager last since the controllers may have added events
         self.event_manager.update(dt)
+
+        if self.state_exporter is not None:
+            self.state_exporter.publish(self.simulation)
+
+        if self.snapshot_store is not None:
+            self.snapshot_time += dt
+            if self.snapshot_time >= SNAPSHOT_INTERVAL_SECONDS:
+                self.snapshot_time = 0.0
+                self.save_snapshot()
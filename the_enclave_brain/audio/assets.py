@@ -0,0 +1,146 @@
+# decoded audio asset cache
+#
+# every file is decoded once into a float32 .npy file at the engine sample rate, keyed by its path, size and
+# modification time. later loads memory-map that file, so a voice reads the samples without decoding or copying.
+# the mapped assets are kept in an LRU under a RAM budget, evicted ones are unmapped and mapped again on the
+# next use. warm() faults an asset's pages in ahead of time.
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import soundfile as sf
+
+from .engine import SAMPLE_RATE
+
+DEFAULT_CACHE_DIR = "audio_cache"
+DEFAULT_RAM_BUDGET = 256 * 1024 * 1024
+PAGE_SIZE = 4096
+
+
+def resample(audio: np.ndarray, samplerate: int, target: int) -> np.ndarray:
+    """Linear interpolation to the target sample rate, frames x channels."""
+    length = int(len(audio) * target / samplerate)
+    positions = np.arange(length) * (samplerate / target)
+    frames = np.arange(len(audio))
+    return np.stack(
+        [np.interp(positions, frames, audio[:, c]).astype(np.float32) for c in range(audio.shape[1])],
+        axis=1,
+    )
+
+
+class AssetCacheStats:
+    """
+    Attributes:
+        hits (int): Loads served from the LRU.
+        maps (int): Loads that mapped an already decoded file.
+        decodes (int): Loads that had to decode the source file.
+        evictions (int): Assets dropped to stay under the budget.
+        last_load_ms (float): Time of the last load.
+        max_load_ms (float): Longest load.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.maps = 0
+        self.decodes = 0
+        self.evictions = 0
+        self.last_load_ms = 0.0
+        self.max_load_ms = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"hits={self.hits} maps={self.maps} decodes={self.decodes} evictions={self.evictions} "
+            f"last_load={self.last_load_ms:.3f}ms max_load={self.max_load_ms:.3f}ms"
+        )
+
+
+class AssetCache:
+    """
+    Decodes sound files once and serves them as read-only memory-mapped arrays.
+
+    Args:
+        cache_dir (str): Where the decoded files are written.
+        samplerate (int): The engine sample rate the assets are converted to.
+        budget (int): Bytes of mapped assets kept in the LRU, the most recent asset is always kept.
+
+    Attributes:
+        assets (OrderedDict): path -> mapped frames x channels float32 array, least recently used first.
+        resident (int): Bytes of the assets in the LRU.
+        stats (AssetCacheStats): Load counts and times.
+
+    Methods:
+        get(path: str) -> np.ndarray: The decoded samples of a file.
+        warm(path: str): Loads a file and touches every page so the next play doesn't fault.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, samplerate=SAMPLE_RATE, budget=DEFAULT_RAM_BUDGET):
+        self.cache_dir = cache_dir
+        self.samplerate = samplerate
+        self.budget = budget
+        self.assets = OrderedDict()
+        self.resident = 0
+        self.stats = AssetCacheStats()
+        # loads can come from the frame loop and from background threads
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def cache_path(self, path: str) -> str:
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}:{self.samplerate}"
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".npy")
+
+    def decode(self, path: str, cache_path: str):
+        audio, samplerate = sf.read(path, dtype="float32", always_2d=True)
+        if samplerate != self.samplerate:
+            audio = resample(audio, samplerate, self.samplerate)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, audio)
+        os.replace(tmp_path, cache_path)
+
+    def get(self, path: str) -> np.ndarray:
+        started = time.perf_counter()
+        with self.lock:
+            data = self.assets.get(path)
+            if data is not None:
+                self.assets.move_to_end(path)
+                self.stats.hits += 1
+                self.record_load(started)
+                return data
+
+        cache_path = self.cache_path(path)
+        if os.path.exists(cache_path):
+            self.stats.maps += 1
+        else:
+            self.decode(path, cache_path)
+            self.stats.decodes += 1
+        data = np.load(cache_path, mmap_mode="r")
+
+        with self.lock:
+            if path not in self.assets:
+                self.assets[path] = data
+                self.resident += data.nbytes
+                self.evict()
+            self.record_load(started)
+        return data
+
+    def evict(self):
+        while self.resident > self.budget and len(self.assets) > 1:
+            _, data = self.assets.popitem(last=False)
+            # voices still playing it keep their own reference to the mapping
+            self.resident -= data.nbytes
+            self.stats.evictions += 1
+
+    def record_load(self, started: float):
+        self.stats.last_load_ms = (time.perf_counter() - started) * 1000.0
+        self.stats.max_load_ms = max(self.stats.max_load_ms, self.stats.last_load_ms)
+
+    def warm(self, path: str):
+        data = self.get(path)
+        # one read per page pulls the whole file into the page cache
+        flat = data.reshape(-1)
+        flat[:: PAGE_SIZE // flat.itemsize].sum()
@@ -0,0 +1,506 @@
+# audio mixing engine
+#
+# one persistent output stream whose callback sums every playing voice into a preallocated buffer.
+# voices are started, stopped and faded by messages the callback picks up at the start of each block,
+# so the frame loop never creates threads or streams and never blocks on the audio device.
+# fades, volume changes and stops are gain envelopes computed per block while mixing, the source
+# samples are never modified, and a stop costs the frame loop a single queued message.
+# voices can be routed to a bus, which sums them and runs its effects chain once per block on the sum,
+# so effects cost per bus instead of per voice.
+
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+BLOCK_SIZE = 1024
+# time constant of the smoothing of bus effect parameters
+PARAM_SMOOTHING_S = 0.05
+# output device name that selects the NullOutput
+NULL_DEVICE = "null"
+
+
+class ArraySource:
+    """
+    Samples held in memory, frames x channels float32 at the engine sample rate.
+    The samples are only ever read, fades and volume are applied to a copy while mixing, so one array
+    can back any number of voices.
+
+    Attributes:
+        length (int): The number of frames.
+        channels (int): The number of channels.
+        done (bool): Set by the engine when the voice playing it finished.
+    """
+
+    def __init__(self, data: np.ndarray):
+        if data.ndim == 1:
+            data = data[:, np.newaxis]
+        # a read-only view, writing into a shared asset raises instead of changing every voice playing it
+        data = data.view()
+        data.flags.writeable = False
+        self.data = data
+        self.length = len(data)
+        self.channels = data.shape[1]
+        self.done = False
+
+    def read(self, position: int, frames: int) -> np.ndarray:
+        return self.data[position : position + frames]
+
+
+class Voice:
+    """
+    A sound playing on the engine. Created by AudioEngine.play, only the audio callback changes it afterwards,
+    the frame loop reads position and done.
+
+    Attributes:
+        name (str): A label for logging, usually the file name.
+        source (ArraySource, StreamingSource): Where the samples are read from, at the engine sample rate.
+        length (int): The number of frames to play.
+        position (int): The next frame to play.
+        gain (float): The current gain.
+        target (float): The gain the envelope is ramping to.
+        step (float): The gain change per frame while ramping.
+        ramp_left (int): The frames left in the current ramp.
+        fade_out (int): Frames before the end where the voice fades out by itself.
+        stopping (bool): Whether the voice ends when its ramp reaches zero.
+        bus (Bus): The bus the voice is mixed into, None for the main mix.
+        requested (float): perf_counter time the voice was asked for, for the start latency.
+        done (bool): Whether the voice finished, it is removed from the mix.
+    """
+
+    __slots__ = [
+        "name",
+        "source",
+        "length",
+        "position",
+        "gain",
+        "target",
+        "step",
+        "ramp_left",
+        "fade_out",
+        "stopping",
+        "bus",
+        "requested",
+        "done",
+    ]
+
+    def __init__(self, name: str, source, gain=1.0, fade_in=0, fade_out=0, bus=None, requested=None):
+        self.name = name
+        self.source = source
+        self.length = source.length
+        self.position = 0
+        self.gain = 0.0 if fade_in > 0 else gain
+        self.target = gain
+        self.step = gain / fade_in if fade_in > 0 else 0.0
+        self.ramp_left = fade_in
+        self.fade_out = min(fade_out, self.length)
+        self.stopping = False
+        self.bus = bus
+        self.requested = requested
+        self.done = False
+
+    @property
+    def remaining(self) -> int:
+        return self.length - self.position
+
+    def ramp_to(self, target: float, frames: int):
+        if frames <= 0:
+            self.gain = target
+            self.target = target
+            self.ramp_left = 0
+            return
+        self.target = target
+        self.step = (target - self.gain) / frames
+        self.ramp_left = frames
+
+
+class Bus:
+    """
+    A submix with an effects chain, run once per block on the sum of its voices.
+
+    Effect parameters are set from the frame loop with set_param and glide to the new value in the audio callback,
+    so knob moves neither click nor race with the chain being processed.
+
+    Attributes:
+        name (str): The bus name, e.g. "music".
+        effects (Pedalboard): The effects chain, None or empty to pass the sum through.
+        buffer (np.ndarray): The sum of the bus's voices for the current block.
+        targets (dict): (effect index, attribute) -> the value the parameter glides to.
+        values (dict): (effect index, attribute) -> the value last applied to the effect.
+
+    Methods:
+        set_param(effect: int, attribute: str, value: float): Sets the target of an effect parameter.
+    """
+
+    def __init__(self, name: str, effects=None, frames=BLOCK_SIZE, channels=CHANNELS):
+        self.name = name
+        self.effects = effects
+        self.buffer = np.zeros((frames, channels), dtype=np.float32)
+        self.targets = {}
+        self.values = {}
+
+    def set_param(self, effect: int, attribute: str, value: float):
+        # a single dict store, the callback reads whichever value is there at the start of its block
+        self.targets[(effect, attribute)] = float(value)
+
+    def smooth(self, coefficient: float):
+        """Moves every parameter one block closer to its target, called by the audio callback."""
+        for key, target in list(self.targets.items()):
+            current = self.values.get(key)
+            if current == target:
+                continue
+            if current is None or abs(target - current) <= 1e-4 * max(1.0, abs(target)):
+                current = target
+            else:
+                current += (target - current) * coefficient
+            self.values[key] = current
+            setattr(self.effects[key[0]], key[1], current)
+
+    def process(self, frames: int, samplerate: int, coefficient: float) -> np.ndarray:
+        out = self.buffer[:frames]
+        if self.effects is None or len(self.effects) == 0:
+            return out
+        if self.targets:
+            self.smooth(coefficient)
+        # effects with a tail (reverb, delay) keep ringing after the last voice stopped
+        return self.effects(out, samplerate, reset=False)
+
+
+class EngineStats:
+    """
+    Timing of the audio callback.
+
+    Attributes:
+        blocks (int): The number of rendered blocks.
+        xruns (int): Output underflows reported by the device.
+        deadline_misses (int): Blocks that took longer to render than they last.
+        last_ms (float): Render time of the last block.
+        max_ms (float): Longest render time.
+        total_s (float): Total render time.
+        rendered_s (float): Total audio rendered.
+        last_start_ms (float): Time from the request of the last started voice to its first block being mixed.
+        max_start_ms (float): Longest start latency.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.blocks = 0
+        self.xruns = 0
+        self.deadline_misses = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.total_s = 0.0
+        self.rendered_s = 0.0
+        self.last_start_ms = 0.0
+        self.max_start_ms = 0.0
+
+    @property
+    def load(self) -> float:
+        """The fraction of realtime spent rendering."""
+        return self.total_s / self.rendered_s if self.rendered_s > 0.0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"blocks={self.blocks} xruns={self.xruns} deadline_misses={self.deadline_misses} "
+            f"last={self.last_ms:.3f}ms max={self.max_ms:.3f}ms load={self.load * 100.0:.2f}% "
+            f"start={self.last_start_ms:.3f}ms max_start={self.max_start_ms:.3f}ms"
+        )
+
+
+class AudioEngine:
+    """
+    Mixes all voices into one output.
+
+    The frame loop talks to the engine only through play, stop and set_gain, which queue a message.
+    The output's callback drains the messages, renders every voice with its gain envelope and sums them.
+
+    Args:
+        samplerate (int): The output sample rate, voices must be at this rate.
+        channels (int): The number of output channels.
+        blocksize (int): The expected block size, buffers grow if the device asks for more.
+
+    Attributes:
+        voices (list[Voice]): The voices being mixed, only touched by the audio callback.
+        buses (dict): name -> Bus.
+        stats (EngineStats): Callback timing.
+
+    Methods:
+        add_bus(name: str, effects: Pedalboard) -> Bus: Creates a bus, or returns the existing one with that name.
+        play(name, source, gain, fade_in, fade_out, bus, requested) -> Voice: Starts a voice from a source or
+            an array on a bus (name or Bus, None for the main mix), fades are in seconds.
+            requested is when the sound was asked for, defaults to now.
+        stop(voice: Voice, fade: float): Fades a voice out and removes it.
+        set_gain(voice: Voice, gain: float, fade: float): Ramps the gain of a voice.
+        render(frames: int) -> np.ndarray: Mixes the next block, called by the output.
+        callback(outdata, frames, time_info, status): A sounddevice stream callback.
+    """
+
+    def __init__(self, samplerate=SAMPLE_RATE, channels=CHANNELS, blocksize=BLOCK_SIZE):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.blocksize = blocksize
+        self.voices = []
+        # deque appends and pops are atomic, the frame loop never waits on the audio thread
+        self.messages = deque()
+        self.stats = EngineStats()
+        self.buses = {}
+        # replaced rather than appended to, the callback iterates whichever list it read
+        self.bus_list = []
+        self.allocate(blocksize)
+
+    def allocate(self, frames: int):
+        self.mix = np.zeros((frames, self.channels), dtype=np.float32)
+        for bus in self.bus_list:
+            bus.buffer = np.zeros((frames, self.channels), dtype=np.float32)
+        self.scratch = np.zeros((frames, self.channels), dtype=np.float32)
+        self.envelope = np.zeros(frames, dtype=np.float32)
+        self.ramp = np.arange(1, frames + 1, dtype=np.float32)
+
+    def seconds_to_frames(self, seconds: float) -> int:
+        return int(seconds * self.samplerate)
+
+    def add_bus(self, name: str, effects=None) -> Bus:
+        if name in self.buses:
+            return self.buses[name]
+        bus = Bus(name, effects, frames=len(self.mix), channels=self.channels)
+        self.buses[name] = bus
+        self.bus_list = self.bus_list + [bus]
+        return bus
+
+    def play(
+        self, name: str, source, gain=1.0, fade_in=0.0, fade_out=0.0, bus=None, requested=None
+    ) -> Voice:
+        if isinstance(bus, str):
+            bus = self.buses[bus]
+        if requested is None:
+            requested = time.perf_counter()
+        if isinstance(source, np.ndarray):
+            source = ArraySource(source)
+        voice = Voice(
+            name,
+            source,
+            gain=gain,
+            fade_in=self.seconds_to_frames(fade_in),
+            fade_out=self.seconds_to_frames(fade_out),
+            bus=bus,
+            requested=requested,
+        )
+        self.messages.append(("play", voice))
+        return voice
+
+    def stop(self, voice: Voice, fade=0.0):
+        self.messages.append(("stop", voice, self.seconds_to_frames(fade)))
+
+    def set_gain(self, voice: Voice, gain: float, fade=0.0):
+        self.messages.append(("gain", voice, gain, self.seconds_to_frames(fade)))
+
+    def handle_messages(self):
+        messages = self.messages
+        while messages:
+            message = messages.popleft()
+            kind, voice = message[0], message[1]
+            if kind == "play":
+                self.voices.append(voice)
+            elif voice.done:
+                continue
+            elif kind == "stop":
+                voice.stopping = True
+                voice.ramp_to(0.0, min(message[2], voice.remaining))
+                if voice.ramp_left == 0:
+                    voice.done = True
+                    voice.source.done = True
+            elif kind == "gain" and not voice.stopping:
+                voice.ramp_to(message[2], message[3])
+
+    def render_voice(self, voice: Voice, frames: int):
+        n = min(frames, voice.remaining)
+        if (
+            not voice.stopping
+            and voice.fade_out > 0
+            and voice.remaining - n < voice.fade_out
+        ):
+            # fade out over the end of the sound
+            voice.stopping = True
+            voice.ramp_to(0.0, voice.remaining)
+        chunk = voice.source.read(voice.position, n)
+        out = self.scratch[:n]
+
+        if voice.ramp_left > 0:
+            ramp = min(n, voice.ramp_left)
+            envelope = self.envelope[:n]
+            np.multiply(self.ramp[:ramp], voice.step, out=envelope[:ramp])
+            envelope[:ramp] += voice.gain
+            envelope[ramp:] = voice.target
+            voice.ramp_left -= ramp
+            voice.gain = voice.target if voice.ramp_left == 0 else float(envelope[ramp - 1])
+            np.multiply(chunk, envelope[:, np.newaxis], out=out)
+        elif voice.gain != 1.0:
+            np.multiply(chunk, voice.gain, out=out)
+        else:
+            out[:] = chunk
+
+        if voice.bus is not None:
+            voice.bus.buffer[:n] += out
+        else:
+            self.mix[:n] += out
+        if voice.position == 0 and voice.requested is not None:
+            stats = self.stats
+            stats.last_start_ms = (time.perf_counter() - voice.requested) * 1000.0
+            stats.max_start_ms = max(stats.max_start_ms, stats.last_start_ms)
+        voice.position += n
+        if voice.position >= voice.length or (voice.stopping and voice.ramp_left == 0):
+            voice.done = True
+            # lets a streaming source's reader close the file
+            voice.source.done = True
+
+    def render(self, frames: int) -> np.ndarray:
+        started = time.perf_counter()
+        if frames > len(self.mix):
+            self.allocate(frames)
+        self.handle_messages()
+
+        mix = self.mix[:frames]
+        mix.fill(0.0)
+        buses = self.bus_list
+        for bus in buses:
+            bus.buffer[:frames].fill(0.0)
+        for voice in self.voices:
+            self.render_voice(voice, frames)
+        if any(voice.done for voice in self.voices):
+            self.voices = [voice for voice in self.voices if not voice.done]
+        if buses:
+            coefficient = 1.0 - math.exp(-frames / (PARAM_SMOOTHING_S * self.samplerate))
+            for bus in buses:
+                mix += bus.process(frames, self.samplerate, coefficient)
+
+        elapsed = time.perf_counter() - started
+        duration = frames / self.samplerate
+        stats = self.stats
+        stats.blocks += 1
+        stats.last_ms = elapsed * 1000.0
+        stats.max_ms = max(stats.max_ms, stats.last_ms)
+        stats.total_s += elapsed
+        stats.rendered_s += duration
+        if elapsed > duration:
+            stats.deadline_misses += 1
+        return mix
+
+    def callback(self, outdata, frames, time_info, status):
+        if status and status.output_underflow:
+            self.stats.xruns += 1
+        outdata[:] = self.render(frames)
+
+
+class SoundDeviceOutput:
+    """
+    Runs an engine on a persistent sounddevice output stream.
+
+    Args:
+        engine (AudioEngine): The engine to render.
+        device (str): The output device name.
+
+    Methods:
+        start(): Opens and starts the stream.
+        close(): Stops and closes the stream.
+    """
+
+    def __init__(self, engine: AudioEngine, device=None):
+        self.engine = engine
+        self.device = device
+        self.stream = None
+
+    def start(self):
+        # imported here so headless runs and offline tools don't need PortAudio
+        import sounddevice as sd
+
+        self.stream = sd.OutputStream(
+            samplerate=self.engine.samplerate,
+            channels=self.engine.channels,
+            blocksize=self.engine.blocksize,
+            dtype="float32",
+            device=self.device,
+            callback=self.engine.callback,
+        )
+        self.stream.start()
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+
+class NullOutput:
+    """
+    Runs an engine without an audio device.
+
+    Offline, render() mixes as fast as the engine can into an array, for tests, benchmarks and bouncing to a file.
+    With realtime set, start() runs a thread that renders a block every block duration and discards it,
+    so the installation runs on a machine without the output device.
+
+    Args:
+        engine (AudioEngine): The engine to render.
+        realtime (bool): Whether start() paces the engine like a device.
+
+    Methods:
+        start(): Starts the realtime thread, does nothing offline.
+        close(): Stops the realtime thread.
+        render(seconds: float, before_block) -> np.ndarray: Renders the next seconds of audio,
+            frames x channels float32. before_block() is called before every block, e.g. to pump a ReadAhead.
+        write(path: str, seconds: float, before_block): Renders to a float WAV file.
+    """
+
+    def __init__(self, engine: AudioEngine, realtime=False):
+        self.engine = engine
+        self.realtime = realtime
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if not self.realtime:
+            return
+        self.thread = threading.Thread(target=self.run, name="audio-null-output", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        engine = self.engine
+        duration = engine.blocksize / engine.samplerate
+        next_block = time.perf_counter()
+        while not self.stopped.is_set():
+            engine.render(engine.blocksize)
+            next_block += duration
+            delay = next_block - time.perf_counter()
+            if delay > 0.0:
+                self.stopped.wait(delay)
+            else:
+                # fell behind like a device would underflow, don't try to catch up
+                engine.stats.xruns += 1
+                next_block = time.perf_counter()
+
+    def close(self):
+        if self.thread is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.thread = None
+
+    def render(self, seconds: float, before_block=None) -> np.ndarray:
+        engine = self.engine
+        frames = int(seconds * engine.samplerate)
+        out = np.zeros((frames, engine.channels), dtype=np.float32)
+        for start in range(0, frames, engine.blocksize):
+            if before_block is not None:
+                before_block()
+            n = min(engine.blocksize, frames - start)
+            out[start : start + n] = engine.render(n)
+        return out
+
+    def write(self, path: str, seconds: float, before_block=None):
+        import soundfile as sf
+
+        sf.write(path, self.render(seconds, before_block), self.engine.samplerate, subtype="FLOAT")
@@ -0,0 +1,115 @@
+# precomputed audio envelopes
+#
+# tools/index_audio.py measures every file of the library once: an RMS and peak envelope at ENVELOPE_RATE values
+# per second, the duration and the overall loudness. everything is stored in one index file at the library root:
+#
+#   MAGIC (8 bytes) | header length (uint64 little endian) | json header | padding | float32 frames x [rms, peak]
+#
+# the header maps each file's path relative to the root to its slice of the envelope data. loading the index is one
+# json parse and one memory map, the energy of a playing voice is then a single array lookup per frame.
+
+import json
+import os
+
+import numpy as np
+
+ENVELOPE_RATE = 30
+INDEX_NAME = "envelope_index.bin"
+MAGIC = b"ENVIDX01"
+# the envelope data starts on this boundary
+ALIGNMENT = 16
+RMS, PEAK = 0, 1
+
+
+def compute_envelope(audio: np.ndarray, samplerate: int, rate=ENVELOPE_RATE) -> np.ndarray:
+    """Returns the RMS and peak of each 1 / rate seconds of frames x channels audio, frames x 2 float32."""
+    frames = max(1, int(np.ceil(len(audio) * rate / samplerate)))
+    if len(audio) == 0:
+        return np.zeros((1, 2), dtype=np.float32)
+    starts = (np.arange(frames) * samplerate / rate).astype(np.intp)
+    counts = np.diff(np.append(starts, len(audio)))
+    power = np.square(audio, dtype=np.float64).mean(axis=1)
+    envelope = np.empty((frames, 2), dtype=np.float32)
+    envelope[:, RMS] = np.sqrt(np.add.reduceat(power, starts) / counts)
+    envelope[:, PEAK] = np.maximum.reduceat(np.abs(audio).max(axis=1), starts)
+    return envelope
+
+
+def write_index(path: str, assets: dict, envelopes: list, rate=ENVELOPE_RATE):
+    """Writes an index. assets maps a relative path to its metadata, envelopes are in the same order."""
+    offset = 0
+    for entry, envelope in zip(assets.values(), envelopes):
+        entry["offset"] = offset
+        entry["frames"] = len(envelope)
+        offset += len(envelope)
+    header = json.dumps({"rate": rate, "assets": assets}).encode()
+    start = len(MAGIC) + 8 + len(header)
+    padding = -start % ALIGNMENT
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.array(len(header), dtype="<u8").tobytes())
+        f.write(header)
+        f.write(b"\0" * padding)
+        for envelope in envelopes:
+            f.write(np.ascontiguousarray(envelope, dtype="<f4").tobytes())
+    os.replace(tmp_path, path)
+
+
+class EnvelopeIndex:
+    """
+    The envelopes and loudness of every file of an audio library, memory-mapped.
+
+    Args:
+        path (str): The index file.
+
+    Attributes:
+        root (str): The library folder the asset paths are relative to.
+        rate (int): Envelope values per second.
+        assets (dict): relative path -> {"offset", "frames", "duration", "rms_db", "peak_db", "size", "mtime_ns"}.
+        data (np.memmap): All envelopes, frames x [rms, peak].
+
+    Methods:
+        find(path: str) -> tuple: (offset, frames) of a file's envelope, None if the file isn't indexed or changed.
+        energy(entry: tuple, seconds: float, column: int) -> float: The RMS (or peak) of a file at a time.
+    """
+
+    def __init__(self, path: str):
+        self.root = os.path.dirname(os.path.abspath(path))
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"not an envelope index: {path}")
+            length = int(np.frombuffer(f.read(8), dtype="<u8")[0])
+            header = json.loads(f.read(length))
+        self.rate = header["rate"]
+        self.assets = header["assets"]
+        start = len(MAGIC) + 8 + length
+        start += -start % ALIGNMENT
+        frames = sum(entry["frames"] for entry in self.assets.values())
+        if frames == 0:
+            self.data = np.zeros((0, 2), dtype=np.float32)
+        else:
+            self.data = np.memmap(path, dtype="<f4", mode="r", offset=start, shape=(frames, 2))
+
+    def find(self, path: str):
+        entry = self.assets.get(os.path.relpath(os.path.abspath(path), self.root))
+        if entry is None:
+            return None
+        stat = os.stat(path)
+        if stat.st_size != entry["size"] or stat.st_mtime_ns != entry["mtime_ns"]:
+            # the file changed since it was indexed
+            return None
+        return entry["offset"], entry["frames"]
+
+    def energy(self, entry: tuple, seconds: float, column=RMS) -> float:
+        offset, frames = entry
+        frame = min(max(int(seconds * self.rate), 0), frames - 1)
+        return float(self.data[offset + frame, column])
+
+
+def load_envelope_index(root: str):
+    """Loads the index of the library at root, None when it hasn't been indexed."""
+    path = os.path.join(root, INDEX_NAME)
+    if not os.path.exists(path):
+        return None
+    return EnvelopeIndex(path)
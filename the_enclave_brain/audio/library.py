@@ -0,0 +1,174 @@
+# scene audio library
+#
+# every scene folder is scanned once into an index of its playable files with their metadata. an index
+# rescans only when its folder's modification time changes, which costs one stat per lookup instead of a
+# directory listing and a header parse per file.
+#
+# the files of an index are kept partitioned, available files first, so picking a file that isn't already
+# playing is a single random draw and marking a file playing or stopped is a swap.
+#
+# when the library has been normalized (python3 -m the_enclave_brain.tools.normalize_audio) the controllers
+# read the normalized copy, every file of which is already in the engine's format.
+
+import json
+import os
+
+import soundfile as sf
+
+# lower case extensions libsndfile can read, anything else in a folder (.DS_Store, notes, ...) is skipped
+AUDIO_EXTENSIONS = {"." + extension.lower() for extension in sf.available_formats()}
+
+NORMALIZED_FOLDER = "normalized_audio"
+MANIFEST_NAME = "manifest.json"
+
+
+class AudioFileInfo:
+    """The metadata of a playable file, read from its header."""
+
+    __slots__ = ["path", "frames", "samplerate", "channels", "duration"]
+
+    def __init__(self, path: str, frames: int, samplerate: int, channels: int):
+        self.path = path
+        self.frames = frames
+        self.samplerate = samplerate
+        self.channels = channels
+        self.duration = frames / samplerate if samplerate > 0 else 0.0
+
+
+def is_audio_file(filename: str) -> bool:
+    return not filename.startswith(".") and os.path.splitext(filename)[1].lower() in AUDIO_EXTENSIONS
+
+
+def normalized_root(root: str, samplerate: int, channels: int) -> str:
+    """Returns the normalized copy of the library under root if it matches the engine's format, else root."""
+    manifest_path = os.path.join(root, NORMALIZED_FOLDER, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        print("audio library is not normalized, files will be converted while loading")
+        return root
+    with open(manifest_path) as f:
+        format = json.load(f)["format"]
+    if format["samplerate"] != samplerate or format["channels"] != channels:
+        print(
+            f"normalized audio is {format['samplerate']}Hz {format['channels']}ch but the engine runs "
+            f"{samplerate}Hz {channels}ch, using the original files"
+        )
+        return root
+    return os.path.join(root, NORMALIZED_FOLDER)
+
+
+class SceneIndex:
+    """
+    The playable files of one folder.
+
+    Args:
+        path (str): The folder.
+
+    Attributes:
+        names (list[str]): The file names, sorted.
+        info (dict): file name -> AudioFileInfo.
+        available (int): The number of files that aren't playing.
+
+    Methods:
+        refresh(): Rescans the folder if it changed since the last scan.
+        pick(rng: random.Random) -> str: A random file that isn't playing, any file if all of them are playing,
+            None if the folder is empty.
+        mark_playing(filename: str): Excludes a file from pick.
+        mark_stopped(filename: str): Makes a file available to pick again.
+        is_available(filename: str) -> bool: Whether a file is indexed and not playing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.mtime = None
+        self.names = []
+        self.info = {}
+        # files[:available] are available, files[available:] are playing
+        self.files = []
+        self.slots = {}
+        self.available = 0
+        self.refresh()
+
+    def refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            if self.mtime != -1:
+                print(f"audio folder not found: {self.path}")
+            mtime = -1
+        if mtime == self.mtime:
+            return
+        self.mtime = mtime
+
+        info = {}
+        if mtime != -1:
+            for filename in sorted(os.listdir(self.path)):
+                if not is_audio_file(filename):
+                    continue
+                if filename in self.info:
+                    info[filename] = self.info[filename]
+                    continue
+                filepath = os.path.join(self.path, filename)
+                try:
+                    header = sf.info(filepath)
+                except RuntimeError as e:
+                    print(f"skipping unreadable audio file {filepath}:", e)
+                    continue
+                info[filename] = AudioFileInfo(filepath, header.frames, header.samplerate, header.channels)
+
+        playing = set(self.files[self.available :])
+        self.info = info
+        self.names = list(info)
+        self.files = [name for name in self.names if name not in playing]
+        self.available = len(self.files)
+        self.files += [name for name in self.names if name in playing]
+        self.slots = {name: i for i, name in enumerate(self.files)}
+
+    def swap(self, i: int, j: int):
+        files = self.files
+        files[i], files[j] = files[j], files[i]
+        self.slots[files[i]] = i
+        self.slots[files[j]] = j
+
+    def pick(self, rng):
+        if len(self.files) == 0:
+            return None
+        if self.available == 0:
+            # every file is already playing, repeat one rather than go silent
+            return self.files[rng.randrange(len(self.files))]
+        return self.files[rng.randrange(self.available)]
+
+    def is_available(self, filename: str) -> bool:
+        i = self.slots.get(filename)
+        return i is not None and i < self.available
+
+    def mark_playing(self, filename: str):
+        i = self.slots.get(filename)
+        if i is not None and i < self.available:
+            self.available -= 1
+            self.swap(i, self.available)
+
+    def mark_stopped(self, filename: str):
+        i = self.slots.get(filename)
+        if i is not None and i >= self.available:
+            self.swap(i, self.available)
+            self.available += 1
+
+
+class AudioLibrary:
+    """
+    The scene indexes of one sound type.
+
+    Args:
+        paths (dict): scene -> folder.
+
+    Methods:
+        scene(scene: str) -> SceneIndex: The index of a scene's folder, refreshed if the folder changed.
+    """
+
+    def __init__(self, paths: dict):
+        self.indexes = {scene: SceneIndex(path) for scene, path in paths.items()}
+
+    def scene(self, scene: str) -> SceneIndex:
+        index = self.indexes[scene]
+        index.refresh()
+        return index
@@ -0,0 +1,96 @@
+# scene-ahead audio prefetch
+#
+# the show program knows the next scene and when it's due (SceneProgram.predict_next). shortly before the switch the
+# prefetcher asks every audio controller which files the new scene will start, and a background thread warms them:
+# decoded assets are decoded and paged in, streamed files have their first seconds read into the page cache. when
+# the scene changes the controllers start the files they picked, which are then served from memory.
+#
+# guarded transitions (events, knob driven scenes) can't be predicted, their scene changes load as before.
+
+import threading
+from collections import deque
+
+from .streaming import READ_AHEAD_SECONDS
+
+# seconds before the predicted scene change the files are warmed
+PREFETCH_LEAD_S = 10.0
+# bytes read at a time when warming a file
+WARM_CHUNK = 1024 * 1024
+
+
+def warm_file(path: str, nbytes: int):
+    """Reads the first nbytes of a file so opening and priming it later doesn't wait on the disk."""
+    with open(path, "rb") as f:
+        while nbytes > 0 and len(f.read(min(WARM_CHUNK, nbytes))) > 0:
+            nbytes -= WARM_CHUNK
+
+
+def stream_bytes(info, seconds=READ_AHEAD_SECONDS) -> int:
+    """An upper bound of the bytes of a file's first seconds (up to 64 bit samples), the header included."""
+    return int(seconds * info.samplerate * info.channels * 8) + 64 * 1024
+
+
+class Prefetcher:
+    """
+    Warms the audio of the next scene in the background ahead of the scene change.
+
+    Args:
+        controllers (list[Audio_controller]): The controllers to prefetch for.
+        lead_time (float): Seconds before the predicted scene change to start warming.
+
+    Attributes:
+        scene (str): The scene the files were last prefetched for, reset on every scene change.
+        warmed (int): The number of files warmed.
+
+    Methods:
+        update(simulation: Simulation): Checks the predicted next scene, called every frame.
+        stop(): Stops the background thread.
+    """
+
+    def __init__(self, controllers: list, lead_time=PREFETCH_LEAD_S):
+        self.controllers = [controller for controller in controllers if controller is not None]
+        self.lead_time = lead_time
+        self.current_scene = None
+        self.scene = None
+        self.warmed = 0
+        # (controller, AudioFileInfo) to warm, appended by the frame loop, popped by the thread
+        self.jobs = deque()
+        self.wake = threading.Event()
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name="audio-prefetch", daemon=True)
+        self.thread.start()
+
+    def update(self, simulation):
+        if simulation.scene != self.current_scene:
+            self.current_scene = simulation.scene
+            self.scene = None
+        if self.scene is not None:
+            return
+        prediction = simulation.program.predict_next(simulation)
+        if prediction is None:
+            return
+        scene, seconds = prediction
+        if seconds > self.lead_time:
+            return
+        self.scene = scene
+        for controller in self.controllers:
+            for info in controller.prefetch(scene):
+                self.jobs.append((controller, info))
+        self.wake.set()
+
+    def run(self):
+        while not self.stopped:
+            self.wake.wait()
+            self.wake.clear()
+            while self.jobs:
+                controller, info = self.jobs.popleft()
+                try:
+                    controller.warm(info)
+                    self.warmed += 1
+                except (OSError, RuntimeError) as e:
+                    print(f"could not prefetch {info.path}:", e)
+
+    def stop(self):
+        self.stopped = True
+        self.wake.set()
+        self.thread.join()
@@ -0,0 +1,168 @@
+# disk streaming voices
+#
+# a streaming source keeps a bounded ring buffer of the next few seconds of a file. one read-ahead thread
+# tops up the rings of every open source, the audio callback only copies out of them, so start latency and
+# memory don't depend on the length of the track.
+
+import threading
+
+import numpy as np
+import soundfile as sf
+
+from .engine import BLOCK_SIZE
+
+# seconds buffered ahead of the playhead per source
+READ_AHEAD_SECONDS = 2.0
+# frames read from disk at a time
+READ_CHUNK = 8192
+# seconds between read-ahead passes, well below READ_AHEAD_SECONDS
+READ_INTERVAL = 0.02
+# frames read synchronously on open so the first blocks never wait for the thread
+PRIME_FRAMES = 4 * BLOCK_SIZE
+
+
+class StreamingSource:
+    """
+    Plays a sound file from a ring buffer filled by a ReadAhead thread.
+
+    The ring is single producer (the read-ahead thread) single consumer (the audio callback), each side only
+    advances its own counter after copying, so no lock is needed.
+
+    Args:
+        path (str): The sound file, at the engine sample rate.
+        capacity (int): The ring size in frames.
+        blocksize (int): The largest block the engine reads at once.
+
+    Attributes:
+        length (int): The number of frames in the file.
+        channels (int): The number of channels.
+        samplerate (int): The file's sample rate.
+        written (int): Frames read from the file so far.
+        consumed (int): Frames handed to the engine so far.
+        underruns (int): Blocks the ring couldn't fill, the missing frames are played as silence.
+        done (bool): Set by the engine when the voice finished, the read-ahead thread then closes the file.
+    """
+
+    def __init__(self, path: str, capacity: int, blocksize=BLOCK_SIZE):
+        self.path = path
+        self.file = sf.SoundFile(path)
+        self.length = self.file.frames
+        self.channels = self.file.channels
+        self.samplerate = self.file.samplerate
+        self.capacity = capacity
+        self.ring = np.zeros((capacity, self.channels), dtype=np.float32)
+        self.out = np.zeros((blocksize, self.channels), dtype=np.float32)
+        self.written = 0
+        self.consumed = 0
+        self.underruns = 0
+        self.done = False
+
+    @property
+    def buffered(self) -> int:
+        return self.written - self.consumed
+
+    def fill(self, frames: int) -> int:
+        """Reads up to frames into the ring, returns how many were read. Called by the read-ahead thread."""
+        frames = min(frames, self.capacity - self.buffered, self.length - self.written)
+        if frames <= 0:
+            return 0
+        start = self.written % self.capacity
+        first = min(frames, self.capacity - start)
+        read = self.file.read(out=self.ring[start : start + first])
+        if frames > first:
+            read = len(read) + len(self.file.read(out=self.ring[: frames - first]))
+        else:
+            read = len(read)
+        self.written += read
+        return read
+
+    def read(self, position: int, frames: int) -> np.ndarray:
+        """Returns the next frames, called by the audio callback."""
+        if frames > len(self.out):
+            self.out = np.zeros((frames, self.channels), dtype=np.float32)
+        out = self.out[:frames]
+        n = min(frames, self.buffered)
+        start = self.consumed % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self.ring[start : start + first]
+        if n > first:
+            out[first:n] = self.ring[: n - first]
+        if n < frames:
+            self.underruns += 1
+            out[n:] = 0.0
+        self.consumed += n
+        return out
+
+    def close(self):
+        self.file.close()
+
+
+class ReadAhead:
+    """
+    A background thread keeping the ring buffers of all open streaming sources topped up.
+
+    Args:
+        seconds (float): Seconds buffered per source.
+        samplerate (int): The engine sample rate.
+        blocksize (int): The engine block size.
+        background (bool): Whether to start the thread. Offline renders run faster than realtime and call
+            pump() before every block instead.
+
+    Attributes:
+        sources (list[StreamingSource]): The open sources.
+
+    Methods:
+        open(path: str) -> StreamingSource: Opens a file and primes its first blocks.
+        pump(): Tops up every source and closes the finished ones.
+        stop(): Stops the thread and closes every source.
+    """
+
+    def __init__(self, seconds=READ_AHEAD_SECONDS, samplerate=44100, blocksize=BLOCK_SIZE, background=True):
+        self.capacity = int(seconds * samplerate)
+        self.blocksize = blocksize
+        self.sources = []
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        if background:
+            self.thread = threading.Thread(target=self.run, name="audio-read-ahead", daemon=True)
+            self.thread.start()
+
+    def open(self, path: str) -> StreamingSource:
+        source = StreamingSource(path, self.capacity, self.blocksize)
+        source.fill(PRIME_FRAMES)
+        with self.lock:
+            self.sources.append(source)
+        return source
+
+    def run(self):
+        while not self.stopped.wait(READ_INTERVAL):
+            self.pump()
+
+    def pump(self):
+        with self.lock:
+            sources = list(self.sources)
+        finished = []
+        for source in sources:
+            if source.done:
+                finished.append(source)
+                continue
+            try:
+                while source.fill(READ_CHUNK) > 0:
+                    pass
+            except RuntimeError as e:
+                print(f"could not read {source.path}:", e)
+                finished.append(source)
+        if finished:
+            with self.lock:
+                self.sources = [s for s in self.sources if s not in finished]
+            for source in finished:
+                source.close()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        for source in self.sources:
+            source.close()
+        self.sources = []
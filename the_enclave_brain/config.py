@@ -1,3 +1,5 @@
 STEPS_PER_SECOND = 30.0
 TIME_STEP_SECONDS = 1.0 / STEPS_PER_SECOND
 MAX_LIGHT_BRIGHTNESS = 1.0
+SNAPSHOT_PATH = "snapshot.bin"
+SNAPSHOT_INTERVAL_SECONDS = 2.0
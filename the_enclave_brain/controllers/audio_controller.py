@@ -1,11 +1,12 @@
-import sounddevice as sd
-import soundfile as sf
-import numpy as np
-import threading
-import os
-import random
 import time
 
+from ..audio.assets import AssetCache
+from ..audio.engine import AudioEngine
+from ..audio.envelopes import load_envelope_index
+from ..audio.library import AudioLibrary, normalized_root
+from ..audio.prefetch import stream_bytes, warm_file
+from ..audio.streaming import ReadAhead
+from ..rng import get_stream
 from ..scenes import SCENES
 from ..simulation import Simulation
 from pathlib import Path
@@ -30,6 +31,7 @@ DELAY_MIX_MIN = 0
 DELAY_MIX_MAX = 0.5
 
 FADE_TIME_s = 1.5  # Fade duration in seconds
+VOLUME_FADE_TIME_s = 0.05  # Volume changes are ramped over this long to avoid clicks
 AUDIO_CHUNK_SZ = 1024
 
 MUSIC_FOLDER = "/music"
@@ -42,19 +44,42 @@ FOLEY_FOLDER = "/audio"
 OUTPUT_DEVICE = "Headphones BlackHole"
 
 class Audio_controller:
-
-    def __init__(self, sound_type):
-        self.audio_data = {} # these should all be in one structure
+    """
+    Picks and plays the music, foley or quotes of the current scene on the shared audio engine.
+
+    Args:
+        sound_type (str): "music", "foley" or "quotes".
+        rng_streams (RandomStreams): Source of the controller's random number stream.
+        engine (AudioEngine): The engine the voices play on, one engine is shared by all controllers.
+        reader (ReadAhead): Streams the files from disk, shared by all controllers.
+        assets (AssetCache): Decoded, memory-mapped files, shared by all controllers.
+            The quotes play from the cache, music and foley stream unless they need resampling.
+    """
+
+    def __init__(self, sound_type, rng_streams=None, engine=None, reader=None, assets=None):
+        if engine is None:
+            engine = AudioEngine()
+        if reader is None:
+            reader = ReadAhead(samplerate=engine.samplerate, blocksize=engine.blocksize)
+        if assets is None:
+            assets = AssetCache(samplerate=engine.samplerate)
+        self.engine = engine
+        self.reader = reader
+        self.assets = assets
+        # short one shots are played again and again, keep them decoded
+        self.use_asset_cache = sound_type == "quotes"
+        self.sources = {} # these should all be in one structure
         self.samplerates = {}
         self.volumes = {}
-        self.audio_idx = {}
-        self.audio_len = {} # Used for ending sounds pre-emptively
+        self.voices = {}
         self.file_active = {} # If sounds are fading out, this is 0, else 1
-        self.streams = {}
+        self.file_scenes = {} # The scene index each file was picked from
+        self.envelope_entries = {} # Where each file's envelope is in the envelope index
+        self.prefetched = None # (scene, filename) picked ahead of the next scene change
         self.paths = {}
         self.sound_type = sound_type
         self.file_idx = -1
-        self.lock = threading.Lock()
+        self.rng = get_stream(rng_streams, f"audio.{sound_type}")
 
         # The ordering of these effects is critical!!
         self.board = Pedalboard()
@@ -71,10 +96,18 @@ class Audio_controller:
         # else:
         #     print("invalid sound type, no fx applied")
 
+        # the voices of this controller are summed into one bus that runs the board once per block,
+        # an empty board passes the audio through unchanged
+        self.bus = self.engine.add_bus(sound_type, self.board)
+
         # Use this path when running as a standalone test script
         # where_we_at_path = str(Path.cwd().resolve().parent.parent)
         # Use this path when running as part of enclave
         where_we_at_path = str(Path.cwd().resolve())
+        # prefer the copy made by tools/normalize_audio.py, it needs no conversion at runtime
+        where_we_at_path = normalized_root(where_we_at_path, self.engine.samplerate, self.engine.channels)
+        # precomputed by tools/index_audio.py, None when the library hasn't been indexed
+        self.envelopes = load_envelope_index(where_we_at_path)
 
         # NOTE Missing music files in your filepath? Download them from Jules' gdrive
         if self.sound_type == 'music':
@@ -101,39 +134,63 @@ class Audio_controller:
         else:
             print("invalid sound type, Paths are fuked bro")
 
+        # the folders are scanned once, then only rescanned when they change
+        self.library = AudioLibrary(self.paths)
+
     # Scene param are from SCENES dict in scenes.py
     def set_scene(self, new_scene):
-        self.lock.acquire()
-        for filename in self.audio_data:
+        for filename in self.voices:
             self.stop_audio(filename)
-        self.lock.release()
         
-        subfolder_path = self.paths[new_scene]
-        filenames = os.listdir(subfolder_path)
-        if len(filenames) < 1:
-            return
-        file_to_play = random.sample(filenames, 1)
-        self.load_audio(file_to_play[0], subfolder_path + "/" + file_to_play[0])
-        self.play_audio(file_to_play[0])
+        # the file picked by prefetch is already warm
+        file_to_play = None
+        if self.prefetched is not None and self.prefetched[0] == new_scene:
+            file_to_play = self.prefetched[1]
+        self.prefetched = None
+        self.play_next(new_scene, file_to_play)
+
+    # Picks the files a change to scene will start, returns their AudioFileInfo to warm
+    def prefetch(self, scene):
+        index = self.library.scene(scene)
+        if len(index.names) < 1:
+            return []
+        if self.sound_type == "quotes":
+            # the next one shot, triggered in whatever scene is playing
+            return [index.info[index.names[(self.file_idx + 1) % len(index.names)]]]
+        file_to_play = index.pick(self.rng)
+        self.prefetched = (scene, file_to_play)
+        return [index.info[file_to_play]]
+
+    # Loads a file into memory the way load_audio will open it, called from the prefetch thread
+    def warm(self, info):
+        if self.use_asset_cache or info.samplerate != self.engine.samplerate:
+            self.assets.warm(info.path)
+        else:
+            warm_file(info.path, stream_bytes(info))
     
     def trigger_one_shot(self, scene):
-        if len(self.streams) > 0:
+        requested = time.perf_counter()
+        self.remove_finished()
+        if len(self.voices) > 0:
+            return
+        index = self.library.scene(scene)
+        if len(index.names) < 1:
             return
-        folder_path = self.paths[scene]
-        filenames = os.listdir(folder_path)
-        self.file_idx = (self.file_idx + 1) % len(filenames)
-        file_to_play = filenames[self.file_idx]
-        self.load_audio(file_to_play, folder_path + "/" + file_to_play)
-        self.play_audio(file_to_play, fade_time=0.2)
+        self.file_idx = (self.file_idx + 1) % len(index.names)
+        file_to_play = index.names[self.file_idx]
+        self.load_audio(file_to_play, index.info[file_to_play].path, scene)
+        # the engine measures the latency from the button to the first mixed block
+        self.play_audio(file_to_play, fade_time=0.2, requested=requested)
 
     # Scene param are from SCENES dict in scenes.py
     # Call this every 100ms or so. Longer intervals will leave more of a gap on sound fadeout/fadein
     def update(self, scene, simulation):
-        # self.lock.acquire()
         # Update FX
         knob_vals = self.get_effect_knob_vals(simulation)
         self.knob_val_to_effect(knob_vals)
 
+        self.remove_finished()
+
         remaining_times = self.get_audio_time_remaining()
         for filename in remaining_times:
             if remaining_times[filename] < FADE_TIME_s and self.file_active[filename] == 1:
@@ -144,147 +201,95 @@ class Audio_controller:
                 if self.sound_type == "quotes":
                     continue
 
-                # Get list of all possible files for scene
-                subfolder_path = self.paths[scene]
-                filenames = os.listdir(subfolder_path)
-
-                # Find which files area playing right now
-                dictKeys = list(self.audio_data.keys())
-
-                # Point to existing item to enter the loop
-                newFile = dictKeys[0] 
-
-                # Pick a file that isn't playing
-                loops = 0 
-                while newFile in self.audio_data.keys():
-                    newFile = random.sample(filenames, 1)
-                    newFile = newFile[0] # Convert to string from list
-
-                    # Don't loop forever if all available files already playing
-                    loops += 1
-                    if(loops > 70):
-                        print("we're looping forever, quik escape music")
-                        break 
-
-                self.load_audio(newFile, subfolder_path + "/" + newFile)
-                self.play_audio(newFile)
-        # self.lock.release()
-
-    def play_audio(self, filename, fade_time=FADE_TIME_s):
-        # Fade in
-        fade_in_samples = int(fade_time * self.samplerates[filename])
-        fade_in_curve = np.linspace(0, self.volumes[filename], fade_in_samples)
-        self.audio_data[filename][:fade_in_samples] *= fade_in_curve[:, np.newaxis]
-
-        # Fade out
-        fade_out_samples = int(fade_time * self.samplerates[filename])
-        fade_out_curve = np.linspace(self.volumes[filename], 0, fade_out_samples)
-        self.audio_data[filename][-fade_out_samples:] *= fade_out_curve[:, np.newaxis]
-
-        # event = threading.Event()
-
-        # def callback(outdata, frames, time, status):
-        #     if self.audio_idx[filename] >= self.audio_len[filename]:
-        #         raise sd.CallbackStop()
-
-        stream = sd.OutputStream(
-            channels=self.audio_data[filename].shape[1],
-            device=OUTPUT_DEVICE,
-            samplerate=self.samplerates[filename],
-            blocksize=AUDIO_CHUNK_SZ,
-            # callback=callback,
-            # finished_callback=event.set,
-        )
-        stream.start()
-        self.streams[filename] = stream
-
-        def write_audio():
-            current_index = 0
-            while current_index < self.audio_len[filename]:
-                chunk = self.audio_data[filename][current_index:current_index+AUDIO_CHUNK_SZ]
-                chunk *= self.volumes[filename]
-                if len(chunk) < AUDIO_CHUNK_SZ:
-                    # NOTE: this line produces a dtype mismatch TypeError
-                    # resolving this error by setting the correct dtype on np.zeros produces a pop
-                    chunk = np.append(chunk, np.zeros([AUDIO_CHUNK_SZ - len(chunk), 2]), axis=0)
-
-                # Effects
-                effected = self.board(chunk, self.samplerates[filename], reset=False)
-                stream.write(effected)
-
-                self.audio_idx[filename] += AUDIO_CHUNK_SZ # TODO combine self.audio_idx[filename] & current_index
-                current_index += AUDIO_CHUNK_SZ
-
-            # print("waiting for stream to end")
-            # event.wait()
-            # print("ending stream")
-            stream.stop()
-            stream.close()
-            # print("cleaning up")
-            self.lock.acquire()
-            del self.streams[filename]
-            del self.audio_data[filename]
-            del self.samplerates[filename]
-            del self.volumes[filename]
-            del self.audio_idx[filename]
-            del self.audio_len[filename]
-            del self.file_active[filename]
-            self.lock.release()
+                self.play_next(scene)
 
-        t = threading.Thread(target=write_audio)
-        t.start()
+    # Picks a random file of the scene that isn't playing yet and starts it
+    def play_next(self, scene, file_to_play=None):
+        index = self.library.scene(scene)
+        if file_to_play is None or not index.is_available(file_to_play):
+            file_to_play = index.pick(self.rng)
+        if file_to_play is None:
+            return
+        self.load_audio(file_to_play, index.info[file_to_play].path, scene)
+        self.play_audio(file_to_play)
+
+    def play_audio(self, filename, fade_time=FADE_TIME_s, requested=None):
+        # the fades are gain envelopes applied by the engine while mixing
+        self.voices[filename] = self.engine.play(
+            filename,
+            self.sources[filename],
+            gain=self.volumes[filename],
+            fade_in=fade_time,
+            fade_out=fade_time,
+            bus=self.bus,
+            requested=requested,
+        )
+        self.file_active[filename] = 1
+        self.library.indexes[self.file_scenes[filename]].mark_playing(filename)
 
+    # Ramps the volume of a playing file, the samples are scaled while mixing
+    def set_volume(self, filename, volume, fade_time=VOLUME_FADE_TIME_s):
+        if filename in self.voices:
+            self.volumes[filename] = volume
+            self.engine.set_gain(self.voices[filename], volume, fade=fade_time)
 
-    # Triggers the audio to start fading out. Thread is killed after FADE_TIME_s
+    # Triggers the audio to start fading out, the engine drops the voice when the fade is done
     def stop_audio(self, filename):
-        if filename in self.streams:
-
+        if filename in self.voices:
             self.file_active[filename] = 0
-            
-            playhead_idx = self.audio_idx[filename]
-
-            fade_out_samples = int(FADE_TIME_s * self.samplerates[filename]) 
-            if(self.audio_len[filename] - playhead_idx > fade_out_samples):
-
-                # Add an extra buffer to account for audio player stopping one frame early
-                # If this isn't here, we get audio pops when files are stopped (ie. scene changes)
-                buffer_pad = AUDIO_CHUNK_SZ
-                
-                # Changing the length will make play_audio() stop @ appropriate time & handle cleanup
-                self.audio_len[filename] = playhead_idx + fade_out_samples + buffer_pad
-
-                # Create fade
-                fade_out_curve = np.linspace(self.volumes[filename], 0, fade_out_samples)
-                for i in range(0, fade_out_samples):
-                    self.audio_data[filename][playhead_idx+i] *= fade_out_curve[i]
-
-                # Add zeroes to the end to cover cases where we don't end on a frame boundary
-                # Do this for two audio chunks at the end to account for player stopping one frame early
-                for i in range(0, AUDIO_CHUNK_SZ + buffer_pad):
-                    self.audio_data[filename][playhead_idx+fade_out_samples+i] = 0
-                
-
-    def load_audio(self, filename, filepath):
-        audio, samplerate = sf.read(filepath)
-        # adding extra zeros here may not be necessary with the other zero padding
-        self.audio_data[filename] = np.append(audio.astype(np.float32), np.zeros([1024, 2], dtype=np.float32), axis=0)
-        self.audio_len[filename] = len(audio)
-        self.audio_idx[filename] = 0
-        self.samplerates[filename] = samplerate
+            self.engine.stop(self.voices[filename], fade=FADE_TIME_s)
+
+    def remove_finished(self):
+        """Forgets the files whose voices the engine finished."""
+        for filename in [f for f, voice in self.voices.items() if voice.done]:
+            del self.voices[filename]
+            del self.sources[filename]
+            del self.samplerates[filename]
+            del self.volumes[filename]
+            del self.file_active[filename]
+            del self.envelope_entries[filename]
+            self.library.indexes[self.file_scenes.pop(filename)].mark_stopped(filename)
+
+    def load_audio(self, filename, filepath, scene):
+        if filename in self.voices:
+            # every file of the scene is playing and this one was picked again, the voice tracked for it is
+            # replaced, so fade it out now or nothing would ever stop it
+            self.stop_audio(filename)
+            self.library.indexes[self.file_scenes[filename]].mark_stopped(filename)
+        info = self.library.indexes[scene].info[filename]
+        if self.use_asset_cache or info.samplerate != self.engine.samplerate:
+            # decoded once at the engine rate, later loads only map the decoded file
+            self.sources[filename] = self.assets.get(filepath)
+        else:
+            # streamed from disk in blocks, nothing is decoded up front
+            self.sources[filename] = self.reader.open(filepath)
+        self.samplerates[filename] = self.engine.samplerate
         self.volumes[filename] = 1.0
         self.file_active[filename] = 1
+        self.file_scenes[filename] = scene
+        self.envelope_entries[filename] = self.envelopes.find(info.path) if self.envelopes is not None else None
 
 
     # Calling this every 100ms on all playing files should give us time to select the next sound
     def get_audio_time_remaining(self):
         remaining_times_s = {}
-        for filename in self.audio_data:
-            remaining_samples = self.audio_len[filename] - self.audio_idx[filename]
-            remaining_times_s[filename] = remaining_samples / self.samplerates[filename]
+        for filename, voice in self.voices.items():
+            remaining_times_s[filename] = voice.remaining / self.samplerates[filename]
 
         return remaining_times_s
 
 
+    # The RMS of the loudest playing file right now, looked up in the precomputed envelopes
+    def get_energy(self):
+        energy = 0.0
+        for filename, voice in self.voices.items():
+            entry = self.envelope_entries[filename]
+            if entry is None or voice.done:
+                continue
+            seconds = voice.position / self.engine.samplerate
+            energy = max(energy, self.envelopes.energy(entry, seconds) * voice.gain)
+        return energy
+
     def get_effect_knob_vals(self, simulation:Simulation):
         vals = [0.0, 0.0, 0.0]
         # vals = [
@@ -295,13 +300,14 @@ class Audio_controller:
         return vals
 
     # Expects normalized knob values (0-1)
+    # The parameters are set on the bus, which glides them to the new value in the audio callback
     def knob_val_to_effect(self, knob_vals):
         dummy = 1
 
         # if self.sound_type == "music":
         #     # Distortion
-        #     self.board[0].drive_db = knob_vals[0]*DISTORTION_MAX_dB
-        #     self.board[1].gain_db = -knob_vals[0]*DISTORTION_MAX_dB # compensation gain
+        #     self.bus.set_param(0, "drive_db", knob_vals[0]*DISTORTION_MAX_dB)
+        #     self.bus.set_param(1, "gain_db", -knob_vals[0]*DISTORTION_MAX_dB) # compensation gain
 
         #     # Filters
         #     lpf = 0
@@ -315,20 +321,20 @@ class Audio_controller:
         #         # Scale 0.5-1 to highpassfilter min to highpassfilter max
         #         hpf = (((knob_vals[1]-0.5)/0.5)*(HIGHPASS_FILTER_MAX_Hz-HIGHPASS_FILTER_MIN_Hz)+HIGHPASS_FILTER_MIN_Hz)
 
-        #     self.board[2].cutoff_frequency_hz = lpf
-        #     self.board[3].cutoff_frequency_hz = hpf
+        #     self.bus.set_param(2, "cutoff_frequency_hz", lpf)
+        #     self.bus.set_param(3, "cutoff_frequency_hz", hpf)
 
         # elif self.sound_type == 'foley':
         #     knob3_max = 1
         #     knob3_min = 0
         #     # Delay
-        #     self.board[0].feedback = scale_value(knob_vals[2], knob3_min, knob3_max, DELAY_FEEDBACK_MIN, DELAY_FEEDBACK_MAX)
-        #     self.board[0].mix = scale_value(knob_vals[2], knob3_min, knob3_max, DELAY_MIX_MIN, DELAY_MIX_MAX)
+        #     self.bus.set_param(0, "feedback", scale_value(knob_vals[2], knob3_min, knob3_max, DELAY_FEEDBACK_MIN, DELAY_FEEDBACK_MAX))
+        #     self.bus.set_param(0, "mix", scale_value(knob_vals[2], knob3_min, knob3_max, DELAY_MIX_MIN, DELAY_MIX_MAX))
 
         #     # Reverb
-        #     self.board[1].room_size = scale_value(knob_vals[2], knob3_min, knob3_max, REVERB_ROOM_SIZE_MIN, REVERB_ROOM_SIZE_MAX)
-        #     self.board[1].wet_level = scale_value(knob_vals[2], knob3_min, knob3_max, REVERB_WET_LEVEL_MIN, REVERB_WET_LEVEL_MAX)
-        #     self.board[1].dry_level = scale_value(knob3_max-knob_vals[2], knob3_min, knob3_max, REVERB_DRY_LEVEL_MIN, REVERB_DRY_LEVEL_MAX)
+        #     self.bus.set_param(1, "room_size", scale_value(knob_vals[2], knob3_min, knob3_max, REVERB_ROOM_SIZE_MIN, REVERB_ROOM_SIZE_MAX))
+        #     self.bus.set_param(1, "wet_level", scale_value(knob_vals[2], knob3_min, knob3_max, REVERB_WET_LEVEL_MIN, REVERB_WET_LEVEL_MAX))
+        #     self.bus.set_param(1, "dry_level", scale_value(knob3_max-knob_vals[2], knob3_min, knob3_max, REVERB_DRY_LEVEL_MIN, REVERB_DRY_LEVEL_MAX))
 
 
 # # For testing
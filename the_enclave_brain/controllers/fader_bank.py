@@ -0,0 +1,106 @@
+import numpy as np
+
+from ..osc import control_cache
+from ..osc.registry import control_id
+from ..rng import get_numpy_stream
+
+# keyframe draws precomputed per refill
+DRAW_BLOCK_SIZE = 256
+
+
+class FaderBank:
+    """
+    Runs the random walk of every layer fx fader as one set of numpy arrays.
+
+    Each fader moves in linear segments: when a segment ends, a new target and fade time
+    are derived from the fader's range and the current intensity. The random draws for the upcoming keyframes are
+    precomputed in blocks, the keyframes themselves are shaped from the intensity when each segment starts, so an
+    intensity change shapes the trajectory ahead. All faders are evaluated with a handful of vector operations per
+    frame and written to the control cache in one call, so the cost stays flat as layers and controls are added.
+
+    Args:
+        rng_streams (RandomStreams, optional): The random streams, the bank uses the "fader_bank" stream.
+
+    Methods:
+        add(layer: str, control: str, min: float, max: float) -> int: Adds a fader and returns its index.
+        set_intensity(indices, intensity: float): Sets the intensity of the given faders.
+        update(dt: float): Advances every fader and writes the values to the control cache.
+    """
+
+    def __init__(self, rng_streams=None):
+        self.rng = get_numpy_stream(rng_streams, "fader_bank")
+        self.address_ids = np.zeros(0, dtype=np.intp)
+        self.min = np.zeros(0)
+        self.max = np.zeros(0)
+        self.intensity = np.zeros(0)
+        self.start = np.zeros(0)
+        self.end = np.zeros(0)
+        # value change per second of the current segment, 0 for instant segments
+        self.slope = np.zeros(0)
+        self.time = np.zeros(0)
+        self.duration = np.zeros(0)
+        # a new segment is started on the next update
+        self.done = np.zeros(0, dtype=bool)
+        self.draws = np.zeros((DRAW_BLOCK_SIZE, 0, 2))
+        self.cursor = np.zeros(0, dtype=np.intp)
+
+    def add(self, layer: str, control: str, min=0.0, max=1.0) -> int:
+        self.address_ids = np.append(self.address_ids, control_id(layer, control))
+        self.min = np.append(self.min, min)
+        self.max = np.append(self.max, max)
+        self.intensity = np.append(self.intensity, 0.5)
+        self.start = np.append(self.start, min)
+        self.end = np.append(self.end, min)
+        self.slope = np.append(self.slope, 0.0)
+        self.time = np.append(self.time, 0.0)
+        self.duration = np.append(self.duration, 0.0)
+        self.done = np.append(self.done, True)
+        self.refill_draws()
+        return len(self.address_ids) - 1
+
+    def refill_draws(self):
+        self.draws = self.rng.random((DRAW_BLOCK_SIZE, len(self.address_ids), 2))
+        self.cursor = np.zeros(len(self.address_ids), dtype=np.intp)
+
+    def set_intensity(self, indices, intensity: float):
+        self.intensity[indices] = intensity
+
+    def start_segments(self, indices: np.ndarray):
+        if (self.cursor[indices] >= DRAW_BLOCK_SIZE).any():
+            self.refill_draws()
+        draws = self.draws[self.cursor[indices], indices]
+        self.cursor[indices] += 1
+
+        intensity = self.intensity[indices]
+        lo = self.min[indices]
+        hi = self.max[indices]
+        start = self.end[indices]
+        # force stronger fx based on intensity
+        range = hi - lo
+        mx = hi - range * 0.5 * (1.0 - intensity)
+        mn = lo + range * 0.5 * intensity
+        range = (mx - mn) * (intensity * 0.5 + 0.25)
+
+        end = np.minimum(mx, np.maximum(mn, start + draws[:, 0] * range - range * 0.5))
+        duration = draws[:, 1] * 10.0 * (1.0 - intensity * 0.5)
+        instant = duration <= 0.0
+        # an instant segment jumps straight to its end value
+        self.start[indices] = np.where(instant, end, start)
+        self.end[indices] = end
+        self.slope[indices] = np.where(instant, 0.0, (end - start) / np.where(instant, 1.0, duration))
+        self.duration[indices] = duration
+        self.time[indices] = 0.0
+        self.done[indices] = False
+
+    def update(self, dt: float):
+        if len(self.address_ids) == 0:
+            return
+
+        if self.done.any():
+            self.start_segments(np.flatnonzero(self.done))
+
+        # same timing as a ControlFade: the value at the segment time, then the time advances
+        control_cache.set_values_by_id(self.address_ids, self.start + self.slope * self.time)
+
+        self.time += dt
+        self.done = self.time > self.duration
@@ -0,0 +1,232 @@
+# waveform generator bank for the light channels
+#
+# a flicker pattern is a declarative list of voices:
+# [
+#     {
+#         "channels": ["tubes1_brightness", "tubes3_brightness"],  # lights controls the voice drives
+#         "waveform": "triangle",   # square, triangle, noise or burst
+#         "period": 1.0,            # seconds per cycle
+#         "cycles": 1,              # number of cycles
+#         "delay": 0.0,             # seconds after the trigger
+#         "phase": 0.0,             # cycle offset added per channel, spreads a voice across fixtures
+#         "high": 1.0, "low": 0.0,  # levels, every waveform starts and ends high
+#     },
+# ]
+#
+# patterns are compiled once into arrays. triggering appends them to a packed, fixed size voice pool,
+# every frame all live voices are evaluated as vectors and combined per channel (the darkest voice wins).
+
+import numpy as np
+
+from ..config import MAX_LIGHT_BRIGHTNESS
+from ..osc import control_cache
+from ..osc.registry import lights_control_id
+from ..rng import get_numpy_stream
+
+WAVEFORMS = ["square", "triangle", "noise", "burst"]
+SQUARE, TRIANGLE, NOISE, BURST = range(len(WAVEFORMS))
+
+# how fast a burst decays over its length
+BURST_DECAY = 3.0
+
+
+class FlickerPattern:
+    """A compiled flicker pattern, one array entry per (voice, channel)."""
+
+    __slots__ = ["channels", "waveforms", "delays", "periods", "lengths", "phases", "highs", "lows"]
+
+    def __init__(self, channels, waveforms, delays, periods, lengths, phases, highs, lows):
+        self.channels = channels
+        self.waveforms = waveforms
+        self.delays = delays
+        self.periods = periods
+        self.lengths = lengths
+        self.phases = phases
+        self.highs = highs
+        self.lows = lows
+
+
+class FlickerInstance:
+    """A triggered pattern, done once its last voice has finished.
+    on_complete(callback) calls callback(instance) from the bank's update in the frame it finishes."""
+
+    __slots__ = ["bank", "end_time", "callbacks"]
+
+    def __init__(self, bank, end_time: float):
+        self.bank = bank
+        self.end_time = end_time
+        self.callbacks = []
+
+    @property
+    def done(self) -> bool:
+        return self.bank.time > self.end_time
+
+    def on_complete(self, callback):
+        if self.done:
+            callback(self)
+            return self
+        if len(self.callbacks) == 0:
+            self.bank.pending.append(self)
+        self.callbacks.append(callback)
+        return self
+
+
+class FlickerBank:
+    """
+    Evaluates flicker waveforms for all light channels as vectors every frame.
+
+    Args:
+        channels (list[str]): The lights controls the bank drives.
+        rng_streams (RandomStreams, optional): The random streams, the noise waveform uses the "flicker" stream.
+        max_voices (int): The size of the voice pool, triggers that don't fit are dropped.
+
+    Methods:
+        compile(spec: list) -> FlickerPattern: Compiles a declarative pattern, see the top of this module.
+        trigger(pattern: FlickerPattern) -> FlickerInstance: Starts a pattern.
+        update(dt: float): Writes the current level of every flickering channel to the control cache
+            and calls the completion callbacks of the patterns that finished.
+    """
+
+    def __init__(self, channels: list, rng_streams=None, max_voices=128):
+        self.channels = list(channels)
+        self.channel_indices = {channel: i for i, channel in enumerate(self.channels)}
+        self.channel_ids = np.array([lights_control_id(channel) for channel in self.channels], dtype=np.intp)
+        self.rng = get_numpy_stream(rng_streams, "flicker")
+        self.time = 0.0
+        self.max_voices = max_voices
+
+        # the live voices are kept packed at the front of the pool so every frame works on slices
+        self.count = 0
+        self.channel = np.zeros(max_voices, dtype=np.intp)
+        self.waveform = np.zeros(max_voices, dtype=np.intp)
+        self.start = np.zeros(max_voices)
+        self.inv_period = np.ones(max_voices)
+        self.length = np.zeros(max_voices)
+        self.phase = np.zeros(max_voices)
+        self.low = np.zeros(max_voices)
+        self.depth = np.zeros(max_voices)
+        # number of live voices per waveform, the triangle is computed for all of them
+        self.waveform_counts = [0] * len(WAVEFORMS)
+
+        # level a channel returns to when its voices finish
+        self.rest = np.full(len(self.channels), MAX_LIGHT_BRIGHTNESS)
+        # channels written last frame
+        self.flickering = np.zeros(len(self.channels), dtype=bool)
+        # instances waiting to call their completion callbacks
+        self.pending = []
+
+    def compile(self, spec: list) -> FlickerPattern:
+        entries = []
+        for voice in spec:
+            waveform = voice.get("waveform", "triangle")
+            if waveform not in WAVEFORMS:
+                raise ValueError(f"unknown flicker waveform: {waveform}")
+            period = float(voice.get("period", 1.0))
+            for i, channel in enumerate(voice["channels"]):
+                if channel not in self.channel_indices:
+                    raise ValueError(f"unknown flicker channel: {channel}")
+                entries.append(
+                    (
+                        self.channel_indices[channel],
+                        WAVEFORMS.index(waveform),
+                        float(voice.get("delay", 0.0)),
+                        period,
+                        period * voice.get("cycles", 1),
+                        voice.get("phase", 0.0) * i,
+                        float(voice.get("high", MAX_LIGHT_BRIGHTNESS)),
+                        float(voice.get("low", 0.0)),
+                    )
+                )
+        columns = list(zip(*entries))
+        return FlickerPattern(
+            np.array(columns[0], dtype=np.intp),
+            np.array(columns[1], dtype=np.intp),
+            *[np.array(column, dtype=float) for column in columns[2:]],
+        )
+
+    def trigger(self, pattern: FlickerPattern) -> FlickerInstance:
+        n = len(pattern.channels)
+        if self.count + n > self.max_voices:
+            print("flicker voice pool full, dropping pattern")
+            return FlickerInstance(self, self.time)
+
+        voices = slice(self.count, self.count + n)
+        self.channel[voices] = pattern.channels
+        self.waveform[voices] = pattern.waveforms
+        self.start[voices] = self.time + pattern.delays
+        self.inv_period[voices] = 1.0 / pattern.periods
+        self.length[voices] = pattern.lengths
+        self.phase[voices] = pattern.phases
+        self.low[voices] = pattern.lows
+        self.depth[voices] = pattern.highs - pattern.lows
+        self.rest[pattern.channels] = pattern.highs
+        for waveform in pattern.waveforms.tolist():
+            self.waveform_counts[waveform] += 1
+        self.count += n
+        return FlickerInstance(self, self.time + (pattern.delays + pattern.lengths).max())
+
+    def remove_finished(self, finished: np.ndarray):
+        keep = np.flatnonzero(~finished)
+        for waveform in self.waveform[: self.count][finished].tolist():
+            self.waveform_counts[waveform] -= 1
+        for array in [self.channel, self.waveform, self.start, self.inv_period, self.length, self.phase, self.low, self.depth]:
+            array[: len(keep)] = array[keep]
+        self.count = len(keep)
+
+    def complete_pending(self):
+        finished = [instance for instance in self.pending if instance.done]
+        if len(finished) == 0:
+            return
+        self.pending = [instance for instance in self.pending if not instance.done]
+        for instance in finished:
+            for callback in instance.callbacks:
+                callback(instance)
+            instance.callbacks = []
+
+    def update(self, dt: float):
+        if self.count == 0 and not self.flickering.any():
+            self.time += dt
+            if self.pending:
+                self.complete_pending()
+            return
+
+        n = self.count
+        t = self.time - self.start[:n]
+        finished = t > self.length[:n]
+        if finished.any():
+            self.remove_finished(finished)
+            n = self.count
+            t = t[~finished]
+
+        # waveform levels in [0, 1], every waveform starts and ends at 1
+        phase = (t * self.inv_period[:n] + self.phase[:n]) % 1.0
+        level = np.abs(1.0 - 2.0 * phase)
+        if self.waveform_counts[TRIANGLE] < n:
+            waveform = self.waveform[:n]
+            if self.waveform_counts[SQUARE] > 0:
+                square = waveform == SQUARE
+                level[square] = phase[square] < 0.5
+            if self.waveform_counts[NOISE] > 0:
+                noise = waveform == NOISE
+                level[noise] = self.rng.random(self.waveform_counts[NOISE])
+            if self.waveform_counts[BURST] > 0:
+                burst = waveform == BURST
+                level[burst] = 1.0 - (phase[burst] >= 0.5) * np.exp(
+                    -BURST_DECAY * t[burst] / self.length[:n][burst]
+                )
+        # voices still in their delay don't touch their channel
+        values = np.where(t >= 0.0, self.low[:n] + self.depth[:n] * level, np.inf)
+
+        # the darkest voice wins on each channel, channels that stopped flickering return to rest
+        levels = np.full(len(self.channels), np.inf)
+        np.minimum.at(levels, self.channel[:n], values)
+        flickering = levels < np.inf
+        write = flickering | self.flickering
+        control_cache.set_values_by_id(
+            self.channel_ids[write], np.where(flickering, levels, self.rest)[write]
+        )
+        self.flickering = flickering
+
+        self.time += dt
+        if self.pending:
+            self.complete_pending()
@@ -1,47 +1,61 @@
-from ..scenes import SCENES
+from ..show_config import SCENE_COLORS
 from ..control import tx_floodlight_packet
 from .light_fade_controller import LightFadeController
 
-PALETTE = {
-    "green": (0, 122, 10),
-    "blue": (0, 15, 128),
-    "red": (128, 0, 0),
-    "orange": (179, 0, 0),
-    "brown": (125, 79, 0),
-    "grey": (130, 130, 130),
-    "orange": (191, 120, 0),
-    "teal": (0, 125, 89),
-    "indigo": (33, 0, 125),
-    "purple": (112, 0, 125),
-    "black": (0, 0, 0),
-}
-
 def get_scene_colors(scene: str):
-    return [PALETTE[color] for color in SCENES[scene]["flood_lights"]]
+    return SCENE_COLORS[scene]
 
 class FloodLightsController:
-    def __init__(self, scene="healthy_forest"):
+    def __init__(self, scene="healthy_forest", colors=None):
         self.scene = scene
         self.transitions = []
-        self.current_colors = get_scene_colors(scene)
+        # brightness of each light, set by the modulation matrix
+        self.gains = [1.0] * len(get_scene_colors(scene))
+        # colors can be restored from a snapshot
+        self.current_colors = [tuple(color) for color in colors] if colors else get_scene_colors(scene)
         self.send_colors()
+        if self.current_colors != get_scene_colors(scene):
+            # the snapshot was taken mid transition - finish it
+            self.start_transition(get_scene_colors(scene))
+
+    def get_state(self):
+        return list(self.current_colors)
 
     def send_colors(self):
         for light_idx, color in enumerate(self.current_colors):
             r, g, b = color
             # if light_idx == 0:
             #     print(f"sending flood light data: idx={light_idx}, r={r}, g={g}, b={b}")
-            scale = 1.0
+            scale = self.gains[light_idx]
             if light_idx == 1:
-                scale = 0.25
+                scale *= 0.25
             tx_floodlight_packet(light_idx, int(float(r) * scale), int(float(g) * scale), int(float(b) * scale))
     
+    def set_gains(self, gains):
+        gains = [round(float(gain), 3) for gain in gains]
+        if gains == self.gains:
+            return
+        self.gains = gains
+        if len(self.transitions) == 0:
+            # a running transition sends the colors anyway
+            self.send_colors()
+
     def set_scene(self, scene: str):
         if scene == self.scene:
             return
 
-        next_colors = get_scene_colors(scene)
         print("starting transition to scene", scene)
+        self.start_transition(get_scene_colors(scene))
+        # self.current_colors = next_colors
+        self.scene = scene
+
+    def reload_config(self):
+        # fade to the scene colors if they were changed
+        target = get_scene_colors(self.scene)
+        if self.current_colors != target:
+            self.start_transition(target)
+
+    def start_transition(self, next_colors):
         print("current colors", self.current_colors)
         print("next colors", next_colors)
         self.transitions = [
@@ -54,8 +68,6 @@ class FloodLightsController:
                 next_colors[1]
             ),
         ]
-        # self.current_colors = next_colors
-        self.scene = scene
     
     def update(self, dt: float):
         if len(self.transitions) == 0:
@@ -1,11 +1,13 @@
-import random
-
+from .fader_bank import FaderBank
 from .layer_fx_controller import LayerFXController
 from ..osc import control_cache
-from ..osc.addresses import MADMAPPER_CONFIG, is_one_shot, layer_blackout, control
-from ..osc.events import OSCEventManager, OSCEventSequence, OSCEventStack
+from ..osc.addresses import layer_blackout, layer_cue_address
+from ..osc.registry import layer_ids
+from ..osc.events import EventHandle, OSCEventManager, OSCEventSequence, OSCEventStack
 from ..osc.transitions import LayerSwitch, LayerTransition, TriggerCue, ControlFade
+from ..rng import get_stream
 from ..scenes import SCENES
+from ..show_config import CUE_TABLES
 
 
 class LayerController:
@@ -24,16 +26,25 @@ class LayerController:
         time (float): The amount of time that has passed since the last update.
         frequency (float): The frequency at which the layer should be updated.
         prev_scene (str): The previous scene that was displayed.
-        cues (list): The list of cues to use for transitioning between layers.
-        cue_index (int): The current index of the cue being used for transitioning between layers.
+        cue_table (CueTable): The precomputed cues of the current scene for this layer type.
+        cue_index (int): The position of the current cue in the cue table.
+        fader_bank (FaderBank): The shared bank the fx faders of both layers are added to.
         fx1_controller(LayerFXController): The LayerFXController instance for the first layer.
         fx2_controller(LayerFXController): The LayerFXController instance for the second layer.
+        rng (random.Random): The random number stream used for cue selection and blackouts.
+        layers (dict): layer name -> LayerIds of both layers, the ids the transitions are built from.
+        current_event (EventHandle): The handle of the running transition, None when there is none.
 
     Methods:
         update_layer(): Updates the current layer based on the current scene and cues.
+        event_completed(handle: EventHandle): Moves on to the next cue when a transition ends after the hold time.
         set_scene(scene: str): Sets the scene to display.
         set_scene_intensity(scene_intensity: float): Sets the intensity of the scene.
         update(dt: float): Updates the layer and its attributes based on a given elapsed time 'dt'.
+        get_state() -> dict: Returns the current layer, bin and index for snapshots.
+        set_state(state: dict): Restores the state returned by get_state without triggering a transition.
+        get_cue_addresses() -> list: Returns the cue addresses that reproduce what the layers currently show.
+        reload_config(): Picks up a reloaded show config, the current cue keeps playing.
     """
 
     def __init__(
@@ -42,6 +53,9 @@ class LayerController:
         scene="healthy_forest",
         layer_type="bg",
         frequency=20.0,
+        rng_streams=None,
+        state=None,
+        fader_bank=None,
     ):
         self.event_manager = event_manager
         self.scene = scene
@@ -52,12 +66,55 @@ class LayerController:
         self.time = 0.0
         self.frequency = frequency
         self.prev_scene = None
-        self.scene_cues = []
+        self.cue_table = None
         self.cue_index = 0
-        self.fx1_controller = LayerFXController(event_manager, layer_type + "1")
-        self.fx2_controller = LayerFXController(event_manager, layer_type + "2")
+        if fader_bank is None:
+            fader_bank = FaderBank(rng_streams)
+        self.fader_bank = fader_bank
+        self.fx1_controller = LayerFXController(fader_bank, layer_type + "1")
+        self.fx2_controller = LayerFXController(fader_bank, layer_type + "2")
         self.current_event = None
-        self.update_layer()
+        self.rng = get_stream(rng_streams, f"layer.{layer_type}")
+        # looked up once, a show config reload updates the ids in place
+        self.layers = {f"{layer_type}{i}": layer_ids(f"{layer_type}{i}") for i in [1, 2]}
+        if state is not None:
+            self.set_state(state)
+        else:
+            self.update_layer()
+
+    def get_state(self) -> dict:
+        return {
+            "scene": self.scene,
+            "current_layer": self.current_layer,
+            "current_bin": self.current_bin,
+            "current_index": self.current_index,
+            "cue_index": self.cue_index,
+            "time": self.time,
+        }
+
+    def set_state(self, state: dict):
+        self.scene = state["scene"]
+        self.current_layer = state["current_layer"]
+        self.current_bin = state["current_bin"]
+        self.current_index = state["current_index"]
+        self.cue_index = state["cue_index"]
+        self.time = state["time"]
+        self.current_event = None
+        self.update_scene_cues()
+
+    def get_cue_addresses(self) -> list:
+        if self.current_layer is None:
+            return [layer_blackout(f"{self.layer_type}{i}") for i in [1, 2]]
+        return [layer_cue_address(self.current_layer, self.current_bin, self.current_index)]
+
+    def reload_config(self):
+        # the scene cues are collected again on the next layer update
+        self.prev_scene = None
+
+    def update_scene_cues(self):
+        """Looks up the cue table of the current scene."""
+        self.prev_scene = self.scene
+        self.cue_table = CUE_TABLES[(self.scene, self.layer_type)]
 
     def update_layer(self):
         prev_layer = self.current_layer
@@ -67,98 +124,100 @@ class LayerController:
 
         # if the scene has changed collect the new scene cues
         if self.scene != self.prev_scene:
-            self.prev_scene = self.scene
-            self.scene_cues = []
+            self.update_scene_cues()
             prev_cue_index = None
 
-            for layer_index in range(2):
-                layer_name = self.layer_type + str(layer_index + 1)
-                bins = SCENES[self.scene][self.layer_type]
-                for bin in bins:
-                    if bin not in MADMAPPER_CONFIG[layer_name]["cues"]:
-                        continue
-                    for cue in range(len(MADMAPPER_CONFIG[layer_name]["cues"][bin])):
-                        self.scene_cues.append(
-                            {
-                                "layer": f"{self.layer_type}{layer_index + 1}",
-                                "bin": bin,
-                                "cue_index": cue,
-                            }
-                        )
-
         if (
             self.current_layer is not None
             and self.layer_type == "fg"
             and "fg_blackout" in SCENES[self.scene]
         ):
             # randomly blackout layer if configured
-            if random.random() < SCENES[self.scene]["fg_blackout"]:
+            if self.rng.random() < SCENES[self.scene]["fg_blackout"]:
                 print(f"blacking out {self.layer_type}")
-                for i in [1, 2]:
-                    layer = f"{self.layer_type}{i}"
-                    current_opacity = control_cache.get_value(control(layer, "opacity"))
-                    self.current_event = OSCEventSequence(
-                        [
-                            ControlFade(
-                                layer=layer,
-                                control="opacity",
-                                start=current_opacity,
-                                end=0.0,
-                                duration=3.0 if current_opacity > 0.0 else 0.0,
-                            ),
-                            TriggerCue(address=layer_blackout(layer)),
-                        ]
+                blackouts = []
+                for layer in self.layers.values():
+                    current_opacity = control_cache.get_value_by_id(layer.opacity)
+                    blackouts.append(
+                        OSCEventSequence(
+                            [
+                                ControlFade(
+                                    layer=layer,
+                                    control="opacity",
+                                    start=current_opacity,
+                                    end=0.0,
+                                    duration=3.0 if current_opacity > 0.0 else 0.0,
+                                ),
+                                TriggerCue(address_id=layer.blackout),
+                            ]
+                        )
                     )
-                    self.event_manager.add_event(self.current_event)
+                self.current_event = self.event_manager.add_event(
+                    OSCEventStack(blackouts)
+                ).on_complete(self.event_completed)
                 self.current_layer = None
                 return
 
         # choose new cue
-        cues = self.scene_cues
-        if self.layer_type == "bg":
-            other_layer_cues = [cue for cue in self.scene_cues if cue["layer"] != self.current_layer]
-            if len(other_layer_cues) > 0:
-                cues = other_layer_cues
-                prev_cue_index = None
-        if prev_cue_index is not None:
-            self.cue_index = random.randint(0, len(cues) - 2)
+        table = self.cue_table
+        count = table.size
+        # bg switches layer whenever the scene has cues on another layer
+        other_layers = [layer for layer in table.layer_counts if layer != self.current_layer]
+        switch_layer = self.layer_type == "bg" and len(other_layers) > 0
+        if switch_layer and self.current_layer in table.layer_counts:
+            # pick the other layer, then one of its cues
+            other = other_layers[self.rng.randrange(len(other_layers))]
+            self.cue_index = table.layer_starts[other] + self.rng.randrange(table.layer_counts[other])
+        elif prev_cue_index is not None and not switch_layer:
+            self.cue_index = self.rng.randint(0, count - 2)
             if self.cue_index >= prev_cue_index:
                 self.cue_index += 1
         else:
-            self.cue_index = random.randint(0, len(cues) - 1)
-        cue = self.scene_cues[self.cue_index]
-        self.current_layer = cue["layer"]
-        self.current_bin = cue["bin"]
-        self.current_index = cue["cue_index"]
+            self.cue_index = self.rng.randint(0, count - 1)
+        self.current_layer = table.layers[self.cue_index]
+        self.current_bin = table.bins[self.cue_index]
+        self.current_index = table.indices[self.cue_index]
 
-        if self.current_event is not None and not self.current_event.done:
-            self.current_event.done = True
+        if self.current_event is not None:
+            self.current_event.cancel()
+            self.current_event = None
 
         # transition to new cue as needed
         if prev_layer is not None and prev_layer != self.current_layer:
-            self.current_event = LayerSwitch(
-                prev_layer,
-                self.current_layer,
-                self.current_bin,
-                self.current_index,
-                fade=6.0,
-                use_mask=self.layer_type == "bg",
-                fade_to_black=self.layer_type == "fg" and prev_layer is not None,
-            )
-            self.event_manager.add_event(self.current_event)
+            self.current_event = self.event_manager.add_event(
+                LayerSwitch(
+                    self.layers[prev_layer],
+                    self.layers[self.current_layer],
+                    self.current_bin,
+                    self.current_index,
+                    fade=6.0,
+                    use_mask=self.layer_type == "bg",
+                    fade_to_black=self.layer_type == "fg" and prev_layer is not None,
+                )
+            ).on_complete(self.event_completed)
         elif (
             prev_layer is None
             or self.current_bin != prev_bin
             or self.current_index != prev_index
         ):
-            self.current_event = LayerTransition(
-                self.current_layer,
-                self.current_bin,
-                self.current_index,
-                # @todo consider taking this from the cue config - some foregrounds might not need the fade
-                fade=0.0 if self.layer_type == "bg" and prev_layer is not None else 6.0,
-            )
-            self.event_manager.add_event(self.current_event)
+            self.current_event = self.event_manager.add_event(
+                LayerTransition(
+                    self.layers[self.current_layer],
+                    self.current_bin,
+                    self.current_index,
+                    # @todo consider taking this from the cue config - some foregrounds might not need the fade
+                    fade=0.0 if self.layer_type == "bg" and prev_layer is not None else 6.0,
+                )
+            ).on_complete(self.event_completed)
+
+    def event_completed(self, handle: EventHandle):
+        if handle is not self.current_event:
+            return
+        self.current_event = None
+        if self.time >= self.frequency:
+            # the cue was held long enough, move on in the frame the transition ended
+            self.time = 0.0
+            self.update_layer()
 
     def set_scene(self, scene: str):
         self.scene = scene
@@ -168,11 +227,15 @@ class LayerController:
         self.fx2_controller.set_intensity(scene_intensity)
 
     def update(self, dt: float, force=False):
-        self.fx1_controller.update(dt)
-        self.fx2_controller.update(dt)
-
+        # the fx faders are advanced by the fader bank
         self.time += dt
-        if not force and (self.time < self.frequency or not self.current_event.done):
+        if self.current_event is not None and self.current_layer is None:
+            # a blackout always finishes, a forced update picks the next cue when it completes
+            if force:
+                self.time = self.frequency
+            return
+        # a transition that is still running moves on from event_completed
+        if not force and (self.time < self.frequency or self.current_event is not None):
             return
 
         self.time = 0.0
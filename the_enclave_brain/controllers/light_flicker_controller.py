@@ -1,136 +1,87 @@
-from ..config import MAX_LIGHT_BRIGHTNESS
-from ..osc.addresses import lights_control_address
-from ..osc.events import OSCEventManager, OSCEventStack, OSCEventSequence, OSCSleepEvent
-from ..osc.transitions import OSCFlicker
+from .flicker_bank import FlickerBank
+from ..osc.events import OSCEventManager
 from ..simulation import Simulation
 
+SIDE_TUBES = ["tubes1_brightness", "tubes3_brightness"]
+
+# flicker pattern per knob, checked in order, see flicker_bank.py for the format
+FLICKER_PATTERNS = {
+    "climate_change": [
+        {"channels": SIDE_TUBES, "cycles": 1},
+        {
+            "channels": ["tubes2_brightness", "lanterns1_brightness", "lanterns2_brightness"],
+            "cycles": 1,
+            "delay": 0.5,
+        },
+    ],
+    "human_activity": [
+        {"channels": SIDE_TUBES, "cycles": 2},
+        {"channels": ["tubes2_brightness"], "cycles": 2, "delay": 0.5},
+        {"channels": ["lanterns1_brightness"], "cycles": 2, "period": 2.0},
+        {"channels": ["lanterns2_brightness"], "cycles": 2, "period": 2.0, "delay": 1.0},
+    ],
+    "fate": [
+        {"channels": SIDE_TUBES, "cycles": 3},
+        {"channels": ["tubes2_brightness"], "cycles": 3, "delay": 0.5},
+        {"channels": ["lanterns1_brightness"], "cycles": 3},
+        {"channels": ["lanterns2_brightness"], "cycles": 3, "delay": 0.5},
+    ],
+}
+
+LIGHT_CHANNELS = [
+    "tubes1_brightness",
+    "tubes2_brightness",
+    "tubes3_brightness",
+    "lanterns1_brightness",
+    "lanterns2_brightness",
+]
+
 class LightFlickerController:
     """
     A class representing a light flicker controller that manages light flicker events triggered 
     by varying simulation parameters.
     
     Args:
-        event_manager (OSCEventManager): The OSCEventManager object where events will be added.
+        event_manager (OSCEventManager): The OSCEventManager whose output sends the flicker levels.
         simulation (Simulation): The Simulation object where parameters will be monitored.
+        rng_streams (RandomStreams, optional): Source of the flicker bank's random number stream.
 
     Attributes:
-        event_manager (OSCEventManager): The OSCEventManager object where events will be added.
+        event_manager (OSCEventManager): The OSCEventManager whose output sends the flicker levels.
         sim (Simulation): The Simulation object where parameters will be monitored.
-        current_event (OSCEventStack, None): The currently executing event stack, or None if no event is executing.
+        current_event (FlickerInstance, None): The last triggered flicker, or None if nothing was triggered yet.
+        playing (bool): Whether a flicker is playing, cleared by its completion callback.
+        bank (FlickerBank): Evaluates the flicker waveforms of all light channels.
+        patterns (dict): The compiled FLICKER_PATTERNS.
     """
 
-    def __init__(self, event_manager: OSCEventManager, simulation: Simulation):
+    def __init__(self, event_manager: OSCEventManager, simulation: Simulation, rng_streams=None):
         self.event_manager = event_manager
         self.sim = simulation
         self.current_event = None
+        self.playing = False
         self.max_frequency = 30.0
-        self.current_time = 0.0
-
-    def flicker_side_tubes(self, n_flicks=1):
-        return [
-            OSCFlicker(
-                address=lights_control_address("tubes1_brightness"),
-                n_flicks=n_flicks,
-                high=MAX_LIGHT_BRIGHTNESS,
-            ),
-            OSCFlicker(
-                address=lights_control_address("tubes3_brightness"),
-                n_flicks=n_flicks,
-                high=MAX_LIGHT_BRIGHTNESS,
-            ),
-        ]
+        # nothing played yet, the first change can trigger right away
+        self.current_time = self.max_frequency
+        self.bank = FlickerBank(LIGHT_CHANNELS, rng_streams)
+        self.patterns = {param: self.bank.compile(spec) for param, spec in FLICKER_PATTERNS.items()}
 
     def update(self, dt: float):
         self.current_time += dt
+        self.trigger()
+        self.bank.update(dt)
 
-        if self.current_event is not None and (not self.current_event.done or self.current_time < self.max_frequency):
+    def trigger(self):
+        if self.playing or self.current_time < self.max_frequency:
             return
-        
-        self.current_time = 0.0
-        events = []
 
-        if self.sim.param("climate_change").has_changed():
-            print("climate change flicker")
-            events = [
-                *self.flicker_side_tubes(),
-                OSCEventSequence([
-                    OSCSleepEvent(0.5),
-                    OSCEventStack([
-                        OSCFlicker(
-                            address=lights_control_address("tubes2_brightness"),
-                            n_flicks=1,
-                            high=MAX_LIGHT_BRIGHTNESS,
-                        ),
-                        OSCFlicker(
-                            address=lights_control_address("lanterns1_brightness"),
-                            n_flicks=1,
-                            high=MAX_LIGHT_BRIGHTNESS,
-                        ),
-                        OSCFlicker(
-                            address=lights_control_address("lanterns2_brightness"),
-                            n_flicks=1,
-                            high=MAX_LIGHT_BRIGHTNESS,
-                        )
-                    ])
-                ]),
-            ]
-        elif self.sim.param("human_activity").has_changed():
-            print("human activity flicker")
-            events = [
-                *self.flicker_side_tubes(n_flicks=2),
-                OSCEventSequence([
-                    OSCSleepEvent(0.5),
-                    OSCFlicker(
-                        address=lights_control_address("tubes2_brightness"),
-                        n_flicks=2,
-                        high=MAX_LIGHT_BRIGHTNESS,
-                    ),
-                ]),
-                OSCFlicker(
-                    address=lights_control_address("lanterns1_brightness"),
-                    n_flicks=2,
-                    period=2.0,
-                    high=MAX_LIGHT_BRIGHTNESS,
-                ),
-                OSCEventSequence([
-                    OSCSleepEvent(1.0),
-                    OSCFlicker(
-                        address=lights_control_address("lanterns2_brightness"),
-                        n_flicks=2,
-                        period=2.0,
-                        high=MAX_LIGHT_BRIGHTNESS,
-                    ),
-                ]),
-            ]
-        elif self.sim.param("fate").has_changed():
-            print("fate flicker")
-            events = [
-                *self.flicker_side_tubes(n_flicks=3),
-                OSCEventSequence([
-                    OSCSleepEvent(0.5),
-                    OSCFlicker(
-                        address=lights_control_address("tubes2_brightness"),
-                        n_flicks=3,
-                        high=MAX_LIGHT_BRIGHTNESS,
-                    ),
-                ]),
-                OSCFlicker(
-                    address=lights_control_address("lanterns1_brightness"),
-                    n_flicks=3,
-                    high=MAX_LIGHT_BRIGHTNESS,
-                ),
-                OSCEventSequence([
-                    OSCSleepEvent(0.5),
-                    OSCFlicker(
-                        address=lights_control_address("lanterns2_brightness"),
-                        n_flicks=3,
-                        high=MAX_LIGHT_BRIGHTNESS,
-                    ),
-                ]),
-            ]
-        else:
-            self.current_time = self.max_frequency
+        for param, pattern in self.patterns.items():
+            if self.sim.param(param).has_changed():
+                print(param.replace("_", " "), "flicker")
+                self.current_time = 0.0
+                self.playing = True
+                self.current_event = self.bank.trigger(pattern).on_complete(self.flicker_completed)
+                return
 
-        if len(events) > 0:
-            self.current_event = OSCEventStack(events)
-            self.event_manager.add_event(self.current_event)
+    def flicker_completed(self, instance):
+        self.playing = False
@@ -1,10 +1,10 @@
 import math
-import random
 
-from ..osc import control_cache
-from ..osc.addresses import MADMAPPER_CONFIG, lights_color_address, lights_content_address, lights_control_address
+from ..osc.addresses import MADMAPPER_CONFIG, lights_color_address, lights_content_address
+from ..osc.registry import lights_control_id
 from ..osc.events import OSCEventManager
-from ..osc.transitions import TriggerCue, OSCTransition
+from ..osc.transitions import TriggerCue
+from ..rng import get_stream
 
 
 class LightsController:
@@ -15,6 +15,7 @@ class LightsController:
         event_manager (OSCEventManager): An instance of the OSCEventManager class for managing OSC events.
         scene (str): The current scene for controlling the lights (default: "healthy_forest").
         frequency (float): The frequency of update in seconds (default: 20.0).
+        rng_streams (RandomStreams): Source of the controller's random number stream.
 
     Attributes:
         event_manager (OSCEventManager): An instance of the OSCEventManager class for managing OSC events.
@@ -32,7 +33,11 @@ class LightsController:
     """
 
     def __init__(
-        self, event_manager: OSCEventManager, scene="healthy_forest", frequency=20.0
+        self,
+        event_manager: OSCEventManager,
+        scene="healthy_forest",
+        frequency=20.0,
+        rng_streams=None,
     ):
         self.event_manager = event_manager
         self.scene = scene
@@ -41,6 +46,9 @@ class LightsController:
         self.time = 0.0
         self.current_content_index = 0
         self.prev_scene = None
+        self.rng = get_stream(rng_streams, "lights")
+        # the light speed follows the scene intensity
+        event_manager.output.bind(lights_control_id("speed"), lambda: self.scene_intensity)
 
     def set_scene(self, scene: str):
         self.scene = scene
@@ -49,13 +57,6 @@ class LightsController:
         self.scene_intensity = scene_intensity
 
     def update(self, dt: float):
-        # update light speed according to the scene intensity
-        speed_address = lights_control_address("speed")
-        target_speed = self.scene_intensity
-        self.event_manager.add_event(
-            OSCTransition(address=speed_address, start=0.0, end=target_speed, duration=0.0)
-        )
-
         content_index = round(
             self.scene_intensity * (len(MADMAPPER_CONFIG["lights"]["content"]) - 1)
         )
@@ -83,7 +84,7 @@ class LightsController:
 
         self.time = 0.0
 
-        color_index = random.randint(
+        color_index = self.rng.randint(
             1, len(MADMAPPER_CONFIG["lights"]["colors"][self.scene]) - 1
         )
 
@@ -0,0 +1,226 @@
+# modulation matrix routing simulation values to many outputs
+#
+# routes are declared in the "modulation" section of the show config:
+# {
+#     "lfos": {"<name>": {"rate": 0.1, "waveform": "sine", "phase": 0.0}},   # rate in Hz, output between 0 and 1
+#     "destinations": {"<destination>": {"base": 0.0, "min": 0.0, "max": 1.0}},  # optional, these are the defaults
+#     "routes": [
+#         {"source": "forest_health", "destination": "bg1.fx_amount", "amount": -0.5, "curve": "square"},
+#     ],
+# }
+#
+# sources: forest_health, scene_intensity, audio_energy, every knob parameter of the simulation (climate_change, ...),
+#          lfo.<name>
+#          audio_energy is the RMS of the loudest playing voice, from the precomputed envelopes (tools/index_audio.py)
+# destinations:
+#     <layer>.<control>    a layer control, e.g. bg1.fx_amount
+#     lights.<control>     a lights control, e.g. lights.speed
+#     flood_lights.<index> the brightness of a flood light, the base defaults to 1
+#     audio.<bus>.<effect>.<attribute>
+#                          an effect parameter of an audio bus, e.g. audio.quotes.0.room_size for the room size of the
+#                          first effect on the quotes bus, glided to in the audio callback
+#
+# every destination is base + the sum of amount * curve(source) over its routes, clamped to [min, max].
+# the matrix owns its destinations: it runs after the controllers and replaces output bindings (lights.speed)
+# while routed, a control driven by a route should not also be driven by a controller.
+#
+# the curves are applied once per distinct (source, curve) pair, then all routes are evaluated as one
+# matrix-vector product, so the cost per frame barely grows with the number of routes.
+
+import math
+
+import numpy as np
+
+from .osc import control_cache
+from .osc import registry
+
+CURVES = {
+    "linear": lambda x: x,
+    "invert": lambda x: 1.0 - x,
+    "bipolar": lambda x: x * 2.0 - 1.0,
+    "square": lambda x: x * x,
+    "sqrt": lambda x: np.sqrt(np.maximum(x, 0.0)),
+    "smoothstep": lambda x: x * x * (3.0 - 2.0 * x),
+    "exp": lambda x: np.expm1(3.0 * x) / math.expm1(3.0),
+}
+
+LFO_WAVEFORMS = ["sine", "triangle", "saw", "square"]
+
+DESTINATION_DEFAULTS = {"base": 0.0, "min": 0.0, "max": 1.0}
+FLOOD_LIGHT_DEFAULTS = {"base": 1.0, "min": 0.0, "max": 1.0}
+
+
+def source_names(knobs, lfos) -> list:
+    return ["forest_health", "scene_intensity", "audio_energy"] + list(knobs) + [f"lfo.{name}" for name in lfos]
+
+
+def destination_kind(destination: str, madmapper: dict, flood_light_count: int):
+    """Returns (kind, key) for a destination name, raises ValueError when it doesn't exist."""
+    target, _, name = destination.partition(".")
+    if target == "audio":
+        bus, _, param = name.partition(".")
+        effect, _, attribute = param.partition(".")
+        if bus and effect.isdigit() and attribute:
+            return "audio", (bus, int(effect), attribute)
+    if target == "flood_lights" and name.isdigit() and int(name) < flood_light_count:
+        return "flood_lights", int(name)
+    if target == "lights" and name in madmapper.get("lights", {}).get("controls", {}):
+        return "osc", madmapper["lights"]["controls"][name]
+    if target in madmapper and target != "lights" and name in madmapper[target].get("controls", {}):
+        return "osc", madmapper[target]["controls"][name]
+    raise ValueError(f"unknown modulation destination: {destination}")
+
+
+class ModulationMatrix:
+    """
+    Routes the simulation values and LFOs to layer controls, lights controls, flood lights and audio bus effects.
+
+    Args:
+        spec (dict): The modulation section of the compiled show config, see the top of this module.
+        madmapper (dict): The compiled MadMapper config the control destinations are resolved against.
+        knobs (list[str]): The names of the simulation's knob parameters.
+        flood_light_count (int): The number of flood lights.
+
+    Attributes:
+        sources (np.ndarray): The source values of the current frame.
+        values (np.ndarray): The destination values of the current frame.
+        weights (np.ndarray): destinations x curved sources, the summed route amounts.
+        flood_light_gains (np.ndarray): The brightness of each flood light, 1 when not routed.
+        audio_params (list[tuple]): The (bus, effect index, attribute) of each audio destination.
+        routes (int): The number of routes.
+
+    Methods:
+        update(simulation: Simulation, audio_energy: float): Evaluates every route and writes the layer and lights controls
+            to the control cache.
+        update_audio(buses: dict): Sets the routed effect parameters of the audio buses, buses the engine doesn't
+            have are skipped.
+    """
+
+    def __init__(self, spec: dict, madmapper: dict, knobs, flood_light_count=2):
+        lfos = spec.get("lfos", {})
+        routes = spec.get("routes", [])
+        settings = spec.get("destinations", {})
+        self.knobs = list(knobs)
+        self.routes = len(routes)
+
+        names = source_names(self.knobs, lfos)
+        source_index = {name: i for i, name in enumerate(names)}
+        self.sources = np.zeros(len(names))
+        self.lfo_start = 3 + len(self.knobs)
+        self.lfo_rates = np.array([float(lfo.get("rate", 1.0)) for lfo in lfos.values()])
+        self.lfo_phases = np.array([float(lfo.get("phase", 0.0)) for lfo in lfos.values()])
+        self.lfo_waveforms = {}
+        for name, lfo in lfos.items():
+            waveform = lfo.get("waveform", "sine")
+            if waveform not in LFO_WAVEFORMS:
+                raise ValueError(f"unknown lfo waveform for {name}: {waveform}")
+            self.lfo_waveforms.setdefault(waveform, []).append(list(lfos).index(name))
+        self.lfo_waveforms = {w: np.array(i, dtype=np.intp) for w, i in self.lfo_waveforms.items()}
+
+        # destinations are ordered by kind so each kind is one slice of the values
+        destinations = {"osc": {}, "flood_lights": {}, "audio": {}}
+        for destination in list(settings) + [route.get("destination") for route in routes]:
+            kind, key = destination_kind(str(destination), madmapper, flood_light_count)
+            destinations[kind].setdefault(destination, key)
+        order = [d for kind in destinations.values() for d in kind]
+        self.destination_index = {d: i for i, d in enumerate(order)}
+        self.osc_count = len(destinations["osc"])
+        self.address_ids = np.array(
+            [registry.intern(address) for address in destinations["osc"].values()], dtype=np.intp
+        )
+        self.flood_lights = np.array(list(destinations["flood_lights"].values()), dtype=np.intp)
+        self.flood_light_slice = slice(self.osc_count, self.osc_count + len(self.flood_lights))
+        self.flood_light_gains = np.ones(flood_light_count)
+        self.audio_params = list(destinations["audio"].values())
+        self.audio_start = self.flood_light_slice.stop
+
+        self.base = np.zeros(len(order))
+        self.min = np.zeros(len(order))
+        self.max = np.zeros(len(order))
+        for destination, i in self.destination_index.items():
+            defaults = FLOOD_LIGHT_DEFAULTS if destination.startswith("flood_lights.") else DESTINATION_DEFAULTS
+            options = {**defaults, **settings.get(destination, {})}
+            self.base[i] = options["base"]
+            self.min[i] = options["min"]
+            self.max[i] = options["max"]
+
+        # one feature per distinct (source, curve) pair, grouped by curve
+        features = {}
+        for route in routes:
+            source = route.get("source")
+            curve = route.get("curve", "linear")
+            if source not in source_index:
+                raise ValueError(f"unknown modulation source: {source}")
+            if curve not in CURVES:
+                raise ValueError(f"unknown modulation curve: {curve}")
+            features.setdefault(curve, {}).setdefault(source, None)
+        self.curve_groups = []
+        feature_index = {}
+        for curve, curve_sources in features.items():
+            start = len(feature_index)
+            for source in curve_sources:
+                feature_index[(source, curve)] = len(feature_index)
+            self.curve_groups.append(
+                (
+                    CURVES[curve],
+                    slice(start, len(feature_index)),
+                    np.array([source_index[s] for s in curve_sources], dtype=np.intp),
+                )
+            )
+        self.features = np.zeros(len(feature_index))
+
+        self.weights = np.zeros((len(order), len(feature_index)))
+        for route in routes:
+            self.weights[
+                self.destination_index[route["destination"]],
+                feature_index[(route["source"], route.get("curve", "linear"))],
+            ] += float(route.get("amount", 1.0))
+
+        self.values = np.clip(self.base, self.min, self.max)
+
+    def update_lfos(self, time: float):
+        phase = (time * self.lfo_rates + self.lfo_phases) % 1.0
+        lfos = self.sources[self.lfo_start :]
+        for waveform, indices in self.lfo_waveforms.items():
+            p = phase[indices]
+            if waveform == "sine":
+                lfos[indices] = 0.5 - 0.5 * np.cos(2.0 * np.pi * p)
+            elif waveform == "triangle":
+                lfos[indices] = 1.0 - np.abs(1.0 - 2.0 * p)
+            elif waveform == "saw":
+                lfos[indices] = p
+            else:
+                lfos[indices] = p < 0.5
+
+    def update(self, simulation, audio_energy=0.0):
+        if self.routes == 0:
+            return
+
+        sources = self.sources
+        sources[0] = simulation.forest_health.get_current_value()
+        sources[1] = simulation.scene_intensity
+        sources[2] = audio_energy
+        for i, knob in enumerate(self.knobs):
+            sources[3 + i] = simulation.param(knob).get_current_value()
+        if len(self.lfo_rates) > 0:
+            self.update_lfos(simulation.current_time)
+
+        for curve, features, indices in self.curve_groups:
+            self.features[features] = curve(sources[indices])
+
+        values = self.base + self.weights @ self.features
+        np.clip(values, self.min, self.max, out=values)
+        self.values = values
+
+        if self.osc_count > 0:
+            control_cache.set_values_by_id(self.address_ids, values[: self.osc_count])
+        self.flood_light_gains[self.flood_lights] = values[self.flood_light_slice]
+
+    def update_audio(self, buses: dict):
+        for (name, effect, attribute), value in zip(self.audio_params, self.values[self.audio_start :]):
+            bus = buses.get(name)
+            if bus is None or bus.effects is None or effect >= len(bus.effects):
+                continue
+            if not hasattr(bus.effects[effect], attribute):
+                continue
+            bus.set_param(effect, attribute, value)
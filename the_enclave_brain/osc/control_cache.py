@@ -1,12 +1,123 @@
-_cache = {}
+# latest value sent to each osc address
+# values are stored in a float64 array indexed by registry id, the string functions are thin wrappers
+#
+# every change bumps a global version and stamps it on the address, and marks the address dirty.
+# writing the value an address already has is not a change. the output stage (output.py) sends the dirty
+# addresses once per frame, so output cost follows the rate of change rather than the number of events.
+
+from array import array
+
+import numpy as np
+
+from . import registry
+
+_values = array("d", bytes(8 * registry.MAX_ADDRESSES))
+_versions = array("Q", bytes(8 * registry.MAX_ADDRESSES))
+_is_set = bytearray(registry.MAX_ADDRESSES)
+# zero-copy numpy views for vectorized readers and writers like the state exporter and the fader bank
+_view = np.frombuffer(_values, dtype=np.float64)
+_versions_view = np.frombuffer(_versions, dtype=np.uint64)
+_is_set_view = np.frombuffer(_is_set, dtype=np.uint8)
+# ids changed since the last take_dirty, a dict keeps them in write order
+_dirty = {}
+_version = 0
+
+
+def set_value_by_id(address_id: int, value: float):
+    global _version
+    value = round(value, 3)
+    if _is_set[address_id] and _values[address_id] == value:
+        return
+    _version += 1
+    _values[address_id] = value
+    _versions[address_id] = _version
+    _is_set[address_id] = 1
+    _dirty[address_id] = None
+
+
+def set_values_by_id(address_ids: np.ndarray, values: np.ndarray):
+    """Vectorized set_value_by_id, the ids must be unique."""
+    global _version
+    values = np.round(values, 3)
+    changed = (_view[address_ids] != values) | (_is_set_view[address_ids] == 0)
+    if not changed.any():
+        return
+    address_ids = address_ids[changed]
+    count = len(address_ids)
+    _view[address_ids] = values[changed]
+    _versions_view[address_ids] = np.arange(_version + 1, _version + count + 1, dtype=np.uint64)
+    _is_set_view[address_ids] = 1
+    _version += count
+    for address_id in address_ids.tolist():
+        _dirty[address_id] = None
+
+
+def get_value_by_id(address_id: int) -> float:
+    return _values[address_id]
 
 
 def set_value(address: str, value: float):
-    _cache[address] = round(value, 3)
+    set_value_by_id(registry.intern(address), value)
 
 
 def get_value(address: str):
-    if address in _cache:
-        return _cache[address]
+    address_id = registry.address_id(address)
+    if address_id is None:
+        return 0.0
+
+    return _values[address_id]
+
+
+def version() -> int:
+    """Returns the version of the latest change to any address."""
+    return _version
+
+
+def version_of(address_id: int) -> int:
+    """Returns the version of the latest change to an address, 0 if it was never set."""
+    return _versions[address_id]
+
+
+def snapshot(address_ids) -> tuple:
+    """Reads several addresses at once.
+
+    Returns the values and the cache version they were read at, pass the version to changed_since
+    to check whether any of them moved afterwards.
+    """
+    return tuple(_values[address_id] for address_id in address_ids), _version
+
+
+def changed_since(address_ids, since: int) -> bool:
+    return any(_versions[address_id] > since for address_id in address_ids)
+
+
+def take_dirty() -> list:
+    """Returns the ids changed since the last call, in write order, and clears them."""
+    address_ids = list(_dirty)
+    _dirty.clear()
+    return address_ids
+
+
+def set_ids() -> list:
+    """Returns the ids of every address that has a value."""
+    return [address_id for address_id in range(registry.size()) if _is_set[address_id]]
+
+
+def values() -> np.ndarray:
+    """Returns a read only numpy view of all values, indexed by registry id."""
+    view = _view.view()
+    view.flags.writeable = False
+    return view
+
+
+def items():
+    return [(registry.address(address_id), _values[address_id]) for address_id in set_ids()]
+
 
-    return 0.0
+def clear():
+    global _version
+    _view[:] = 0.0
+    _versions[:] = array("Q", bytes(len(_versions) * 8))
+    _is_set[:] = bytes(len(_is_set))
+    _dirty.clear()
+    _version = 0
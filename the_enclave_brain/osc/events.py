@@ -1,19 +1,28 @@
+from collections import deque
+
+from . import registry
 from .messages import send_osc_message
+from .output import OSCOutput
 
 
 class OSCEvent:
     """
     A class representing an OSC event with an address and duration.
+    The address can be given as a string or as an interned registry id (address_id) which skips the string lookup.
 
     Attributes:
     - address (str): the OSC address of the event.
+    - address_id (int): the interned id of the address.
     - duration (float): the duration of the event in seconds.
     - time (float): The current time.
     - done (bool): whether or not the event has finished.
     """
 
-    def __init__(self, address: str, duration=0.0, debug=False):
-        self.address = address
+    def __init__(self, address: str = None, duration=0.0, debug=False, address_id: int = None):
+        if address_id is None:
+            address_id = registry.intern(address)
+        self.address_id = address_id
+        self.address = registry.address(address_id)
         self.duration = duration
         self.time = 0.0
         self.done = False
@@ -94,25 +103,117 @@ class OSCEventStack(OSCEventGroup):
         super().update()
 
 
+class EventHandle:
+    """A handle to an event added to the OSCEventManager.
+
+    Attributes:
+        event (OSCEvent): The event.
+        active (bool): Whether the event is still scheduled.
+        cancelled (bool): Whether the event was cancelled before it finished.
+
+    Methods:
+        on_complete(callback) -> EventHandle: Calls callback(handle) in the frame the event finishes,
+            right away if it already finished. Not called for cancelled events.
+        cancel(): Removes the event from the manager immediately.
+    """
+
+    __slots__ = ["manager", "event", "callbacks", "active", "cancelled"]
+
+    def __init__(self, manager, event: OSCEvent):
+        self.manager = manager
+        self.event = event
+        self.callbacks = []
+        self.active = True
+        self.cancelled = False
+
+    @property
+    def done(self) -> bool:
+        return not self.active
+
+    def on_complete(self, callback):
+        if self.active:
+            self.callbacks.append(callback)
+        elif not self.cancelled:
+            callback(self)
+        return self
+
+    def cancel(self):
+        self.manager.cancel(self)
+
+    def complete(self):
+        self.active = False
+        callbacks = self.callbacks
+        self.callbacks = []
+        for callback in callbacks:
+            callback(self)
+
+
 class OSCEventManager:
     """A class for managing OSC events.
 
+    Events are kept in a dict keyed by their handle so a cancelled event is removed right away.
+    Completion callbacks run during update in the frame their event finishes, events they add run from the next frame.
+
+    add_event and cancel must be called from the frame loop. Other threads (serial input, audio, network) use submit,
+    which only appends to a queue the manager drains at the start of its next update, so they never wait on the frame.
+
     Attributes:
-        __events (list[OSCEvent]): A private list of OSC events to manage.
+        __events (dict[EventHandle, OSCEvent]): A private dict of the scheduled OSC events in the order they were added.
+        __inbox (deque[EventHandle]): Events submitted from other threads, not scheduled yet.
+        output (OSCOutput): Sends the control values the events changed, flushed at the end of every update.
     """
 
     def __init__(self):
-        self.__events: list[OSCEvent] = []
-
-    def add_event(self, event: OSCEvent):
-        """Add an OSCEvent to the event manager."""
-        self.__events.append(event)
+        self.__events: dict[EventHandle, OSCEvent] = {}
+        # deque appends and pops are atomic, producers never take a lock
+        self.__inbox: deque = deque()
+        self.output = OSCOutput()
+
+    def add_event(self, event: OSCEvent) -> EventHandle:
+        """Add an OSCEvent to the event manager, returns a handle to cancel it or to get notified when it finishes."""
+        handle = EventHandle(self, event)
+        self.__events[handle] = event
+        return handle
+
+    def submit(self, event: OSCEvent, on_complete=None) -> EventHandle:
+        """Add an OSCEvent from any thread, it is scheduled at the start of the next update.
+
+        The completion callback is attached before the event is queued and runs on the frame loop.
+        """
+        handle = EventHandle(self, event)
+        if on_complete is not None:
+            handle.callbacks.append(on_complete)
+        self.__inbox.append(handle)
+        return handle
+
+    def cancel(self, handle: EventHandle):
+        """Remove an event from the manager, does nothing if it already finished."""
+        if not handle.active:
+            return
+        # a submitted event may still be in the inbox, the drain skips it
+        self.__events.pop(handle, None)
+        handle.active = False
+        handle.cancelled = True
+        handle.callbacks = []
+        # groups holding the event skip it
+        handle.event.done = True
 
     def update(self, dt: float):
-        """Execute all events in the manager and remove completed events."""
-        for event in self.__events:
+        """Execute all events in the manager, remove completed events and send the changed values."""
+        inbox = self.__inbox
+        while inbox:
+            handle = inbox.popleft()
+            if handle.active:
+                self.__events[handle] = handle.event
+        for handle, event in list(self.__events.items()):
+            # a callback may have cancelled it this frame
+            if not handle.active:
+                continue
             event.update(dt)
-        self.__events = [e for e in self.__events if not e.done]
+            if event.done:
+                del self.__events[handle]
+                handle.complete()
+        self.output.flush()
 
 
 class OSCSleepEvent(OSCEvent):
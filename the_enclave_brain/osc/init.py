@@ -1,37 +1,51 @@
 from . import addresses
 from ..config import MAX_LIGHT_BRIGHTNESS
+from . import registry
 from .transitions import OSCEventStack, TriggerCue, OSCTransition, ControlFade
 
-# initial reset - black out every layer and reset fx and masks
-INIT_EVENT = OSCEventStack(
-    [
-        *[
-            OSCEventStack(
-                [
-                    TriggerCue(address=addresses.layer_blackout(layer)),
-                    *[
-                        ControlFade(
-                            layer=layer,
-                            control=control,
-                            start=0.0,
-                            end=0.0,
-                            duration=0.0,
-                        )
-                        for control in [
-                            "feedback_amount",
-                            "feedback_fx_amount",
-                            "fx_amount",
-                            "mask_opacity",
-                            "opacity",
-                        ]
-                    ],
-                ]
-            )
-            for layer in ["bg1", "bg2", "fg1", "fg2"]
-        ],
-        *[
-            OSCTransition(address=addresses.lights_control_address(control), start=0.0, end=MAX_LIGHT_BRIGHTNESS, duration=6.0)
-            for control in addresses.MADMAPPER_CONFIG["lights"]["controls"].keys()
-        ],
-    ]
-)
+
+def create_init_event():
+    """Initial reset - black out every layer and reset fx and masks.
+
+    A new event is built on every call since events are consumed by the event manager.
+    """
+    return OSCEventStack(
+        [
+            *[
+                OSCEventStack(
+                    [
+                        TriggerCue(address_id=layer.blackout),
+                        *[
+                            ControlFade(
+                                layer=layer,
+                                control=control,
+                                start=0.0,
+                                end=0.0,
+                                duration=0.0,
+                            )
+                            for control in [
+                                "feedback_amount",
+                                "feedback_fx_amount",
+                                "fx_amount",
+                                "mask_opacity",
+                                "opacity",
+                            ]
+                        ],
+                    ]
+                )
+                for layer in [registry.layer_ids(name) for name in ["bg1", "bg2", "fg1", "fg2"]]
+            ],
+            *[
+                OSCTransition(start=0.0, end=MAX_LIGHT_BRIGHTNESS, duration=6.0, address_id=registry.lights_control_id(control))
+                for control in addresses.MADMAPPER_CONFIG["lights"]["controls"].keys()
+            ],
+        ]
+    )
+
+
+def create_resync_event(cue_addresses: list):
+    """Retriggers the restored cues after a warm restart instead of the full reset.
+
+    The restored control values are resent by the output stage snapshot (OSCOutput.request_snapshot).
+    """
+    return OSCEventStack([TriggerCue(address=address) for address in cue_addresses])
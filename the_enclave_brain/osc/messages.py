@@ -3,6 +3,15 @@ from pythonosc.udp_client import SimpleUDPClient
 osc_client = SimpleUDPClient("127.0.0.1", 8010)
 
 
+def set_osc_client(client):
+    """Replaces the OSC client, e.g. with a stub for headless runs.
+
+    The client only needs a send_message(address, args) method.
+    """
+    global osc_client
+    osc_client = client
+
+
 def send_osc_message(address: str, value: float, debug=False):
     if debug:
         print(f"sending message: address={address}, value={value}")
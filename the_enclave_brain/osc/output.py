@@ -0,0 +1,61 @@
+from . import control_cache
+from . import registry
+from .messages import send_osc_message
+
+
+class OSCOutput:
+    """
+    The output stage for control values. Transitions only write the control cache, once per frame
+    the output sends the addresses that changed since the previous frame.
+
+    Triggers (cues, blackouts) are not state and are still sent directly by their events.
+
+    Continuous controls can be bound to a value source instead of adding an event every frame. Bound sources
+    are sampled on every flush after the events ran, so a binding wins over an event writing the same address,
+    and the value is only sent when it changed.
+
+    Attributes:
+        snapshot_requested (bool): Whether the next flush sends every known value instead of only the changes.
+        sent (int): The number of messages sent by the last flush.
+        bindings (dict): address id -> function returning the current value.
+
+    Methods:
+        bind(address_id: int, source): Drives an address from source() every frame until unbound.
+        unbind(address_id: int): Removes a binding.
+        request_snapshot(): Makes the next flush send the full state, e.g. after MadMapper reconnects.
+        flush() -> int: Sends the pending changes (or the full snapshot) and returns the number of messages.
+    """
+
+    def __init__(self, debug=False):
+        self.debug = debug
+        self.snapshot_requested = False
+        self.sent = 0
+        self.bindings = {}
+
+    def bind(self, address_id: int, source):
+        self.bindings[address_id] = source
+
+    def unbind(self, address_id: int):
+        self.bindings.pop(address_id, None)
+
+    def request_snapshot(self):
+        self.snapshot_requested = True
+
+    def flush(self) -> int:
+        for address_id, source in self.bindings.items():
+            control_cache.set_value_by_id(address_id, source())
+
+        address_ids = control_cache.take_dirty()
+        if self.snapshot_requested:
+            self.snapshot_requested = False
+            address_ids = control_cache.set_ids()
+
+        for address_id in address_ids:
+            send_osc_message(
+                registry.address(address_id),
+                control_cache.get_value_by_id(address_id),
+                debug=self.debug,
+            )
+
+        self.sent = len(address_ids)
+        return self.sent
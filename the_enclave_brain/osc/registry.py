@@ -0,0 +1,108 @@
+# interned osc address registry
+# every address gets a dense integer id so hot paths (events, control_cache) can index arrays instead of
+# building and hashing strings. the madmapper config addresses are registered when the show config is loaded
+# (show_config.load at startup) and again on every reload, any other address is interned on first use.
+#
+# the ids of each layer are kept on a LayerIds that controllers hold on to, so building an event doesn't look
+# anything up. a reload updates the LayerIds in place.
+
+MAX_ADDRESSES = 4096
+
+_ids = {}
+_addresses = []
+_control_ids = {}
+_cue_ids = {}
+_blackout_ids = {}
+_lights_control_ids = {}
+_layer_ids = {}
+
+LAYER_CONTROLS = ["feedback_amount", "feedback_fx_amount", "fx_amount", "mask_opacity", "opacity"]
+
+
+class LayerIds:
+    """The address ids of one MadMapper layer: its controls (opacity, mask_opacity, ...) and blackout cue."""
+
+    __slots__ = ["name", "blackout", *LAYER_CONTROLS]
+
+    def __init__(self, name: str):
+        self.name = name
+        self.blackout = None
+        for control in LAYER_CONTROLS:
+            setattr(self, control, None)
+
+
+def intern(address: str) -> int:
+    """Returns the id of an address, registering it if needed."""
+    address_id = _ids.get(address)
+    if address_id is None:
+        if len(_addresses) >= MAX_ADDRESSES:
+            raise OverflowError(f"too many osc addresses, MAX_ADDRESSES={MAX_ADDRESSES}")
+        address_id = len(_addresses)
+        _ids[address] = address_id
+        _addresses.append(address)
+    return address_id
+
+
+def address_id(address: str):
+    """Returns the id of an address or None if it was never interned."""
+    return _ids.get(address)
+
+
+def address(address_id: int) -> str:
+    return _addresses[address_id]
+
+
+def size() -> int:
+    return len(_addresses)
+
+
+def control_id(layer: str, control: str) -> int:
+    return _control_ids[(layer, control)]
+
+
+def layer_cue_id(layer: str, bin: str, index: int) -> int:
+    return _cue_ids[(layer, bin, index)]
+
+
+def layer_blackout_id(layer: str) -> int:
+    return _blackout_ids[layer]
+
+
+def lights_control_id(light_control: str) -> int:
+    return _lights_control_ids[light_control]
+
+
+def layer_ids(layer: str) -> LayerIds:
+    """The ids of a layer, the same object for the lifetime of the process."""
+    return _layer_ids[layer]
+
+
+def register_config(config: dict):
+    """Interns every address in a MadMapper config and builds the structured lookups."""
+    _control_ids.clear()
+    _cue_ids.clear()
+    _blackout_ids.clear()
+    _lights_control_ids.clear()
+
+    for layer, layer_config in config.items():
+        if layer == "lights":
+            for cue in layer_config["content"]:
+                intern(cue["address"])
+            for cues in layer_config["colors"].values():
+                for cue in cues:
+                    intern(cue["address"])
+            for name, control in layer_config["controls"].items():
+                _lights_control_ids[name] = intern(control)
+            continue
+
+        ids = _layer_ids.setdefault(layer, LayerIds(layer))
+        for bin, cues in layer_config["cues"].items():
+            if bin == "blackout":
+                _blackout_ids[layer] = ids.blackout = intern(cues["address"])
+                continue
+            for index, cue in enumerate(cues):
+                _cue_ids[(layer, bin, index)] = intern(cue["address"])
+        for name, control in layer_config["controls"].items():
+            _control_ids[(layer, name)] = intern(control)
+            if name in LAYER_CONTROLS:
+                setattr(ids, name, _control_ids[(layer, name)])
@@ -2,6 +2,7 @@ import datetime
 
 from . import addresses
 from . import control_cache
+from . import registry
 from .events import OSCEvent, OSCSleepEvent, OSCEventSequence, OSCEventStack
 
 
@@ -14,14 +15,21 @@ class OSCTransition(OSCEvent):
     """
 
     def __init__(
-        self, address: str, start: float, end: float, duration: float, debug=False
+        self,
+        address: str = None,
+        start: float = 0.0,
+        end: float = 0.0,
+        duration: float = 0.0,
+        debug=False,
+        address_id: int = None,
     ):
-        super().__init__(address, duration, debug=debug)
+        super().__init__(address, duration, debug=debug, address_id=address_id)
         self.start = start
         self.end = end
 
     def update(self, dt: float):
-        """Calculates the current parameter value based on time and sends an OSC message with the current value to the specified address.
+        """Calculates the current parameter value based on time and writes it to the control cache.
+        The event manager's output stage sends it at the end of the frame if it changed.
 
         Args:
             dt (float): The time elapsed since the last call to step.
@@ -29,16 +37,21 @@ class OSCTransition(OSCEvent):
         value = self.end
         if self.duration > 0.0:
             value = (self.time / self.duration) * (self.end - self.start) + self.start
-        control_cache.set_value(self.address, value)
-        super().update(dt, value)
+        control_cache.set_value_by_id(self.address_id, value)
+        if self.debug:
+            print(f"transition: address={self.address}, value={value}")
+        super().update(dt, None)
 
 
 class ControlFade(OSCTransition):
-    """Represents a control transition for a layer."""
+    """Represents a control transition for a layer.
+
+    The layer is given as its LayerIds (registry.layer_ids), so building the event is an attribute read.
+    """
 
     def __init__(
         self,
-        layer: str,
+        layer: registry.LayerIds,
         control: str,
         start: float,
         end: float,
@@ -49,8 +62,13 @@ class ControlFade(OSCTransition):
         #     print(
         #         f"ControlFade: layer={layer}, control={control}, start={start}, end={end}, duration={duration}"
         #     )
-        address = addresses.control(layer, control)
-        super().__init__(address, start, end, duration, debug=debug)
+        super().__init__(
+            start=start,
+            end=end,
+            duration=duration,
+            debug=debug,
+            address_id=getattr(layer, control),
+        )
 
 
 class LayerTransition(OSCEventSequence):
@@ -58,7 +76,7 @@ class LayerTransition(OSCEventSequence):
     The class inherits from OSCEventSequence.
 
     Attributes:
-    - layer (str): The name of the layer to transition.
+    - layer (LayerIds): The address ids of the layer to transition, from registry.layer_ids.
     - cue_bin (str): The name of the cue bank associated with the layer.
     - cue_index (int): The index of the cue to trigger.
     - use_mask (bool): Determines whether or not the transition should use a mask.
@@ -67,21 +85,20 @@ class LayerTransition(OSCEventSequence):
 
     def __init__(
         self,
-        layer: str,
+        layer: registry.LayerIds,
         cue_bin: str,
         cue_index: int,
         use_mask=False,
         fade=0.0,
     ):
         print(
-            f"\nLayerTransition: layer={layer}, cue_bin={cue_bin}, cue_index={cue_index}, fade={fade}, use_mask={use_mask}"
+            f"\nLayerTransition: layer={layer.name}, cue_bin={cue_bin}, cue_index={cue_index}, fade={fade}, use_mask={use_mask}"
         )
         events = []
 
-        is_one_shot = addresses.is_one_shot(layer, cue_bin, cue_index)
+        is_one_shot = addresses.is_one_shot(layer.name, cue_bin, cue_index)
 
-        current_opacity = control_cache.get_value(addresses.control(layer, "opacity"))
-        mask_opacity = control_cache.get_value(addresses.control(layer, "mask_opacity"))
+        (current_opacity, mask_opacity), _ = control_cache.snapshot((layer.opacity, layer.mask_opacity))
 
         if fade > 0.0 and current_opacity > 0.0:
             if use_mask:
@@ -97,7 +114,7 @@ class LayerTransition(OSCEventSequence):
         else:
             events.append(
                 TriggerCue(
-                    layer,
+                    layer.name,
                     cue_bin,
                     cue_index,
                 )
@@ -121,8 +138,8 @@ class LayerSwitch(OSCEventSequence):
     A class that represents a layer switch event sequence.
 
     Args:
-        prev_layer (str): The name of the previous layer to be switched.
-        next_layer (str): The name of the next layer to be switched.
+        prev_layer (LayerIds): The address ids of the previous layer to be switched, from registry.layer_ids.
+        next_layer (LayerIds): The address ids of the next layer to be switched.
         cue_bin (int): The number of the cue to be triggered in the next layer.
         cue_index (int): The index of the cue to be triggered in the next layer.
         fade (float): The fade duration for all fade effects in the sequence.
@@ -131,8 +148,8 @@ class LayerSwitch(OSCEventSequence):
 
     def __init__(
         self,
-        prev_layer: str,
-        next_layer: str,
+        prev_layer: registry.LayerIds,
+        next_layer: registry.LayerIds,
         cue_bin: str,
         cue_index: int,
         fade=6.0,
@@ -140,23 +157,20 @@ class LayerSwitch(OSCEventSequence):
         fade_to_black=False,
     ):
         print(
-            f"\nLayerSwitch: prev_layer={prev_layer}, next_layer={next_layer}, cue_bin={cue_bin}, cue_index={cue_index}, fade={fade}, use_mask={use_mask}"
+            f"\nLayerSwitch: prev_layer={prev_layer.name}, next_layer={next_layer.name}, cue_bin={cue_bin}, cue_index={cue_index}, fade={fade}, use_mask={use_mask}"
         )
         events = []
 
         swap_events = []
 
-        prev_layer_opacity = control_cache.get_value(
-            addresses.control(prev_layer, "opacity")
-        )
-        prev_layer_mask_opacity = control_cache.get_value(
-            addresses.control(prev_layer, "mask_opacity")
-        )
-        next_layer_opacity = control_cache.get_value(
-            addresses.control(next_layer, "opacity")
-        )
-        next_layer_mask_opacity = control_cache.get_value(
-            addresses.control(next_layer, "mask_opacity")
+        # read all four together so the plan is built from one consistent state
+        (
+            prev_layer_opacity,
+            prev_layer_mask_opacity,
+            next_layer_opacity,
+            next_layer_mask_opacity,
+        ), _ = control_cache.snapshot(
+            (prev_layer.opacity, prev_layer.mask_opacity, next_layer.opacity, next_layer.mask_opacity)
         )
 
         if prev_layer_opacity > 0.5:
@@ -165,10 +179,10 @@ class LayerSwitch(OSCEventSequence):
             )
             prev_layer_opacity = 0.5
 
-        is_one_shot = addresses.is_one_shot(next_layer, cue_bin, cue_index)
+        is_one_shot = addresses.is_one_shot(next_layer.name, cue_bin, cue_index)
 
         if not is_one_shot:
-            events.append(TriggerCue(next_layer, cue_bin, cue_index))
+            events.append(TriggerCue(next_layer.name, cue_bin, cue_index))
             events.append(OSCSleepEvent(6.0))
             if use_mask and next_layer_mask_opacity < 1.0:
                 events.append(
@@ -227,17 +241,18 @@ class LayerSwitch(OSCEventSequence):
 class TriggerCue(OSCEvent):
     """Represents an instantaneous OSC that triggers a cue for a specific layer, cue bank, and index."""
 
-    def __init__(self, layer=None, cue_bin=None, cue_index=None, address=None):
-        print(
-            f"TriggerCue: layer={layer}, cue_bin={cue_bin}, cue_index={cue_index}, address={address}"
-        )
-        if (layer == None or cue_bin == None or cue_index == None) and address == None:
+    def __init__(self, layer=None, cue_bin=None, cue_index=None, address=None, address_id=None):
+        if (layer == None or cue_bin == None or cue_index == None) and address == None and address_id == None:
             raise Exception(
                 "Invalid cue config, must provide an address, or the layer, bin, and index"
             )
-        if address is None:
-            address = addresses.layer_cue_address(layer, cue_bin, cue_index)
-        super().__init__(address)
+        if address is None and address_id is None:
+            address_id = registry.layer_cue_id(layer, cue_bin, cue_index)
+        print(
+            f"TriggerCue: layer={layer}, cue_bin={cue_bin}, cue_index={cue_index}, "
+            f"address={address if address is not None else registry.address(address_id)}"
+        )
+        super().__init__(address, address_id=address_id)
 
     def update(self, dt: float):
         super().update(dt, 1.0)
@@ -248,7 +263,7 @@ class PlayOneShot(OSCEventSequence):
     A class that represents a sequence of events to play a one-shot video cue in a given MadMapper layer.
 
     Attributes:
-    - layer (str): The name of the layer in which the cue is being played.
+    - layer (LayerIds): The address ids of the layer in which the cue is being played.
     - cue_bin (str): The name of the cue bin containing the cue.
     - cue_index (int): The index of the cue within the cue bin.
     - fade (float): The duration (in seconds) of the fade-out when the cue ends. Defaults to 1.0.
@@ -258,14 +273,14 @@ class PlayOneShot(OSCEventSequence):
     a list of events, including a blackout trigger before the cue starts, a fade-in, and a fade-out on movie end (if fade > 0).
     """
 
-    def __init__(self, layer: str, cue_bin: str, cue_index: int, fade=1.0):
+    def __init__(self, layer: registry.LayerIds, cue_bin: str, cue_index: int, fade=1.0):
         print(
-            f"PlayOneShot: layer={layer}, cue_bin={cue_bin}, cue_index={cue_index}, fade={fade}"
+            f"PlayOneShot: layer={layer.name}, cue_bin={cue_bin}, cue_index={cue_index}, fade={fade}"
         )
         events = []
 
         # make sure the layer is blank (blackout)
-        events.append(TriggerCue(address=addresses.layer_blackout(layer)))
+        events.append(TriggerCue(address_id=layer.blackout))
 
         events.append(OSCSleepEvent(1.0))
 
@@ -275,14 +290,14 @@ class PlayOneShot(OSCEventSequence):
         # play the cue
         events.append(
             TriggerCue(
-                layer,
+                layer.name,
                 cue_bin,
                 cue_index,
             )
         )
 
         # sleep till movie end
-        events.append(OSCSleepEvent(addresses.clip_length(layer, cue_bin, cue_index)))
+        events.append(OSCSleepEvent(addresses.clip_length(layer.name, cue_bin, cue_index)))
 
         # fade out on movie end
         events.append(ControlFade(layer, "opacity", 1.0, 0.0, fade))
@@ -297,6 +312,7 @@ class OSCFlicker(OSCEventSequence):
 
     Args:
         address (str): The OSC address to send the flicker event to.
+        address_id (int): The interned registry id of the address, can be given instead of address.
         high (float): The initial value of the address.
         low (float): The final value of the address.
         period (float): The period of each flicker cycle.
@@ -308,15 +324,24 @@ class OSCFlicker(OSCEventSequence):
     """
 
     def __init__(
-        self, address: str, high=1.0, low=0.0, period=1.0, n_flicks=1, debug=False
+        self,
+        address: str = None,
+        high=1.0,
+        low=0.0,
+        period=1.0,
+        n_flicks=1,
+        debug=False,
+        address_id: int = None,
     ):
         # print(
         #     f"OSCFlicker address={address}, high={high}, low={low}, period={period}, n_flicks={n_flicks}"
         # )
         events = []
+        if address_id is None:
+            address_id = registry.intern(address)
 
         for _ in range(n_flicks):
-            events.append(OSCTransition(address, high, low, period / 2.0, debug=debug))
-            events.append(OSCTransition(address, low, high, period / 2.0, debug=debug))
+            events.append(OSCTransition(start=high, end=low, duration=period / 2.0, debug=debug, address_id=address_id))
+            events.append(OSCTransition(start=low, end=high, duration=period / 2.0, debug=debug, address_id=address_id))
         
         super().__init__(events)
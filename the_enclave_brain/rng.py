@@ -0,0 +1,49 @@
+import random
+import secrets
+
+import numpy as np
+
+
+class RandomStreams:
+    """
+    Derives independent, reproducible random number generators for each subsystem from one master seed.
+
+    Every stream is a random.Random seeded with the master seed and the stream name, so a subsystem
+    always gets the same sequence for a given seed no matter how many draws the other subsystems make.
+
+    Args:
+        seed (int, optional): The master seed. A random seed is chosen when None.
+
+    Attributes:
+        seed (int): The master seed, log it to be able to replay a session.
+
+    Methods:
+        stream(name: str) -> random.Random: Returns a new generator for the named subsystem.
+        numpy_stream(name: str) -> numpy.random.Generator: Returns a new numpy generator for the named subsystem.
+    """
+
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = secrets.randbits(32)
+        self.seed = seed
+
+    def stream(self, name: str) -> random.Random:
+        # string seeds are hashed with sha512 so they don't depend on PYTHONHASHSEED
+        return random.Random(f"{self.seed}:{name}")
+
+    def numpy_stream(self, name: str) -> np.random.Generator:
+        # seeded from the named python stream so it follows the same derivation
+        return np.random.default_rng(self.stream(name).getrandbits(128))
+
+
+def get_stream(rng_streams, name: str) -> random.Random:
+    """Helper for subsystems that may be created without streams, falls back to a randomly seeded stream."""
+    if rng_streams is None:
+        rng_streams = RandomStreams()
+    return rng_streams.stream(name)
+
+
+def get_numpy_stream(rng_streams, name: str) -> np.random.Generator:
+    if rng_streams is None:
+        rng_streams = RandomStreams()
+    return rng_streams.numpy_stream(name)
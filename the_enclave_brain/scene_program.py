@@ -0,0 +1,256 @@
+# table driven scene state machine
+#
+# a show program is a declarative table (json compatible):
+# {
+#     "name": "sequence",
+#     "initial": "healthy_forest",
+#     "forest_health_model": False,   # run the forest health model every tick
+#     "states": {
+#         "<scene>": {
+#             "hold": 0.0,            # seconds in the scene before any transition is checked
+#             "transitions": [
+#                 {
+#                     "to": "<scene>",
+#                     "after": 60.0,                                  # seconds in the scene
+#                     "when": [["forest_health", "<", 0.2], ...],     # all guards must pass
+#                     "effects": [["set", "has_burned", 1], ...],
+#                 },
+#             ],
+#         },
+#     },
+#     "any": [...],  # transitions checked from every state after its own transitions
+# }
+#
+# guards compare a source to a number or to another source
+# sources: time, time_in_scene, forest_health, scene_intensity, has_burned, has_died, roll (random in [0, 1)),
+#          any config param by name (its mean) and <param>.velocity, scaled with <source>*<factor>
+# effects: ["scene_intensity_wave", rate], ["set", "has_burned" | "has_died", value], ["forest_health", delta]
+#
+# the table is compiled once into per state tuples so each tick only checks the current state's transitions,
+# and nothing at all until the state's earliest transition time has passed
+
+import json
+import math
+import operator
+
+from .scenes import SCENES
+
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+FLAGS = ["has_burned", "has_died"]
+
+SOURCES = {
+    "time": lambda sim: sim.current_time,
+    "time_in_scene": lambda sim: sim.time_since_scene_change,
+    "forest_health": lambda sim: sim.forest_health.get_current_value(),
+    "scene_intensity": lambda sim: sim.scene_intensity,
+    "has_burned": lambda sim: 1.0 if sim.has_burned else 0.0,
+    "has_died": lambda sim: 1.0 if sim.has_died else 0.0,
+    "roll": lambda sim: sim.rng.random(),
+}
+
+
+def sequence_program(sequence: list, scene_length: float) -> dict:
+    """Builds a program that cycles through the scenes in order, changing every scene_length seconds."""
+    return {
+        "name": "sequence",
+        "initial": sequence[0],
+        "states": {
+            scene: {
+                "transitions": [
+                    {
+                        "to": sequence[(i + 1) % len(sequence)],
+                        "after": scene_length,
+                        "effects": [["scene_intensity_wave", 0.5]],
+                    }
+                ]
+            }
+            for i, scene in enumerate(sequence)
+        },
+    }
+
+
+def load_program(path: str) -> "SceneProgram":
+    with open(path) as f:
+        return SceneProgram(json.load(f))
+
+
+class CompiledTransition:
+    __slots__ = ["after", "guards", "target", "target_scene", "effects"]
+
+    def __init__(self, after, guards, target, target_scene, effects):
+        self.after = after
+        self.guards = guards
+        self.target = target
+        self.target_scene = target_scene
+        self.effects = effects
+
+
+class CompiledState:
+    __slots__ = ["scene", "min_time", "transitions"]
+
+    def __init__(self, scene, min_time, transitions):
+        self.scene = scene
+        self.min_time = min_time
+        self.transitions = transitions
+
+
+class SceneProgram:
+    """
+    A compiled show program that decides scene changes for the Simulation.
+
+    Args:
+        table (dict): The declarative program table, see the top of this module for the format.
+
+    Attributes:
+        name (str): The program name.
+        initial (str): The initial scene.
+        forest_health_model (bool): Whether the simulation should run the forest health model every tick.
+        states (list[CompiledState]): The compiled states, indexed by state index.
+        params (set): The config params read by guards.
+
+    Methods:
+        state_index(scene: str) -> int: Returns the state index of a scene.
+        update(simulation) -> bool: Checks the current state's transitions and applies the first one that passes.
+        predict_next(simulation) -> (str, float) or None: Returns the scene of the current state's first unguarded transition and the seconds until it.
+    """
+
+    def __init__(self, table: dict):
+        self.name = table.get("name", "unnamed")
+        states = table["states"]
+        if len(states) == 0:
+            raise ValueError("program has no states")
+
+        self.initial = table.get("initial", next(iter(states)))
+        self.forest_health_model = table.get("forest_health_model", False)
+        # config params used by guards, checked against the simulation config
+        self.params = set()
+        self.state_indices = {}
+        for scene in states:
+            if scene not in SCENES:
+                raise ValueError(f"unknown scene in program states: {scene}")
+            self.state_indices[scene] = len(self.state_indices)
+        if self.initial not in self.state_indices:
+            raise ValueError(f"initial scene is not a program state: {self.initial}")
+
+        any_transitions = table.get("any", [])
+        self.states = []
+        for scene, state in states.items():
+            transitions = [
+                self.compile_transition(transition)
+                for transition in [*state.get("transitions", []), *any_transitions]
+                # transitions to the current scene are no-ops
+                if transition["to"] != scene
+            ]
+            hold = state.get("hold", 0.0)
+            min_time = max(hold, min([t.after for t in transitions], default=math.inf))
+            self.states.append(CompiledState(scene, min_time, tuple(transitions)))
+
+    def compile_source(self, name):
+        if isinstance(name, (int, float)):
+            value = float(name)
+            return lambda sim: value
+        if "*" in name:
+            name, factor = name.split("*", 1)
+            source = self.compile_source(name)
+            factor = float(factor)
+            return lambda sim: source(sim) * factor
+        if name in SOURCES:
+            return SOURCES[name]
+        param, _, field = name.partition(".")
+        self.params.add(param)
+        if field == "velocity":
+            return lambda sim: sim.param(param).get_velocity()
+        if field == "":
+            return lambda sim: sim.param(param).get_mean()
+        raise ValueError(f"unknown guard source: {name}")
+
+    def compile_effect(self, effect: list):
+        name, *args = effect
+        if name == "scene_intensity_wave":
+            rate = float(args[0])
+
+            def scene_intensity_wave(sim):
+                sim.scene_intensity = math.sin(sim.current_time * rate)
+
+            return scene_intensity_wave
+        if name == "set":
+            flag, value = args
+            if flag not in FLAGS:
+                raise ValueError(f"unknown flag: {flag}")
+            value = bool(value)
+            return lambda sim: setattr(sim, flag, value)
+        if name == "forest_health":
+            delta = float(args[0])
+
+            def forest_health(sim):
+                sim.event_forest_health_effect = delta
+
+            return forest_health
+        raise ValueError(f"unknown effect: {name}")
+
+    def compile_transition(self, transition: dict) -> CompiledTransition:
+        target = transition["to"]
+        if target not in self.state_indices:
+            raise ValueError(f"transition to unknown state: {target}")
+
+        guards = []
+        for source, op, value in transition.get("when", []):
+            if op not in OPERATORS:
+                raise ValueError(f"unknown guard operator: {op}")
+            if isinstance(value, str):
+                guards.append((self.compile_source(source), OPERATORS[op], None, self.compile_source(value)))
+            else:
+                guards.append((self.compile_source(source), OPERATORS[op], float(value), None))
+
+        return CompiledTransition(
+            float(transition.get("after", 0.0)),
+            tuple(guards),
+            self.state_indices[target],
+            target,
+            tuple(self.compile_effect(effect) for effect in transition.get("effects", [])),
+        )
+
+    def state_index(self, scene: str) -> int:
+        return self.state_indices.get(scene, self.state_indices[self.initial])
+
+    def update(self, sim) -> bool:
+        state = self.states[sim.scene_index]
+        time_in_scene = sim.time_since_scene_change
+        if time_in_scene < state.min_time:
+            return False
+
+        for transition in state.transitions:
+            if time_in_scene < transition.after:
+                continue
+            passed = True
+            for source, op, value, value_source in transition.guards:
+                if not op(source(sim), value if value_source is None else value_source(sim)):
+                    passed = False
+                    break
+            if not passed:
+                continue
+
+            sim.scene_index = transition.target
+            sim.scene = transition.target_scene
+            sim.time_since_scene_change = 0
+            for effect in transition.effects:
+                effect(sim)
+            return True
+
+        return False
+
+    def predict_next(self, sim):
+        state = self.states[sim.scene_index]
+        for transition in state.transitions:
+            if len(transition.guards) == 0:
+                start = max(transition.after, state.min_time)
+                return transition.target_scene, max(0.0, start - sim.time_since_scene_change)
+        return None
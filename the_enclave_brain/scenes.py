@@ -1,5 +1,8 @@
 # this file contains scene configuration
 # each scene consists of a background cue bin and select foregrounds
+# the scenes and the flood light palette are loaded from show.json, see show_config.py
+
+from .show_config import PALETTE, SCENES
 
 MAIN_SCENES = [
     "healthy_forest",
@@ -9,71 +12,3 @@ MAIN_SCENES = [
 ]
 
 EVENTS = ["climate_change", "deforestation", "rain", "storm"]
-
-
-SCENES = {
-    "healthy_forest": {
-        "bg": ["boreal", "forest", "mountains", "rainforest", "flowers", "summer"], #, "spring"],
-        "fg": ["birds", "forest"],
-        "fg_blackout": 0.9,
-        "flood_lights": ["green", "blue"],
-    },
-    "burning_forest": {
-        "bg": ["fires"],
-        "fg": ["fires", "smoke"],
-        "flood_lights": ["red", "orange"],
-        "max_length": 48,
-        "min_length": 20,
-    },
-    "dead_forest": {
-        "bg": ["dead"],
-        "fg": ["smoke"], #, "fires"]
-        "fg_blackout": 0.9,
-        "flood_lights": ["brown", "grey"],
-    },
-    "growing_forest": {
-        "bg": ["growth", "mushrooms"],
-        "fg": ["rain", "mushrooms", "flowers"],
-        "fg_blackout": 0.5,
-        "flood_lights": ["green", "blue"],
-        "max_length": 50,
-        "min_length": 20,
-        "more_health_is_longer": True,
-    },
-    "climate_change": {
-        "bg": ["dry_pine", "drought", "smoke"],
-        "fg": ["fires", "smoke"], # "storms"],
-        "flood_lights": ["orange", "grey"],
-        "max_length": 60,
-        "min_length": 20,
-    },
-    "deforestation": {
-        "bg": [
-            "deforestation",
-            "pollution",
-            "industry",
-            "roads",
-            "logging",
-        ],
-        "fg": ["smoke"],
-        "fg_blackout": 0.8,
-        "flood_lights": ["brown", "red"],
-        "max_length": 48,
-        "min_length": 20,
-    },
-    "rain": {
-        "bg": ["rain"],
-        "fg": ["rain"],
-        "flood_lights": ["teal", "indigo"],
-        "max_length": 48,
-        "min_length": 20,
-        "more_health_is_longer": True,
-    },
-    "storm": {
-        "bg": ["storms"],
-        "fg": ["storms"],
-        "flood_lights": ["blue", "purple"],
-        "max_length": 60,
-        "min_length": 30,
-    },
-}
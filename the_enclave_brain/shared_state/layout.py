@@ -0,0 +1,39 @@
+# fixed layout of the shared memory state block
+#
+# header (HEADER_SIZE bytes, little endian)
+#   0  magic           8s
+#   8  version         u32
+#   12 value count     u32
+#   16 sequence        u64  seqlock counter, odd while the brain is writing
+#   24 names offset    u32
+#   28 names size      u32
+#   32 values offset   u32
+# names: utf-8 json written once at startup {"scenes": [...], "knobs": [...], "controls": [...]}
+# values: float64 array [tick, time, forest_health, scene_intensity, scene, *knobs, *controls]
+#   scene is the index into the scene names
+
+import struct
+
+SHARED_STATE_MAGIC = b"ENCLSTAT"
+SHARED_STATE_VERSION = 1
+SHARED_STATE_NAME = "enclave_brain_state"
+
+HEADER = struct.Struct("<8sIIQIII")
+HEADER_SIZE = 64
+SEQUENCE_OFFSET = 16
+
+TICK = 0
+TIME = 1
+FOREST_HEALTH = 2
+SCENE_INTENSITY = 3
+SCENE = 4
+KNOBS_START = 5
+
+
+def values_offset(names_size: int) -> int:
+    # keep the float64 values 8 byte aligned
+    return HEADER_SIZE + (names_size + 7) // 8 * 8
+
+
+def block_size(names_size: int, value_count: int) -> int:
+    return values_offset(names_size) + value_count * 8
@@ -0,0 +1,103 @@
+# small reader library for the shared memory state block published by the brain
+# only depends on numpy and the layout module so it can be used from any local process
+#
+#   reader = StateReader()
+#   state = reader.read()
+#   print(state.scene, state.forest_health, state.controls["/Lights/Speed"])
+#
+# run as a module to print the state: python3 -m the_enclave_brain.shared_state.reader
+
+import json
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from . import layout
+
+
+class BrainState:
+    """A consistent copy of the published brain state."""
+
+    def __init__(self, values: np.ndarray, scenes: list, knobs: list, controls: list):
+        self.values = values
+        self.tick = int(values[layout.TICK])
+        self.time = float(values[layout.TIME])
+        self.forest_health = float(values[layout.FOREST_HEALTH])
+        self.scene_intensity = float(values[layout.SCENE_INTENSITY])
+        scene_index = int(values[layout.SCENE])
+        self.scene = scenes[scene_index] if 0 <= scene_index < len(scenes) else None
+        knobs_end = layout.KNOBS_START + len(knobs)
+        self.knobs = dict(zip(knobs, values[layout.KNOBS_START : knobs_end].tolist()))
+        self.controls = dict(zip(controls, values[knobs_end:].tolist()))
+
+    def __repr__(self):
+        return (
+            f"BrainState(tick={self.tick}, time={round(self.time, 2)}, scene={self.scene}, "
+            f"forest_health={round(self.forest_health, 3)}, scene_intensity={round(self.scene_intensity, 3)}, "
+            f"knobs={self.knobs})"
+        )
+
+
+class StateReader:
+    """
+    Attaches to the brain's shared memory state block and reads consistent copies of it.
+
+    Reading never blocks the brain: the values are copied and the copy is retried if the
+    seqlock sequence number shows that the brain wrote during the copy.
+
+    Args:
+        name (str): The shared memory block name used by the brain.
+
+    Methods:
+        read_values(out=None) -> np.ndarray: Copies the raw float64 values, optionally into a preallocated array.
+        read() -> BrainState: Returns the values with names attached.
+        close(): Detaches from the block.
+    """
+
+    def __init__(self, name=layout.SHARED_STATE_NAME):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # attaching registers the block with this process' resource tracker which would remove it on exit
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+
+        magic, version, value_count, _, names_offset, names_size, values_offset = layout.HEADER.unpack_from(self.shm.buf, 0)
+        if magic != layout.SHARED_STATE_MAGIC or version != layout.SHARED_STATE_VERSION:
+            self.shm.close()
+            raise RuntimeError(f"incompatible shared state block: magic={magic}, version={version}")
+
+        names = json.loads(bytes(self.shm.buf[names_offset : names_offset + names_size]))
+        self.scenes = names["scenes"]
+        self.knobs = names["knobs"]
+        self.controls = names["controls"]
+        self.sequence = np.ndarray((1,), dtype="<u8", buffer=self.shm.buf, offset=layout.SEQUENCE_OFFSET)
+        self.values = np.ndarray((value_count,), dtype="<f8", buffer=self.shm.buf, offset=values_offset)
+
+    def read_values(self, out=None, max_retries=1000) -> np.ndarray:
+        if out is None:
+            out = np.empty_like(self.values)
+        for _ in range(max_retries):
+            start = int(self.sequence[0])
+            if start & 1:
+                continue
+            np.copyto(out, self.values)
+            if int(self.sequence[0]) == start:
+                return out
+        raise TimeoutError("could not read a consistent state")
+
+    def read(self) -> BrainState:
+        return BrainState(self.read_values(), self.scenes, self.knobs, self.controls)
+
+    def close(self):
+        del self.sequence
+        del self.values
+        self.shm.close()
+
+
+if __name__ == "__main__":
+    reader = StateReader()
+    try:
+        while True:
+            print(reader.read())
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        reader.close()
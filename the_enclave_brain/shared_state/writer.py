@@ -0,0 +1,106 @@
+import atexit
+import json
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from . import layout
+from ..osc import control_cache, registry
+from ..osc.addresses import MADMAPPER_CONFIG
+from ..scenes import SCENES
+
+
+def control_addresses() -> list:
+    """Returns every control address in the MadMapper config in a stable order."""
+    addresses = []
+    for layer_config in MADMAPPER_CONFIG.values():
+        addresses.extend(layer_config["controls"].values())
+    return addresses
+
+
+class StateExporter:
+    """
+    Publishes the brain state to a fixed layout shared memory block every tick so local consumers
+    (monitoring displays, audio reactive patches) can read it without sockets or serialization.
+
+    Writes are protected by a seqlock: the sequence number is odd while the values are being written,
+    readers retry when it is odd or changed during their copy (see reader.StateReader).
+
+    Args:
+        name (str): The shared memory block name.
+        knobs (list): The simulation config keys to export.
+
+    Methods:
+        publish(simulation: Simulation): Writes the current values.
+        close(): Releases and removes the shared memory block.
+    """
+
+    def __init__(self, name: str, knobs: list):
+        self.scenes = list(SCENES.keys())
+        self.scene_indices = {scene: i for i, scene in enumerate(self.scenes)}
+        self.knobs = list(knobs)
+        self.controls = control_addresses()
+        self.controls_start = layout.KNOBS_START + len(self.knobs)
+        self.control_ids = np.array([registry.intern(address) for address in self.controls])
+        self.control_values = control_cache.values()
+        self.tick = 0
+
+        names = json.dumps(
+            {"scenes": self.scenes, "knobs": self.knobs, "controls": self.controls}
+        ).encode()
+        value_count = self.controls_start + len(self.controls)
+        size = layout.block_size(len(names), value_count)
+
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # left over from a previous run that didn't exit cleanly
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        values_offset = layout.values_offset(len(names))
+        self.shm.buf[layout.HEADER_SIZE : layout.HEADER_SIZE + len(names)] = names
+        self.sequence = np.ndarray((1,), dtype="<u8", buffer=self.shm.buf, offset=layout.SEQUENCE_OFFSET)
+        self.values = np.ndarray((value_count,), dtype="<f8", buffer=self.shm.buf, offset=values_offset)
+        self.values[:] = 0.0
+        # the header is written last so readers never see a partial block
+        layout.HEADER.pack_into(
+            self.shm.buf,
+            0,
+            layout.SHARED_STATE_MAGIC,
+            layout.SHARED_STATE_VERSION,
+            value_count,
+            0,
+            layout.HEADER_SIZE,
+            len(names),
+            values_offset,
+        )
+        atexit.register(self.close)
+
+    def publish(self, simulation):
+        self.tick += 1
+        values = [
+            self.tick,
+            simulation.current_time,
+            simulation.forest_health.get_current_value(),
+            simulation.scene_intensity,
+            self.scene_indices.get(simulation.scene, -1),
+            *[simulation.param(knob).get_mean() for knob in self.knobs],
+        ]
+
+        self.sequence[0] += 1
+        self.values[: self.controls_start] = values
+        # gathered straight from the control cache array
+        self.values[self.controls_start :] = self.control_values[self.control_ids]
+        self.sequence[0] += 1
+
+    def close(self):
+        if self.shm is None:
+            return
+        del self.sequence
+        del self.values
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
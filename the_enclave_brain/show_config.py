@@ -0,0 +1,471 @@
+# show configuration loaded from a versioned json file (show.json next to this module by default)
+#
+# {
+#     "version": 1,
+#     "palette": {"<color>": [r, g, b], ...},
+#     "scenes": {
+#         "<scene>": {
+#             "bg": ["<bin>", ...],           # background cue bins, each must exist on bg1 or bg2
+#             "fg": ["<bin>", ...],           # foreground cue bins, each must exist on fg1 or fg2
+#             "flood_lights": ["<color>", "<color>"],
+#             "fg_blackout": 0.9,             # optional chance of blacking out the foreground
+#             "min_length": 20, "max_length": 48, "more_health_is_longer": true,  # optional
+#         },
+#     },
+#     "madmapper": {
+#         "<layer>": {
+#             "cues": {"<bin>": <cues>, "blackout": {"row": 74, "col": 1}},
+#             "controls": "<madmapper layer name>",
+#         },
+#         "lights": {"content": <cues>, "colors": {"<scene>": <cues>}, "controls": {"<name>": "<address>"}},
+#     },
+#     "modulation": {"lfos": {...}, "destinations": {...}, "routes": [...]},   # optional, see modulation.py
+# }
+#
+# <cues> is one of
+#     {"row": 4, "count": 2, "start_column": 1}      a row of cues
+#     {"column": 11, "count": 3, "start_row": 2}     a column of cues
+#     {"row": 19, "col": 1}                          a single cue
+# or a list of them. extra keys (one_shot, clip_length) are copied into every cue.
+#
+# the file is validated and compiled into the SCENES, PALETTE, MADMAPPER_CONFIG, CUE_TABLES and MODULATION tables. the compiled
+# result is pickled next to the show file (show.json -> show.cache) keyed by the file's hash so restarts skip the parsing.
+# the tables are updated in place so every module importing them sees a reload.
+#
+# the tables are empty until load() is called, the App and the entry points of the tools load the show at startup.
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+
+from .osc import registry
+
+SHOW_CONFIG_VERSION = 1
+# bump when the compiled format changes to invalidate old caches
+CACHE_FORMAT = 3
+DEFAULT_SHOW_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "show.json")
+
+LAYERS = {"bg": ["bg1", "bg2"], "fg": ["fg1", "fg2"]}
+SCENE_NUMBER_FIELDS = ["fg_blackout", "min_length", "max_length"]
+# single -> the cue spec shapes reported by validate
+CUE_SPEC_SHAPES = {
+    False: "a cue or a list of cues, each with column and count, row and count, or row and col",
+    True: "a single cue with row and col",
+}
+FLOOD_LIGHT_COUNT = 2
+
+SCENES = {}
+PALETTE = {}
+MADMAPPER_CONFIG = {}
+# scene -> flood light colors
+SCENE_COLORS = {}
+# (scene, layer type) -> CueTable
+CUE_TABLES = {}
+# lfos, destinations and routes of the modulation matrix
+MODULATION = {}
+# the show file the tables were loaded from
+_loaded_path = None
+
+
+class CueTable:
+    """
+    The cues a layer controller can choose from in a scene, flattened into parallel tuples so picking a cue
+    is index arithmetic. The cues of each layer are contiguous, in layer order.
+
+    Attributes:
+        layers (tuple[str]): The layer of each cue.
+        bins (tuple[str]): The bin of each cue.
+        indices (tuple[int]): The index of each cue in its bin.
+        size (int): The number of cues.
+        layer_counts (dict): layer -> number of cues on that layer.
+        layer_starts (dict): layer -> position of the layer's first cue.
+    """
+
+    __slots__ = ["layers", "bins", "indices", "size", "layer_counts", "layer_starts"]
+
+    def __init__(self, cues: list):
+        self.layers = tuple(layer for layer, _, _ in cues)
+        self.bins = tuple(bin for _, bin, _ in cues)
+        self.indices = tuple(index for _, _, index in cues)
+        self.size = len(cues)
+        self.layer_counts = {}
+        self.layer_starts = {}
+        for position, layer in enumerate(self.layers):
+            if layer not in self.layer_starts:
+                self.layer_starts[layer] = position
+            self.layer_counts[layer] = self.layer_counts.get(layer, 0) + 1
+
+
+def build_cue_tables(scenes: dict, madmapper: dict) -> dict:
+    tables = {}
+    for scene, scene_config in scenes.items():
+        for layer_type, layers in LAYERS.items():
+            cues = []
+            for layer in layers:
+                layer_cues = madmapper[layer]["cues"]
+                for bin in scene_config[layer_type]:
+                    if bin not in layer_cues:
+                        continue
+                    cues.extend((layer, bin, index) for index in range(len(layer_cues[bin])))
+            tables[(scene, layer_type)] = CueTable(cues)
+    return tables
+
+
+def cue(row: int, col: int, **opts):
+    return {"address": f"/cues/selected/cues/by_cell/col_{col}/row_{row}", **opts}
+
+
+def cues(row: int, count: int, start_column=1, **opts):
+    return [cue(row, i + start_column, **opts) for i in range(count)]
+
+
+def cues_column(col: int, count: int, start_row=1, **opts):
+    return [cue(i + start_row, col, **opts) for i in range(count)]
+
+
+def control_addresses(name: str):
+    return {
+        "feedback_amount": f"/modules/{name}_FEEDBACK_AMOUNT/Inputs/Input_1",
+        "feedback_fx_amount": f"/{name}/feedback/fx_amount",
+        "fx_amount": f"/{name}/fx_amount",
+        "mask_opacity": f"/surfaces/Layers/{name}_Layers/{name}_Layer_Mask/opacity",
+        "opacity": f"/surfaces/Main/{name}/opacity",
+    }
+
+
+def compile_cues(spec) -> list:
+    if isinstance(spec, list):
+        return [c for s in spec for c in compile_cues(s)]
+    opts = {k: v for k, v in spec.items() if k not in ["row", "col", "column", "count", "start_row", "start_column"]}
+    if "column" in spec:
+        return cues_column(spec["column"], spec["count"], start_row=spec.get("start_row", 1), **opts)
+    if "count" in spec:
+        return cues(spec["row"], spec["count"], start_column=spec.get("start_column", 1), **opts)
+    return [cue(spec["row"], spec["col"], **opts)]
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_cue_spec(spec, single=False) -> bool:
+    """Whether spec has the shape compile_cues expects, single for exactly one cue (row and col)."""
+    if isinstance(spec, list) and not single:
+        return all(is_cue_spec(s) for s in spec)
+    if not isinstance(spec, dict):
+        return False
+    for keys in [["row", "col"]] if single else [["column", "count"], ["row", "count"], ["row", "col"]]:
+        if all(isinstance(spec.get(k), int) for k in keys):
+            return all(isinstance(spec.get(k, 1), int) for k in ["start_row", "start_column"])
+    return False
+
+
+def reject_duplicate_keys(pairs):
+    keys = [k for k, _ in pairs]
+    duplicates = sorted({k for k in keys if keys.count(k) > 1})
+    if duplicates:
+        raise ValueError(f"duplicate keys in show config: {', '.join(duplicates)}")
+    return dict(pairs)
+
+
+def validate(raw: dict) -> list:
+    """Returns a list of problems with a parsed show config, empty when it is valid."""
+    errors = []
+    if raw.get("version") != SHOW_CONFIG_VERSION:
+        return [f"unsupported show config version {raw.get('version')}, expected {SHOW_CONFIG_VERSION}"]
+    for key in ["palette", "scenes", "madmapper"]:
+        if not isinstance(raw.get(key), dict):
+            errors.append(f"missing {key}")
+    if errors:
+        return errors
+
+    palette = raw["palette"]
+    for color, rgb in palette.items():
+        if not (
+            isinstance(rgb, list)
+            and len(rgb) == 3
+            and all(isinstance(c, int) and 0 <= c <= 255 for c in rgb)
+        ):
+            errors.append(f"palette color {color} must be three integers between 0 and 255")
+
+    madmapper = raw["madmapper"]
+    bins = {}
+    for layer_type, layers in LAYERS.items():
+        bins[layer_type] = set()
+        for layer in layers:
+            layer_config = madmapper.get(layer)
+            if not isinstance(layer_config, dict):
+                errors.append(f"missing madmapper layer {layer}")
+                continue
+            if not isinstance(layer_config.get("cues"), dict):
+                errors.append(f"madmapper layer {layer} has no cues")
+                continue
+            if "blackout" not in layer_config["cues"]:
+                errors.append(f"madmapper layer {layer} has no blackout cue")
+            for bin, spec in layer_config["cues"].items():
+                if not is_cue_spec(spec, single=bin == "blackout"):
+                    errors.append(f"madmapper layer {layer} cues {bin} must be {CUE_SPEC_SHAPES[bin == 'blackout']}")
+            if not isinstance(layer_config.get("controls"), str):
+                errors.append(f"madmapper layer {layer} controls must be the madmapper layer name")
+            bins[layer_type].update(b for b in layer_config.get("cues", {}) if b != "blackout")
+    lights = madmapper.get("lights")
+    if not isinstance(lights, dict) or not all(k in lights for k in ["content", "colors", "controls"]):
+        errors.append("madmapper lights must have content, colors and controls")
+        lights = {"colors": {}}
+    else:
+        if not is_cue_spec(lights["content"]):
+            errors.append(f"madmapper lights content must be {CUE_SPEC_SHAPES[False]}")
+        if not isinstance(lights["colors"], dict):
+            errors.append("madmapper lights colors must map scenes to cues")
+            lights = {"colors": {}}
+        for scene, spec in lights["colors"].items():
+            if not is_cue_spec(spec):
+                errors.append(f"madmapper lights colors {scene} must be {CUE_SPEC_SHAPES[False]}")
+
+    for scene, scene_config in raw["scenes"].items():
+        if not isinstance(scene_config, dict):
+            errors.append(f"scene {scene} must be an object")
+            continue
+        for layer_type in LAYERS:
+            scene_bins = scene_config.get(layer_type, [])
+            if len(scene_bins) == 0:
+                errors.append(f"scene {scene} has no {layer_type} bins")
+            for bin in scene_bins:
+                if bin not in bins[layer_type]:
+                    errors.append(f"scene {scene} {layer_type} bin {bin} is not on any {layer_type} layer")
+        colors = scene_config.get("flood_lights", [])
+        if len(colors) != FLOOD_LIGHT_COUNT:
+            errors.append(f"scene {scene} must have {FLOOD_LIGHT_COUNT} flood light colors")
+        for color in colors:
+            if color not in palette:
+                errors.append(f"scene {scene} flood light color {color} is not in the palette")
+        if scene not in lights["colors"]:
+            errors.append(f"scene {scene} has no madmapper lights colors")
+        numbers = {field: scene_config[field] for field in SCENE_NUMBER_FIELDS if field in scene_config}
+        for field, value in numbers.items():
+            if not is_number(value):
+                errors.append(f"scene {scene} {field} must be a number")
+        if is_number(numbers.get("fg_blackout", 0.0)) and not 0.0 <= numbers.get("fg_blackout", 0.0) <= 1.0:
+            errors.append(f"scene {scene} fg_blackout must be between 0 and 1")
+        min_length = numbers.get("min_length", 0)
+        max_length = numbers.get("max_length", float("inf"))
+        if is_number(min_length) and is_number(max_length) and min_length > max_length:
+            errors.append(f"scene {scene} min_length is greater than max_length")
+
+    # names are checked when the matrix is built, they depend on the simulation's knobs
+    modulation = raw.get("modulation", {})
+    if not isinstance(modulation, dict):
+        errors.append("modulation must be an object")
+        modulation = {}
+    for lfo, lfo_config in modulation.get("lfos", {}).items():
+        if not isinstance(lfo_config.get("rate", 1.0), (int, float)):
+            errors.append(f"modulation lfo {lfo} rate must be a number")
+    for destination, options in modulation.get("destinations", {}).items():
+        if not all(isinstance(options.get(k, 0.0), (int, float)) for k in ["base", "min", "max"]):
+            errors.append(f"modulation destination {destination} base, min and max must be numbers")
+    for i, route in enumerate(modulation.get("routes", [])):
+        if not isinstance(route, dict) or not all(k in route for k in ["source", "destination"]):
+            errors.append(f"modulation route {i} must have a source and a destination")
+        elif not isinstance(route.get("amount", 1.0), (int, float)):
+            errors.append(f"modulation route {i} amount must be a number")
+
+    return errors
+
+
+def compile_show_config(raw: dict) -> dict:
+    madmapper = {}
+    for layer, layer_config in raw["madmapper"].items():
+        if layer == "lights":
+            madmapper[layer] = {
+                "content": compile_cues(layer_config["content"]),
+                "colors": {scene: compile_cues(spec) for scene, spec in layer_config["colors"].items()},
+                "controls": dict(layer_config["controls"]),
+            }
+            continue
+        layer_cues = {}
+        for bin, spec in layer_config["cues"].items():
+            # the blackout is a single cue, every other bin is a list
+            layer_cues[bin] = compile_cues(spec)[0] if bin == "blackout" else compile_cues(spec)
+        madmapper[layer] = {"cues": layer_cues, "controls": control_addresses(layer_config["controls"])}
+
+    palette = {color: tuple(rgb) for color, rgb in raw["palette"].items()}
+    modulation = raw.get("modulation", {})
+    return {
+        "scenes": raw["scenes"],
+        "palette": palette,
+        "madmapper": madmapper,
+        "cue_tables": build_cue_tables(raw["scenes"], madmapper),
+        "scene_colors": {
+            scene: [palette[color] for color in scene_config["flood_lights"]]
+            for scene, scene_config in raw["scenes"].items()
+        },
+        "modulation": {
+            "lfos": modulation.get("lfos", {}),
+            "destinations": modulation.get("destinations", {}),
+            "routes": modulation.get("routes", []),
+        },
+    }
+
+
+def read_cache(cache_path: str, digest: str):
+    try:
+        with open(cache_path, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+    if (
+        not isinstance(cached, dict)
+        or cached.get("format") != CACHE_FORMAT
+        or cached.get("digest") != digest
+    ):
+        return None
+    return cached["compiled"]
+
+
+def write_cache(cache_path: str, digest: str, compiled: dict):
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump(
+                {"format": CACHE_FORMAT, "digest": digest, "compiled": compiled},
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        # the cache only speeds up startup
+        print("could not write show config cache:", e)
+
+
+def cache_path_for(path: str) -> str:
+    """The compiled config of a show file is cached next to it, show.json -> show.cache."""
+    return os.path.splitext(path)[0] + ".cache"
+
+
+def load_show_config(path=DEFAULT_SHOW_CONFIG_PATH, cache_path=None) -> dict:
+    """Loads, validates and compiles a show config, raises ValueError when it is invalid.
+
+    The compiled result is read from / written to cache_path, by default next to the show file.
+    """
+    if cache_path is None:
+        cache_path = cache_path_for(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    compiled = read_cache(cache_path, digest)
+    if compiled is not None:
+        return compiled
+
+    raw = json.loads(data, object_pairs_hook=reject_duplicate_keys)
+    errors = validate(raw)
+    if errors:
+        raise ValueError(f"invalid show config {path}:\n  " + "\n  ".join(errors))
+    compiled = compile_show_config(raw)
+    write_cache(cache_path, digest, compiled)
+    return compiled
+
+
+def load(path=None):
+    """Loads a show config file (show.json by default) into the tables, unless it is the one already loaded."""
+    global _loaded_path
+    path = os.path.abspath(path or DEFAULT_SHOW_CONFIG_PATH)
+    if path == _loaded_path:
+        return
+    apply_show_config(load_show_config(path))
+    _loaded_path = path
+
+
+def reload_errors(compiled: dict) -> list:
+    """Returns the changes a running show can't pick up without a restart."""
+    errors = []
+    if set(compiled["scenes"]) != set(SCENES):
+        errors.append("the scenes changed")
+    if set(compiled["madmapper"]) != set(MADMAPPER_CONFIG):
+        errors.append("the madmapper layers changed")
+    return errors
+
+
+def apply_show_config(compiled: dict):
+    """Swaps the compiled tables in place. Must be called between frames."""
+    for table, values in [
+        (SCENES, compiled["scenes"]),
+        (PALETTE, compiled["palette"]),
+        (MADMAPPER_CONFIG, compiled["madmapper"]),
+        (SCENE_COLORS, compiled["scene_colors"]),
+        (CUE_TABLES, compiled["cue_tables"]),
+        (MODULATION, compiled["modulation"]),
+    ]:
+        table.clear()
+        table.update(values)
+    registry.register_config(MADMAPPER_CONFIG)
+
+
+def rebuild_cue_tables():
+    """Rebuilds the cue tables after SCENES was edited in place (e.g. by sweep overrides)."""
+    CUE_TABLES.clear()
+    CUE_TABLES.update(build_cue_tables(SCENES, MADMAPPER_CONFIG))
+
+
+class ShowConfigWatcher:
+    """
+    Watches a show config file from a background thread and compiles it when it changes.
+    The main loop picks up the result with poll() at a frame boundary and applies it there,
+    so a frame never sees a half swapped config.
+
+    Args:
+        path (str): The show config file.
+        interval (float): Seconds between checks of the file's modification time.
+
+    Methods:
+        poll() -> dict or None: Returns a newly compiled config once, None when there is nothing new.
+        stop(): Stops the watcher thread.
+    """
+
+    def __init__(self, path: str, interval=1.0):
+        self.path = path
+        self.interval = interval
+        self.stat = self.file_stat()
+        self.pending = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="show-config-watcher", daemon=True)
+        self.thread.start()
+
+    def file_stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            stat = self.file_stat()
+            if stat is None or stat == self.stat:
+                continue
+            self.stat = stat
+            started = time.perf_counter()
+            try:
+                compiled = load_show_config(self.path)
+            except Exception as e:
+                # keep running the current config, whatever is wrong with the edit must not stop the watcher
+                print("show config not reloaded:", e)
+                continue
+            print(f"show config compiled in {(time.perf_counter() - started) * 1000:.1f}ms")
+            with self.lock:
+                self.pending = compiled
+
+    def poll(self):
+        if self.pending is None:
+            return None
+        with self.lock:
+            compiled = self.pending
+            self.pending = None
+        return compiled
+
+    def stop(self):
+        self.stopped.set()
+
@@ -1,14 +1,9 @@
 import math
-import numpy as np
 from threading import Lock
-import random
 
-from .utils import scale_value
-from .config import STEPS_PER_SECOND
+from .rng import get_stream
 from .parameter import Parameter
-from .scenes import MAIN_SCENES, SCENES
-
-VELOCITY_THRESHOLD = 0.1  # needs testing
+from .scene_program import SceneProgram, sequence_program
 
 SCENE_SEQUENCE = [
     "healthy_forest",
@@ -35,11 +30,17 @@ class Simulation:
     Attributes:
         - scene (str): the current scene of the simulation
         - config (dict): a dictionary of configuration parameters and their corresponding values
-        - lock (Lock): a threading lock used to prevent race conditions when updating the configuration
+        - lock (Lock): guards the swap of the pending config buffers, held only for a few instructions
+        - pending_config (dict): knob values set by input threads since the last apply_config, latest value per key
+        - rng (random.Random): the simulation's random number stream
+        - program (SceneProgram): the compiled show program deciding scene changes, defaults to cycling through SCENE_SEQUENCE
     """
 
-    def __init__(self):
-        self.scene = SCENE_SEQUENCE[0]
+    def __init__(self, rng_streams=None, program=None):
+        if program is None:
+            program = SceneProgram(sequence_program(SCENE_SEQUENCE, SCENE_LENGTH))
+        self.program = program
+        self.scene = program.initial
         self.forest_health = Parameter(1.0, lookback=1)
         self.config = {
             # this is a parameter controlling the impact of climate change
@@ -57,7 +58,13 @@ class Simulation:
                 "parameter": Parameter(0.5, lookback=1),
             },
         }
+        missing_params = program.params - self.config.keys()
+        if len(missing_params) > 0:
+            raise ValueError(f"program {program.name} uses unknown params: {missing_params}")
         self.lock = Lock()
+        # double buffered knob updates: input threads write one buffer, the frame loop applies the other
+        self.pending_config = {}
+        self.applying_config = {}
         self.event_till = None
         self.event_length = None
         self.current_time = 0.0
@@ -66,7 +73,43 @@ class Simulation:
         self.has_died = False
         self.has_burned = False
         self.time_since_scene_change = 0
-        self.scene_index = 0
+        self.scene_index = program.state_index(self.scene)
+        self.rng = get_stream(rng_streams, "simulation")
+
+    def get_state(self) -> dict:
+        """Returns the state needed to resume the simulation after a restart."""
+        return {
+            "scene": self.scene,
+            "scene_index": self.scene_index,
+            "current_time": self.current_time,
+            "time_since_scene_change": self.time_since_scene_change,
+            "scene_intensity": self.scene_intensity,
+            "forest_health": self.forest_health.get_current_value(),
+            "event_till": self.event_till,
+            "event_length": self.event_length,
+            "event_forest_health_effect": self.event_forest_health_effect,
+            "has_died": self.has_died,
+            "has_burned": self.has_burned,
+            "params": {key: self.param(key).get_current_value() for key in self.config},
+        }
+
+    def set_state(self, state: dict):
+        """Resumes the simulation from a state returned by get_state."""
+        self.scene = state["scene"]
+        # the snapshot may come from a different program
+        self.scene_index = self.program.state_index(self.scene)
+        self.current_time = state["current_time"]
+        self.time_since_scene_change = state["time_since_scene_change"]
+        self.scene_intensity = state["scene_intensity"]
+        self.forest_health.update_value(state["forest_health"])
+        self.event_till = state["event_till"]
+        self.event_length = state["event_length"]
+        self.event_forest_health_effect = state["event_forest_health_effect"]
+        self.has_died = state["has_died"]
+        self.has_burned = state["has_burned"]
+        for key, value in state["params"].items():
+            if key in self.config:
+                self.param(key).update_value(value)
 
     def param(self, name: str) -> Parameter:
         """Helper for retrieving config params"""
@@ -78,44 +121,25 @@ class Simulation:
         print(f"forest_health={self.forest_health.get_current_value()}")
 
     def update_config(self, key: str, value: float):
-        """Updates a configuration parameter"""
-        # self.lock.acquire()
-        if key != "fate":
-            value = value * 2.0 - 1.0
-        # print("Updating", key, "to", value)
-        self.config[key]["parameter"].update_value(value)
-        # self.lock.release()
-
-    def handle_event(self, event: str, duration=30.0):
-        """Set scene to event and determine effect on forest health."""
-        if event not in SCENES:
-            return
-        
-        self.scene = event
-        self.event_till = self.current_time + duration
-        self.event_length = duration
-        self.time_since_scene_change = 0
-
-        if event == "climate_change" or event == "deforestation":
-            self.event_forest_health_effect = -0.1
-
-        if event == "storm":
-            self.event_forest_health_effect = -0.1
-
-        if event == "rain":
-            self.event_forest_health_effect = 0.1
-
-    def trigger_event(self, event: str):
-        """Trigger a given event."""
-        # self.lock.acquire()
-
-        if event == "reset":
-            self.forest_health = Parameter(1.0, lookback=STEPS_PER_SECOND)
-            self.current_time = 0.0
-        else:
-            self.handle_event(event)
-
-        # self.lock.release()
+        """Updates a configuration parameter, safe to call from any thread.
+        The value is applied by apply_config at the start of the next frame."""
+        if key not in self.config:
+            raise KeyError(f"unknown config param: {key}")
+        with self.lock:
+            self.pending_config[key] = value
+
+    def apply_config(self):
+        """Applies the knob values set since the last call. Called by the frame loop at the start of a frame."""
+        with self.lock:
+            pending = self.pending_config
+            self.pending_config = self.applying_config
+        for key, value in pending.items():
+            if key != "fate":
+                value = value * 2.0 - 1.0
+            # print("Updating", key, "to", value)
+            self.config[key]["parameter"].update_value(value)
+        pending.clear()
+        self.applying_config = pending
 
     def get_forest_health(self, dt: float):
         """Computes the current forest health."""
@@ -151,136 +175,6 @@ class Simulation:
         fate_value = self.param("fate").get_mean()
         self.scene_intensity = min(1.0, scene_intensity * 0.7 + fate_value * 0.3)
     
-    def update_event_length(self):
-        if self.event_length is None:
-            return
-
-        scene_config = SCENES[self.scene]
-        if "max_length" not in scene_config or "min_length" not in scene_config:
-            return
-        
-        min_length = scene_config["min_length"]
-        max_length = scene_config["max_length"]
-        old_event_length = self.event_length
-        value = self.forest_health.get_current_value()
-        if "more_health_is_longer" not in scene_config or not scene_config["more_health_is_longer"]:
-            value = 1.0 - value
-        # self.event_length = scale_value(value, 0.0, 1.0, min_length, max_length)
-        self.event_lenght = value * (max_length - min_length) + min_length
-        self.event_till += self.event_length - old_event_length
-
-    def trigger_knob_event(
-        self, event: str, param: Parameter, value_threshold=0.25
-    ):
-        if self.event_till is not None:
-            return
-
-        value = param.get_mean()
-        velocity = param.get_velocity()
-        if np.sign(velocity) != np.sign(value_threshold) or abs(velocity) < VELOCITY_THRESHOLD:
-            return
-        
-        if (
-            (value_threshold > 0.0 and value > value_threshold) or
-            (value_threshold < 0.0 and value < value_threshold)
-        ):
-            print(f"event={event}, param_value={value}, velocity={velocity}, value_threshold={value_threshold}")
-            print("triggering knob event:", event)
-            self.handle_event(event, 30 * (1.0 + abs(value)))
-
-    def trigger_velocity_events(self):
-        """Triggers events based on parameter velocity."""
-        if self.event_till is not None:
-            return
-
-        # trigger events on fast control change
-        # self.trigger_event_on_velocity(
-        #     "climate_change", self.param("climate_change")
-        # )
-        # self.trigger_event_on_velocity(
-        #     "deforestation", self.param("human_activity"), 0.75
-        # )
-        # self.trigger_event_on_velocity(
-        #     "growing_forest", self.param("human_activity"), 0.25, invert=True
-        # )
-        # @todo adjust threshold based on fate
-        self.trigger_knob_event("storm", self.param("climate_change"), -0.75)
-        self.trigger_knob_event("rain", self.param("climate_change"), -0.3)
-        self.trigger_knob_event("climate_change", self.param("climate_change"), 0.5)
-        self.trigger_knob_event("growing_forest", self.param("human_activity"), -0.5)
-        self.trigger_knob_event("deforestation", self.param("human_activity"), 0.5)
-
-    def trigger_probability_event(self, event: str, param: Parameter, roll: float, weight=0.0001):
-        """Trigger event based on param probability and roll"""
-        if self.event_till is not None:
-            return
-
-        value = param.get_mean() * weight
-        if roll < value:
-            print(f"triggering probability event ({roll} < {value}):", event)
-            self.handle_event(event)
-            return 0.0
-
-        return roll - value
-
-    def trigger_fate_events(self):
-        """Triggers events randomly based on fate."""
-        if self.event_till is not None:
-            return
-
-        # trigger random events based on fate
-        fate_value = self.param("fate").get_mean() * 0.001
-        fate_roll = random.random()
-        if fate_roll < fate_value:
-            fate_events = ["rain", "storm"]
-            event = fate_events[random.randint(0, len(fate_events) - 1)]
-            print(f"triggering fate event ({fate_roll} < {fate_value}):", event)
-            self.handle_event(event)
-            return
-        # else:
-        #     fate_roll -= fate_value
-
-        # fate_roll = self.trigger_probability_event(
-        #     "climate_change", self.param("climate_change"), fate_roll
-        # )
-
-        # self.trigger_probability_event(
-        #     "deforestation", self.param("human_activity"), fate_roll
-        # )
-
-    def set_main_scene(self):
-        """Sets the main scene if there is no current event"""
-        if self.event_till is not None or self.time_since_scene_change < 15.0:
-            return
-
-        prev_scene = self.scene
-        # trigger time based scenes
-        forest_health = self.forest_health.get_current_value()
-        if forest_health < 0.2:
-            if not self.has_burned:
-                self.handle_event("burning_forest", 20)
-                self.has_burned = True
-            else:
-                self.scene = "dead_forest"
-                self.has_died = True
-        elif forest_health < 0.5:
-            if self.has_died or self.has_burned:
-                self.handle_event("growing_forest", 20)
-                self.has_burned = False
-            else:
-                self.handle_event("burning_forest", 20)
-                self.has_burned = True
-        else:
-            if self.has_burned:
-                self.handle_event("growing_forest", 20)
-            else:
-                self.scene = "healthy_forest"
-            self.has_died = False
-            self.has_burned = False
-
-        if self.scene is not prev_scene:
-            self.time_since_scene_change = 0
-
     def commit_config_params(self):
         """Saves current config params for the current frame."""
         for param in self.config.keys():
@@ -288,41 +182,15 @@ class Simulation:
 
     def update(self, dt: float):
         """Main simulation update logic."""
-        # self.lock.acquire()
-
         self.current_time += dt
         self.time_since_scene_change += dt
 
-        if self.time_since_scene_change < SCENE_LENGTH:
-            return
-        
-        self.scene_index = (self.scene_index + 1) % len(SCENE_SEQUENCE)
-        self.scene = SCENE_SEQUENCE[self.scene_index]
-        self.time_since_scene_change = 0
-
-        self.scene_intensity = math.sin(self.current_time * 0.5)
-
-        # if self.event_till is not None:
-        #     if self.current_time >= self.event_till:
-        #         self.event_till = None
-        #         self.event_length = None
-
-        # self.update_scene_data(dt)
-
-        # self.update_event_length()
-
-        # self.trigger_velocity_events()
-
-        # self.trigger_fate_events()
-
-        # self.set_main_scene()
-
-        # self.commit_config_params()
-
-        # @todo remove
-        # self.randomize_config_params()
+        if self.program.forest_health_model:
+            self.update_scene_data(dt)
+            self.commit_config_params()
 
-        # . self.lock.release()
+        # scene changes come from the show program
+        self.program.update(self)
 
     def randomize_config_params(self):
         """Randomize config params for testing"""
@@ -0,0 +1,256 @@
+import math
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+# snapshot file layout
+# - file header: magic, format version
+# - two slots written alternately so a crash mid-write always leaves the previous snapshot intact
+# - each slot: header (sequence number, payload length, crc32) followed by the payload
+SNAPSHOT_MAGIC = b"ENCL"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_FILE_SIZE = 64 * 1024
+
+_FILE_HEADER = struct.Struct("<4sH")
+_SLOT_HEADER = struct.Struct("<QII")
+_SLOT_SIZE = (SNAPSHOT_FILE_SIZE - _FILE_HEADER.size) // 2
+_MAX_PAYLOAD = _SLOT_SIZE - _SLOT_HEADER.size
+
+_SIMULATION = struct.Struct("<Iddddddd??")
+_LAYER = struct.Struct("<IId")
+_VALUE = struct.Struct("<d")
+_COLOR = struct.Struct("<BBB")
+_COUNT = struct.Struct("<H")
+
+
+def _pack_str(value) -> bytes:
+    data = (value or "").encode()
+    return struct.pack("<B", len(data)) + data
+
+
+def _unpack_str(data, offset: int):
+    length = data[offset]
+    offset += 1
+    return bytes(data[offset : offset + length]).decode(), offset + length
+
+
+def _optional(value):
+    return math.nan if value is None else value
+
+
+def _from_optional(value):
+    return None if math.isnan(value) else value
+
+
+def encode_snapshot(state: dict) -> bytes:
+    """Packs the show state collected by App.get_state into the compact binary snapshot format."""
+    sim = state["simulation"]
+    parts = [
+        _pack_str(sim["scene"]),
+        _SIMULATION.pack(
+            sim["scene_index"],
+            sim["current_time"],
+            sim["time_since_scene_change"],
+            sim["scene_intensity"],
+            sim["forest_health"],
+            _optional(sim["event_till"]),
+            _optional(sim["event_length"]),
+            sim["event_forest_health_effect"],
+            sim["has_died"],
+            sim["has_burned"],
+        ),
+        _COUNT.pack(len(sim["params"])),
+    ]
+    for name, value in sim["params"].items():
+        parts.append(_pack_str(name))
+        parts.append(_VALUE.pack(value))
+
+    parts.append(_COUNT.pack(len(state["layers"])))
+    for layer_type, layer in state["layers"].items():
+        parts.append(_pack_str(layer_type))
+        parts.append(_pack_str(layer["scene"]))
+        parts.append(_pack_str(layer["current_layer"]))
+        parts.append(_pack_str(layer["current_bin"]))
+        parts.append(_LAYER.pack(layer["current_index"], layer["cue_index"], layer["time"]))
+
+    parts.append(_COUNT.pack(len(state["control_cache"])))
+    for address, value in state["control_cache"]:
+        parts.append(_pack_str(address))
+        parts.append(_VALUE.pack(value))
+
+    parts.append(_COUNT.pack(len(state["flood_lights"])))
+    for color in state["flood_lights"]:
+        parts.append(_COLOR.pack(*color))
+
+    return b"".join(parts)
+
+
+def decode_snapshot(data) -> dict:
+    """Unpacks a snapshot payload into the dict format expected by App.set_state."""
+    scene, offset = _unpack_str(data, 0)
+    (
+        scene_index,
+        current_time,
+        time_since_scene_change,
+        scene_intensity,
+        forest_health,
+        event_till,
+        event_length,
+        event_forest_health_effect,
+        has_died,
+        has_burned,
+    ) = _SIMULATION.unpack_from(data, offset)
+    offset += _SIMULATION.size
+
+    params = {}
+    (count,) = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    for _ in range(count):
+        name, offset = _unpack_str(data, offset)
+        (params[name],) = _VALUE.unpack_from(data, offset)
+        offset += _VALUE.size
+
+    layers = {}
+    (count,) = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    for _ in range(count):
+        layer_type, offset = _unpack_str(data, offset)
+        layer_scene, offset = _unpack_str(data, offset)
+        current_layer, offset = _unpack_str(data, offset)
+        current_bin, offset = _unpack_str(data, offset)
+        current_index, cue_index, time = _LAYER.unpack_from(data, offset)
+        offset += _LAYER.size
+        layers[layer_type] = {
+            "scene": layer_scene,
+            "current_layer": current_layer or None,
+            "current_bin": current_bin,
+            "current_index": current_index,
+            "cue_index": cue_index,
+            "time": time,
+        }
+
+    cache = []
+    (count,) = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    for _ in range(count):
+        address, offset = _unpack_str(data, offset)
+        (value,) = _VALUE.unpack_from(data, offset)
+        offset += _VALUE.size
+        cache.append((address, value))
+
+    flood_lights = []
+    (count,) = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    for _ in range(count):
+        flood_lights.append(_COLOR.unpack_from(data, offset))
+        offset += _COLOR.size
+
+    return {
+        "simulation": {
+            "scene": scene,
+            "scene_index": scene_index,
+            "current_time": current_time,
+            "time_since_scene_change": time_since_scene_change,
+            "scene_intensity": scene_intensity,
+            "forest_health": forest_health,
+            "event_till": _from_optional(event_till),
+            "event_length": _from_optional(event_length),
+            "event_forest_health_effect": event_forest_health_effect,
+            "has_died": has_died,
+            "has_burned": has_burned,
+            "params": params,
+        },
+        "layers": layers,
+        "control_cache": cache,
+        "flood_lights": flood_lights,
+    }
+
+
+class SnapshotStore:
+    """
+    Keeps the latest show state snapshot in a memory-mapped file for warm restarts.
+
+    Writes only copy the payload into the mapping, the kernel writes the pages back to disk.
+    A background thread additionally flushes after each write so a power cut loses at most one interval.
+
+    Args:
+        path (str): The snapshot file, created when missing.
+
+    Methods:
+        write(payload: bytes): Stores a new snapshot in the older of the two slots.
+        read() -> bytes or None: Returns the newest valid snapshot payload.
+        close(): Flushes and unmaps the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != SNAPSHOT_FILE_SIZE:
+                os.ftruncate(fd, SNAPSHOT_FILE_SIZE)
+            self.mmap = mmap.mmap(fd, SNAPSHOT_FILE_SIZE)
+        finally:
+            os.close(fd)
+
+        magic, version = _FILE_HEADER.unpack_from(self.mmap, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            # new or incompatible file - start over
+            self.mmap[:] = bytes(SNAPSHOT_FILE_SIZE)
+            _FILE_HEADER.pack_into(self.mmap, 0, SNAPSHOT_MAGIC, SNAPSHOT_VERSION)
+
+        self.sequence = max(seq for seq, _ in self._slots())
+        self._flush_requested = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def _slot_offset(self, slot: int) -> int:
+        return _FILE_HEADER.size + slot * _SLOT_SIZE
+
+    def _slots(self):
+        """Returns (sequence, payload) for both slots, the payload is None for invalid slots."""
+        slots = []
+        for slot in range(2):
+            offset = self._slot_offset(slot)
+            sequence, length, crc = _SLOT_HEADER.unpack_from(self.mmap, offset)
+            start = offset + _SLOT_HEADER.size
+            payload = None
+            if 0 < length <= _MAX_PAYLOAD:
+                data = self.mmap[start : start + length]
+                if zlib.crc32(data) == crc:
+                    payload = data
+            slots.append((sequence if payload is not None else 0, payload))
+        return slots
+
+    def read(self):
+        sequence, payload = max(self._slots(), key=lambda slot: slot[0])
+        return payload
+
+    def write(self, payload: bytes):
+        if len(payload) > _MAX_PAYLOAD:
+            raise ValueError(f"snapshot too large: {len(payload)} > {_MAX_PAYLOAD} bytes")
+
+        self.sequence += 1
+        offset = self._slot_offset(self.sequence % 2)
+        # invalidate the slot, write the payload, then commit it with the header
+        _SLOT_HEADER.pack_into(self.mmap, offset, 0, 0, 0)
+        start = offset + _SLOT_HEADER.size
+        self.mmap[start : start + len(payload)] = payload
+        _SLOT_HEADER.pack_into(self.mmap, offset, self.sequence, len(payload), zlib.crc32(payload))
+        self._flush_requested.set()
+
+    def _flush_loop(self):
+        while True:
+            self._flush_requested.wait()
+            self._flush_requested.clear()
+            try:
+                self.mmap.flush()
+            except ValueError:
+                # the mapping was closed
+                return
+
+    def close(self):
+        self.mmap.flush()
+        self.mmap.close()
+        self._flush_requested.set()
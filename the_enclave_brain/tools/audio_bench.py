@@ -0,0 +1,192 @@
+# offline audio benchmark
+# - renders the music, foley and quotes controllers on a NullOutput, faster than realtime, no audio device needed
+# - plays scripted scene sequences and quote triggers on the audio clock, the controllers update every 100ms
+# - every block size runs in a fresh process with its own asset cache folder, so peak memory and cache loads are per run
+# - reports engine cpu per rendered second, block render times, deadline misses, stream underruns and peak memory
+#
+# usage (from the folder containing music/, audio/ and quotes/ or normalized_audio/):
+#   python3 -m the_enclave_brain.tools.audio_bench --duration 300 --block-sizes 256,512,1024,2048 \
+#       --scripts scene_cycle,quote_burst --output audio_bench.json
+#
+# --render-dir writes every run to a WAV file to listen to
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .. import show_config
+from ..scenes import SCENES
+
+# seconds between controller updates, like the frame loop
+UPDATE_INTERVAL = 0.1
+
+SCRIPT_NAMES = ["scene_cycle", "quote_burst", "scene_thrash"]
+
+
+def build_scripts(scenes: list) -> dict:
+    """Scripts are lists of (time in seconds, action, scene), actions are "scene" and "quote"."""
+    return {
+        "scene_cycle": [
+            (i * 60.0, "scene", scene) for i, scene in enumerate(scenes)
+        ] + [
+            (i * 60.0 + offset, "quote", scene) for i, scene in enumerate(scenes) for offset in (10.0, 40.0)
+        ],
+        "quote_burst": [(0.0, "scene", "healthy_forest")] + [
+            (1.0 + i * 2.0, "quote", scenes[i % len(scenes)]) for i in range(150)
+        ],
+        "scene_thrash": [(i * 5.0, "scene", scenes[i % len(scenes)]) for i in range(60)],
+    }
+
+
+def peak_rss_mb() -> float:
+    """The peak resident memory of this process."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports kilobytes, macos bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_one(run: dict) -> dict:
+    """Renders one script at one block size in this worker process."""
+    from ..audio.assets import AssetCache
+    from ..audio.engine import AudioEngine, NullOutput
+    from ..audio.streaming import ReadAhead
+    from ..controllers.audio_controller import Audio_controller
+    from ..rng import RandomStreams
+    from ..simulation import Simulation
+
+    show_config.load()
+    os.chdir(run["root"])
+    rng_streams = RandomStreams(run["seed"])
+    engine = AudioEngine(blocksize=run["blocksize"])
+    output = NullOutput(engine)
+    reader = ReadAhead(samplerate=engine.samplerate, blocksize=engine.blocksize, background=False)
+    # decoded assets from earlier runs would turn this run's decodes into cache hits
+    cache_dir = tempfile.mkdtemp(prefix="audio_bench_")
+    assets = AssetCache(cache_dir=cache_dir, samplerate=engine.samplerate)
+    controllers = {
+        sound_type: Audio_controller(sound_type, rng_streams, engine, reader, assets)
+        for sound_type in ["music", "foley", "quotes"]
+    }
+    simulation = Simulation(rng_streams)
+
+    script = sorted(build_scripts(list(SCENES))[run["script"]])
+    scene = script[0][2]
+    step = 0
+    rendered = []
+    streamed = set()
+    started_cpu = time.process_time()
+    started = time.perf_counter()
+    t = 0.0
+    while t < run["duration"]:
+        while step < len(script) and script[step][0] <= t:
+            _, action, scene_name = script[step]
+            if action == "scene":
+                scene = scene_name
+                controllers["music"].set_scene(scene)
+                controllers["foley"].set_scene(scene)
+            else:
+                controllers["quotes"].trigger_one_shot(scene_name)
+            step += 1
+        for controller in controllers.values():
+            controller.update(scene, simulation)
+        streamed.update(reader.sources)
+        audio = output.render(UPDATE_INTERVAL, before_block=reader.pump)
+        if run["render_dir"] is not None:
+            rendered.append(audio)
+        t += UPDATE_INTERVAL
+    wall = time.perf_counter() - started
+    cpu = time.process_time() - started_cpu
+    reader.stop()
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    underruns = sum(source.underruns for source in streamed)
+
+    if run["render_dir"] is not None:
+        import soundfile as sf
+
+        os.makedirs(run["render_dir"], exist_ok=True)
+        path = os.path.join(run["render_dir"], f"{run['script']}_{run['blocksize']}.wav")
+        sf.write(path, np.concatenate(rendered), engine.samplerate, subtype="FLOAT")
+
+    stats = engine.stats
+    return {
+        "script": run["script"],
+        "blocksize": run["blocksize"],
+        "rendered_s": stats.rendered_s,
+        "wall_s": wall,
+        "engine_cpu_per_s": stats.load,
+        "process_cpu_per_s": cpu / stats.rendered_s if stats.rendered_s > 0.0 else 0.0,
+        "block_ms": stats.total_s / stats.blocks * 1000.0 if stats.blocks > 0 else 0.0,
+        "max_block_ms": stats.max_ms,
+        "deadline_misses": stats.deadline_misses,
+        "blocks": stats.blocks,
+        "underruns": underruns,
+        "max_start_ms": stats.max_start_ms,
+        "asset_cache": assets.stats.summary(),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def print_report(results: list):
+    for result in results:
+        print(f"\nscript={result['script']} blocksize={result['blocksize']}")
+        print(
+            f"  cpu per rendered second: engine {result['engine_cpu_per_s'] * 1000.0:.2f}ms "
+            f"process {result['process_cpu_per_s'] * 1000.0:.2f}ms "
+            f"({result['rendered_s'] / result['wall_s']:.1f}x realtime)"
+        )
+        print(
+            f"  block render: mean {result['block_ms']:.3f}ms max {result['max_block_ms']:.3f}ms "
+            f"of {result['blocksize'] / 44.1:.2f}ms, deadline misses {result['deadline_misses']}/{result['blocks']}"
+        )
+        print(f"  underruns {result['underruns']}, max start latency {result['max_start_ms']:.2f}ms")
+        print(f"  asset cache: {result['asset_cache']}")
+        print(f"  peak memory: rss {result['peak_rss_mb']:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline audio render benchmark")
+    parser.add_argument("--root", default=".", help="folder containing the audio library")
+    parser.add_argument("--duration", type=float, default=300.0, help="rendered seconds per run")
+    parser.add_argument("--block-sizes", default="256,512,1024,2048", help="comma separated block sizes")
+    parser.add_argument("--scripts", default="scene_cycle", help=f"comma separated scripts: {', '.join(SCRIPT_NAMES)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1, help="parallel runs, more than 1 skews the timings")
+    parser.add_argument("--render-dir", help="write every run to a wav file in this folder")
+    parser.add_argument("--output", help="write the report as json to this path")
+    args = parser.parse_args()
+
+    runs = [
+        {
+            "root": os.path.abspath(args.root),
+            "duration": args.duration,
+            "blocksize": int(blocksize),
+            "script": script,
+            "seed": args.seed,
+            "render_dir": args.render_dir and os.path.abspath(args.render_dir),
+        }
+        for script in args.scripts.split(",")
+        for blocksize in args.block_sizes.split(",")
+    ]
+    print(f"{len(runs)} runs of {args.duration:.0f}s")
+    started = time.perf_counter()
+    # a fresh process per run so the peak memory isn't carried over
+    with ProcessPoolExecutor(max_workers=args.workers, max_tasks_per_child=1) as executor:
+        results = list(executor.map(run_one, runs))
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# measures the per lookup cost of address resolution and control cache access
+#
+# usage: python3 -m the_enclave_brain.tools.bench_addresses
+
+import timeit
+
+import numpy as np
+
+from .. import show_config
+from ..osc import addresses, control_cache, registry
+from ..osc.addresses import MADMAPPER_CONFIG
+from ..osc.transitions import ControlFade, OSCTransition
+
+N = 200_000
+
+LAYER = "bg2"
+CONTROL = "mask_opacity"
+
+
+def bench(name: str, stmt: str, namespace: dict, baseline=None):
+    seconds = min(timeit.repeat(stmt, number=N, repeat=5, globals=namespace))
+    ns = seconds / N * 1e9
+    speedup = f"  ({baseline / ns:.1f}x)" if baseline else ""
+    print(f"{name:<44} {ns:8.1f} ns{speedup}")
+    return ns
+
+
+def main():
+    show_config.load()
+    address = addresses.control(LAYER, CONTROL)
+    # the string keyed dict the control cache used before the registry
+    legacy_cache = {a: 0.0 for a, _ in control_cache.items()}
+    legacy_cache[address] = 0.5
+    control_cache.set_value(address, 0.5)
+
+    controls = [a for layer in MADMAPPER_CONFIG.values() for a in layer["controls"].values()]
+    namespace = {
+        "controls": controls,
+        "control_ids": np.array([registry.intern(a) for a in controls]),
+        "values": control_cache.values(),
+        "MADMAPPER_CONFIG": MADMAPPER_CONFIG,
+        "legacy_cache": legacy_cache,
+        "control_cache": control_cache,
+        "registry": registry,
+        "address_id": registry.control_id(LAYER, CONTROL),
+        "layer": registry.layer_ids(LAYER),
+        "ControlFade": ControlFade,
+        "OSCTransition": OSCTransition,
+        "LAYER": LAYER,
+        "CONTROL": CONTROL,
+    }
+
+    print(f"{N} iterations, best of 5\n")
+    print("get")
+    baseline = bench(
+        "dict walk + string keyed dict (before)",
+        "legacy_cache.get(MADMAPPER_CONFIG[LAYER]['controls'][CONTROL], 0.0)",
+        namespace,
+    )
+    bench("registry.control_id + get_value_by_id", "control_cache.get_value_by_id(registry.control_id(LAYER, CONTROL))", namespace, baseline)
+    bench("get_value_by_id with held LayerIds", "control_cache.get_value_by_id(layer.mask_opacity)", namespace, baseline)
+    bench("get_value_by_id with a held id", "control_cache.get_value_by_id(address_id)", namespace, baseline)
+
+    # what LayerSwitch resolves before reading its four controls
+    print("\nresolve the opacity and mask of two layers")
+    controls_of = "MADMAPPER_CONFIG['{}']['controls']['{}']"
+    control_id_of = "registry.control_id('{}', '{}')"
+    pairs = [("bg1", "opacity"), ("bg1", "mask_opacity"), ("bg2", "opacity"), ("bg2", "mask_opacity")]
+    baseline = bench("dict walk (before)", ", ".join(controls_of.format(*p) for p in pairs), namespace)
+    bench("registry.control_id", ", ".join(control_id_of.format(*p) for p in pairs), namespace, baseline)
+    namespace["prev"], namespace["next"] = registry.layer_ids("bg1"), registry.layer_ids("bg2")
+    bench("held LayerIds", "prev.opacity, prev.mask_opacity, next.opacity, next.mask_opacity", namespace, baseline)
+
+    print("\nset")
+    baseline = bench(
+        "dict walk + string keyed dict (before)",
+        "legacy_cache[MADMAPPER_CONFIG[LAYER]['controls'][CONTROL]] = round(0.25, 3)",
+        namespace,
+    )
+    # set_value_by_id also stamps a version and marks the address dirty for the output stage
+    bench("set_value_by_id with a held id", "control_cache.set_value_by_id(address_id, 0.25)", namespace, baseline)
+
+    print(f"\nread all {len(controls)} controls")
+    baseline = bench("string keyed dict (before)", "[legacy_cache.get(a, 0.0) for a in controls]", namespace)
+    bench("numpy gather by id", "values[control_ids]", namespace, baseline)
+
+    print("\nevent construction")
+    baseline = bench(
+        "fade resolved by name (before)",
+        "OSCTransition(start=0.0, end=1.0, duration=1.0, address_id=registry.control_id(LAYER, CONTROL))",
+        namespace,
+    )
+    bench("ControlFade with held LayerIds", "ControlFade(layer, CONTROL, 0.0, 1.0, 1.0)", namespace, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# audio library indexer
+# - measures every file under music/, audio/ and quotes/ across a process pool
+# - per file: an RMS and peak envelope at 30 values per second, the duration and the overall RMS and peak level
+# - writes one envelope_index.bin at the library root, which the audio controllers memory-map at startup to
+#   look up the energy of their playing voices every frame (the audio_energy modulation source)
+#
+# the normalized copy of the library is indexed when there is one, as that's what the controllers play.
+#
+# usage:
+#   python3 -m the_enclave_brain.tools.index_audio
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+from ..audio.engine import CHANNELS, SAMPLE_RATE
+from ..audio.envelopes import ENVELOPE_RATE, INDEX_NAME, PEAK, RMS, compute_envelope, write_index
+from ..audio.library import is_audio_file, normalized_root
+from .normalize_audio import FOLDERS, to_db
+
+
+def index_file(job: dict) -> tuple:
+    """Returns (metadata, envelope) of one file."""
+    audio, samplerate = sf.read(job["path"], dtype="float32", always_2d=True)
+    envelope = compute_envelope(audio, samplerate, job["rate"])
+    rms = float(np.sqrt(np.mean(np.square(audio, dtype=np.float64)))) if len(audio) else 0.0
+    stat = os.stat(job["path"])
+    metadata = {
+        "duration": len(audio) / samplerate,
+        "rms_db": to_db(rms) if rms > 0.0 else None,
+        "peak_db": to_db(float(envelope[:, PEAK].max())) if envelope[:, PEAK].max() > 0.0 else None,
+        "max_rms": float(envelope[:, RMS].max()),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+    return metadata, envelope
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the envelopes of the audio library")
+    parser.add_argument("--root", default=".", help="folder containing the audio library")
+    parser.add_argument("--rate", type=int, default=ENVELOPE_RATE, help="envelope values per second")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    args = parser.parse_args()
+
+    root = normalized_root(os.path.abspath(args.root), SAMPLE_RATE, CHANNELS)
+    jobs = []
+    for folder in FOLDERS:
+        for directory, _, filenames in os.walk(os.path.join(root, folder)):
+            for filename in sorted(filenames):
+                if is_audio_file(filename):
+                    path = os.path.join(directory, filename)
+                    jobs.append({"path": path, "relpath": os.path.relpath(path, root), "rate": args.rate})
+    print(f"indexing {len(jobs)} files under {root}")
+
+    started = time.perf_counter()
+    assets = {}
+    envelopes = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [(job, executor.submit(index_file, job)) for job in jobs]
+        for job, future in futures:
+            try:
+                metadata, envelope = future.result()
+            except Exception as e:
+                print(f"could not index {job['path']}:", e)
+                continue
+            assets[job["relpath"]] = metadata
+            envelopes.append(envelope)
+
+    path = os.path.join(root, INDEX_NAME)
+    write_index(path, assets, envelopes, args.rate)
+    frames = sum(len(envelope) for envelope in envelopes)
+    print(
+        f"wrote {path}: {len(assets)} files, {frames} envelope frames, {os.path.getsize(path) / 1024:.0f}KB "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# offline normalization of the audio library
+# - converts every file under music/, audio/ and quotes/ to the engine format: channel count, sample rate, float32
+# - scales each file to a target RMS loudness, limited so the peak stays under a ceiling
+# - runs the files across a process pool, files whose source didn't change since the last run are skipped
+# - writes the copies under normalized_audio/ with the same layout and a manifest.json describing them,
+#   the audio controllers read from there when the manifest matches the engine format
+#
+# usage:
+#   python3 -m the_enclave_brain.tools.normalize_audio --target-db -20 --peak-db -1
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+from ..audio.assets import resample
+from ..audio.engine import CHANNELS, SAMPLE_RATE
+from ..audio.library import MANIFEST_NAME, NORMALIZED_FOLDER, is_audio_file
+
+FOLDERS = ["music", "audio", "quotes"]
+TARGET_DB = -20.0
+PEAK_DB = -1.0
+
+
+def to_db(value: float) -> float:
+    return 20.0 * np.log10(value) if value > 0.0 else -np.inf
+
+
+def convert_channels(audio: np.ndarray, channels: int) -> np.ndarray:
+    """Mono is copied to every channel, extra channels are folded down by averaging."""
+    if audio.shape[1] == channels:
+        return audio
+    if audio.shape[1] == 1:
+        return np.repeat(audio, channels, axis=1)
+    if channels == 1:
+        return audio.mean(axis=1, keepdims=True)
+    out = audio[:, :channels].copy()
+    for c in range(channels, audio.shape[1]):
+        out[:, c % channels] += audio[:, c]
+    counts = np.bincount(np.arange(audio.shape[1]) % channels)
+    return (out / counts).astype(np.float32)
+
+
+def normalize_file(job: dict) -> dict:
+    """Converts one file, returns its manifest entry."""
+    audio, samplerate = sf.read(job["source"], dtype="float32", always_2d=True)
+    audio = convert_channels(audio, job["channels"])
+    if samplerate != job["samplerate"]:
+        audio = resample(audio, samplerate, job["samplerate"])
+
+    rms_db = to_db(float(np.sqrt(np.mean(np.square(audio, dtype=np.float64))))) if len(audio) else -np.inf
+    peak_db = to_db(float(np.abs(audio).max())) if len(audio) else -np.inf
+    gain_db = 0.0
+    if np.isfinite(rms_db):
+        gain_db = min(job["target_db"] - rms_db, job["peak_db"] - peak_db)
+        audio *= np.float32(10.0 ** (gain_db / 20.0))
+
+    os.makedirs(os.path.dirname(job["output"]), exist_ok=True)
+    sf.write(job["output"], audio, job["samplerate"], subtype="FLOAT")
+    return {
+        "source": job["relpath"],
+        "source_size": job["source_size"],
+        "source_mtime_ns": job["source_mtime_ns"],
+        "source_samplerate": samplerate,
+        "frames": len(audio),
+        "duration": len(audio) / job["samplerate"],
+        "rms_db": rms_db + gain_db if np.isfinite(rms_db) else None,
+        "peak_db": peak_db + gain_db if np.isfinite(peak_db) else None,
+        "gain_db": gain_db,
+    }
+
+
+def find_jobs(root: str, output_root: str, format: dict, manifest: dict) -> tuple:
+    """Returns (jobs, entries): the files to convert and the manifest entries that are still up to date."""
+    jobs = []
+    entries = {}
+    for folder in FOLDERS:
+        for directory, _, filenames in os.walk(os.path.join(root, folder)):
+            for filename in sorted(filenames):
+                if not is_audio_file(filename):
+                    continue
+                source = os.path.join(directory, filename)
+                relpath = os.path.relpath(source, root)
+                output_relpath = os.path.splitext(relpath)[0] + ".wav"
+                stat = os.stat(source)
+                entry = manifest.get(output_relpath)
+                if (
+                    entry is not None
+                    and entry["source"] == relpath
+                    and entry["source_size"] == stat.st_size
+                    and entry["source_mtime_ns"] == stat.st_mtime_ns
+                    and os.path.exists(os.path.join(output_root, output_relpath))
+                ):
+                    entries[output_relpath] = entry
+                    continue
+                jobs.append(
+                    {
+                        **format,
+                        "source": source,
+                        "relpath": relpath,
+                        "output_relpath": output_relpath,
+                        "output": os.path.join(output_root, output_relpath),
+                        "source_size": stat.st_size,
+                        "source_mtime_ns": stat.st_mtime_ns,
+                    }
+                )
+    return jobs, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the audio library to the engine format")
+    parser.add_argument("--root", default=".", help="folder containing music/, audio/ and quotes/")
+    parser.add_argument("--samplerate", type=int, default=SAMPLE_RATE)
+    parser.add_argument("--channels", type=int, default=CHANNELS)
+    parser.add_argument("--target-db", type=float, default=TARGET_DB, help="target RMS level in dBFS")
+    parser.add_argument("--peak-db", type=float, default=PEAK_DB, help="peak ceiling in dBFS")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--force", action="store_true", help="convert every file, even if up to date")
+    args = parser.parse_args()
+
+    output_root = os.path.join(args.root, NORMALIZED_FOLDER)
+    manifest_path = os.path.join(output_root, MANIFEST_NAME)
+    format = {
+        "samplerate": args.samplerate,
+        "channels": args.channels,
+        "target_db": args.target_db,
+        "peak_db": args.peak_db,
+    }
+
+    manifest = {}
+    if os.path.exists(manifest_path) and not args.force:
+        with open(manifest_path) as f:
+            previous = json.load(f)
+        # a different format invalidates every file
+        if previous["format"] == {**format, "subtype": "FLOAT"}:
+            manifest = previous["files"]
+
+    jobs, entries = find_jobs(args.root, output_root, format, manifest)
+    print(f"{len(jobs)} files to convert, {len(entries)} up to date")
+
+    started = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [(job, executor.submit(normalize_file, job)) for job in jobs]
+        for job, future in futures:
+            try:
+                entries[job["output_relpath"]] = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"could not convert {job['source']}:", e)
+    print(f"done in {time.perf_counter() - started:.1f}s, {failed} failed")
+
+    # copies of files that were removed or renamed would still be picked by the controllers
+    for output_relpath in set(manifest) - set(entries):
+        stale = os.path.join(output_root, output_relpath)
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    os.makedirs(output_root, exist_ok=True)
+    with open(manifest_path, "w") as f:
+        json.dump(
+            {"format": {**format, "subtype": "FLOAT"}, "files": dict(sorted(entries.items()))},
+            f,
+            indent=2,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+# parallel headless parameter sweep over the full app
+# - runs many headless App instances on a virtual clock across a process pool
+# - every run gets stub osc output, a fresh control cache and its own seed
+# - explores grids of scene config values and knob scripts
+# - collects osc rate, cue repetition and scene dwell metrics into one report
+#
+# usage:
+#   python3 -m the_enclave_brain.tools.sweep --duration 1200 --seeds 4 \
+#       --grid healthy_forest.fg_blackout=0.5,0.9 --grid SCENE_LENGTH=30,60 \
+#       --knobs idle,climate_ramp --output sweep_report.json
+#
+# alternate show programs are swept with --grid program=the_enclave_brain/programs/forest_health.json
+
+import argparse
+import contextlib
+import copy
+import io
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import simpy
+
+from .. import simulation
+from ..app import App
+from ..config import STEPS_PER_SECOND, TIME_STEP_SECONDS
+from ..osc import control_cache, messages
+from ..osc.addresses import MADMAPPER_CONFIG
+from ..scene_program import load_program
+from ..scenes import SCENES
+from .. import show_config
+from ..show_config import rebuild_cue_tables
+
+# knob scripts are lists of (time in seconds, knob, normalized value)
+KNOB_SCRIPTS = {
+    "idle": [],
+    "climate_ramp": [
+        (60.0, "climate_change", 0.75),
+        (180.0, "climate_change", 1.0),
+        (420.0, "climate_change", 0.5),
+    ],
+    "human_ramp": [
+        (60.0, "human_activity", 0.75),
+        (180.0, "human_activity", 1.0),
+        (420.0, "human_activity", 0.25),
+    ],
+    "restless": [
+        (t * 20.0, knob, (t % 5) / 4.0)
+        for t in range(1, 60)
+        for knob in ["climate_change", "human_activity", "fate"]
+    ],
+}
+
+
+class RecordingClient:
+    """Stub OSC client that records sent addresses instead of sending them."""
+
+    def __init__(self):
+        self.message_count = 0
+        self.addresses = []
+
+    def send_message(self, address: str, value):
+        self.message_count += 1
+        self.addresses.append(address)
+
+
+def layer_cue_addresses():
+    """Returns the addresses of every playable layer cue (blackouts excluded)."""
+    addresses = set()
+    for layer in ["bg1", "bg2", "fg1", "fg2"]:
+        for bin, cues in MADMAPPER_CONFIG[layer]["cues"].items():
+            if bin == "blackout":
+                continue
+            addresses.update(cue["address"] for cue in cues)
+    return addresses
+
+
+def apply_overrides(overrides: dict):
+    """Applies config overrides in this worker process.
+
+    Keys are either "<scene>.<field>" for SCENES entries or the name of a simulation module constant like SCENE_LENGTH.
+    The "program" key (a show program path) is handled by run_one.
+    """
+    for key, value in overrides.items():
+        if key == "program":
+            continue
+        if "." in key:
+            scene, field = key.split(".", 1)
+            if scene not in SCENES:
+                raise KeyError(f"unknown scene in override: {key}")
+            SCENES[scene][field] = value
+            rebuild_cue_tables()
+        elif hasattr(simulation, key):
+            setattr(simulation, key, value)
+        else:
+            raise KeyError(f"unknown override: {key}")
+
+
+def knob_script_process(env: simpy.Environment, app: App, script: list):
+    for at, knob, value in sorted(script):
+        if at > env.now:
+            yield env.timeout(at - env.now)
+        app.simulation.update_config(knob, value)
+
+
+def app_process(env: simpy.Environment, app: App, tick: float, stats: dict):
+    while True:
+        client = messages.osc_client
+        start = len(client.addresses)
+        app.update(tick)
+        scene_changed = app.scene != stats["scene"]
+        if scene_changed:
+            stats["visits"].append((stats["scene"], env.now - stats["scene_start"]))
+            stats["scene"] = app.scene
+            stats["scene_start"] = env.now
+            stats["seen_cues"] = set()
+        for address in client.addresses[start:]:
+            if address in stats["cue_addresses"]:
+                stats["cue_triggers"] += 1
+                if address in stats["seen_cues"]:
+                    stats["cue_repeats"] += 1
+                stats["seen_cues"].add(address)
+        # only the addresses of the current frame are needed
+        client.addresses.clear()
+        yield env.timeout(tick)
+
+
+def run_one(run: dict) -> dict:
+    """Runs a single headless app with the given overrides, knob script and seed."""
+    show_config.load()
+    original_scenes = copy.deepcopy(SCENES)
+    original_constants = {
+        key: getattr(simulation, key) for key in run["overrides"] if hasattr(simulation, key)
+    }
+    started = time.perf_counter()
+    try:
+        apply_overrides(run["overrides"])
+        control_cache.clear()
+        client = RecordingClient()
+        messages.set_osc_client(client)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            program = None
+            if "program" in run["overrides"]:
+                program = load_program(run["overrides"]["program"])
+            app = App(headless=True, seed=run["seed"], program=program)
+            env = simpy.Environment()
+            stats = {
+                "scene": app.scene,
+                "scene_start": 0.0,
+                "visits": [],
+                "seen_cues": set(),
+                "cue_addresses": layer_cue_addresses(),
+                "cue_triggers": 0,
+                "cue_repeats": 0,
+            }
+            env.process(app_process(env, app, TIME_STEP_SECONDS, stats))
+            env.process(knob_script_process(env, app, KNOB_SCRIPTS[run["knobs"]]))
+            env.run(until=run["duration"])
+        stats["visits"].append((stats["scene"], run["duration"] - stats["scene_start"]))
+    finally:
+        SCENES.clear()
+        SCENES.update(original_scenes)
+        rebuild_cue_tables()
+        for key, value in original_constants.items():
+            setattr(simulation, key, value)
+
+    return {
+        **run,
+        "osc_messages_per_minute": client.message_count / (run["duration"] / 60.0),
+        "cue_triggers": stats["cue_triggers"],
+        "cue_repetition_rate": stats["cue_repeats"] / max(1, stats["cue_triggers"]),
+        "scene_visits": stats["visits"],
+        "wall_time": time.perf_counter() - started,
+    }
+
+
+def aggregate(results: list) -> list:
+    """Groups run results by config (all seeds together) and summarizes metrics."""
+    groups = {}
+    for result in results:
+        key = (json.dumps(result["overrides"], sort_keys=True), result["knobs"])
+        groups.setdefault(key, []).append(result)
+
+    report = []
+    for (overrides, knobs), runs in groups.items():
+        dwell = {}
+        for run in runs:
+            # the last visit is cut off by the end of the run so it isn't counted
+            for scene, length in run["scene_visits"][:-1]:
+                dwell.setdefault(scene, []).append(length)
+        report.append(
+            {
+                "overrides": json.loads(overrides),
+                "knobs": knobs,
+                "runs": len(runs),
+                "seeds": [run["seed"] for run in runs],
+                "osc_messages_per_minute": sum(r["osc_messages_per_minute"] for r in runs) / len(runs),
+                "cue_repetition_rate": sum(r["cue_repetition_rate"] for r in runs) / len(runs),
+                "scene_dwell_seconds": {
+                    scene: {
+                        "visits": len(lengths),
+                        "mean": sum(lengths) / len(lengths),
+                        "min": min(lengths),
+                        "max": max(lengths),
+                    }
+                    for scene, lengths in sorted(dwell.items())
+                },
+            }
+        )
+    return report
+
+
+def parse_grid(specs: list) -> dict:
+    """Parses KEY=V1,V2 specs, values are decoded as json when possible."""
+    grid = {}
+    for spec in specs:
+        key, values = spec.split("=", 1)
+        parsed = []
+        for value in values.split(","):
+            try:
+                parsed.append(json.loads(value))
+            except json.JSONDecodeError:
+                parsed.append(value)
+        grid[key] = parsed
+    return grid
+
+
+def build_runs(grid: dict, knob_scripts: list, seeds: list, duration: float) -> list:
+    keys = sorted(grid.keys())
+    runs = []
+    for values in itertools.product(*[grid[key] for key in keys]):
+        overrides = dict(zip(keys, values))
+        for knobs in knob_scripts:
+            for seed in seeds:
+                runs.append(
+                    {"overrides": overrides, "knobs": knobs, "seed": seed, "duration": duration}
+                )
+    return runs
+
+
+def print_report(report: list):
+    for entry in report:
+        print(f"\noverrides={entry['overrides']} knobs={entry['knobs']} runs={entry['runs']}")
+        print(f"  osc messages/min: {entry['osc_messages_per_minute']:.1f}")
+        print(f"  cue repetition rate: {entry['cue_repetition_rate']:.3f}")
+        for scene, dwell in entry["scene_dwell_seconds"].items():
+            print(
+                f"  {scene}: visits={dwell['visits']} mean={dwell['mean']:.1f}s min={dwell['min']:.1f}s max={dwell['max']:.1f}s"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless parameter sweep over the full app")
+    parser.add_argument("--duration", type=float, default=600.0, help="simulated seconds per run")
+    parser.add_argument("--seeds", type=int, default=4, help="number of seeds per config")
+    parser.add_argument("--seed", type=int, default=0, help="first seed")
+    parser.add_argument("--grid", action="append", default=[], help="KEY=V1,V2,... (repeatable)")
+    parser.add_argument("--knobs", default="idle", help=f"comma separated knob scripts: {', '.join(KNOB_SCRIPTS)}")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--output", help="write the report as json to this path")
+    args = parser.parse_args()
+
+    knob_scripts = args.knobs.split(",")
+    for name in knob_scripts:
+        if name not in KNOB_SCRIPTS:
+            parser.error(f"unknown knob script: {name}")
+
+    seeds = list(range(args.seed, args.seed + args.seeds))
+    runs = build_runs(parse_grid(args.grid), knob_scripts, seeds, args.duration)
+    print(f"running {len(runs)} runs of {args.duration}s ({int(args.duration * STEPS_PER_SECOND)} steps) on {args.workers} workers")
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(run_one, runs))
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+    report = aggregate(results)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"runs": results, "report": report}, f, indent=2)
+        print("wrote report to", args.output)
+
+
+if __name__ == "__main__":
+    main()